@@ -0,0 +1,46 @@
+"""
+Módulo de redução de pontos para gráficos de linha.
+Sessões longas com muitos carros geram dezenas de milhares de pontos; aqui ficam os limites a
+partir dos quais os gráficos passam para WebGL (Scattergl) e a decimação mínimo/máximo usada
+na visão geral, que preserva os picos (voltas de box, erros) que uma média esconderia.
+"""
+import numpy as np
+
+
+# Acima desta quantidade total de pontos os gráficos de linha usam Scattergl (WebGL)
+LIMITE_PONTOS_WEBGL = 2000
+
+# Pontos por piloto na visão geral (a decimação mantém mínimo e máximo de cada faixa)
+PONTOS_VISAO_GERAL = 120
+
+
+def usar_webgl(total_pontos: int, limite: int = LIMITE_PONTOS_WEBGL) -> bool:
+    """Indica se um gráfico com `total_pontos` deve ser renderizado em WebGL."""
+    return total_pontos > limite
+
+
+def indices_min_max(y: np.ndarray, max_pontos: int = PONTOS_VISAO_GERAL) -> np.ndarray:
+    """
+    Índices dos pontos mantidos em uma decimação mínimo/máximo.
+
+    A série é dividida em max_pontos // 2 faixas consecutivas e, de cada faixa, ficam o ponto
+    de menor e o de maior valor (além do primeiro e do último ponto da série), tudo em uma única
+    ordenação, sem laço por faixa.
+
+    :param y: Valores da série, na ordem do eixo X (sem NaN)
+    :param max_pontos: Quantidade máxima aproximada de pontos mantidos
+    :return: Índices ordenados dos pontos mantidos (todos, se a série já for curta)
+    """
+    n = len(y)
+    if n <= max_pontos:
+        return np.arange(n)
+
+    n_faixas = max(max_pontos // 2, 1)
+    faixa = (np.arange(n) * n_faixas) // n
+
+    # Ordena por (faixa, valor): o primeiro de cada faixa é o mínimo e o último é o máximo
+    ordem = np.lexsort((y, faixa))
+    inicio = np.searchsorted(faixa[ordem], np.arange(n_faixas))
+    fim = np.r_[inicio[1:], n] - 1
+
+    return np.unique(np.r_[0, ordem[inicio], ordem[fim], n - 1])
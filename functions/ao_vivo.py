@@ -0,0 +1,387 @@
+"""
+Módulo de acompanhamento ao vivo de um CSV de cronometragem que continua crescendo.
+O arquivo é observado com watchdog e, a cada atualização, só os bytes acrescentados desde a
+última leitura são lidos, validados e separados por piloto (os mesmos ValidadorCSV e
+SeparadorPilotos da ingestão). A tabela de voltas de cada piloto, o GAP de cada passagem e o
+resumo por piloto (voltas, última/melhor volta e velocidades) são atualizados só com as voltas
+novas, sem reprocessar o arquivo inteiro.
+"""
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from functions.cabecalhos import PARSERS_CABECALHO, CAMPEONATO_AUTOMATICO
+from functions.esquema import DATA_BASE_HORARIO, compactar_dataframe_bruto
+from functions.utils import SeparadorPilotos
+from functions.validacao import ErroValidacaoCSV, RelatorioValidacao, ValidadorCSV, preparar_bloco_bruto
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog é opcional: sem ele o tamanho do arquivo é conferido a cada atualização
+    FileSystemEventHandler = object
+    Observer = None
+
+
+# Intervalo (s) padrão entre atualizações da tela ao vivo
+INTERVALO_ATUALIZACAO = 2.0
+
+# Bytes lidos no máximo por atualização (o restante fica para as próximas)
+BYTES_POR_ATUALIZACAO = 4 * 1024 * 1024
+
+# Bytes anteriores à posição de leitura usados para detectar que o arquivo foi reescrito
+BYTES_VERIFICACAO = 64
+
+# Passagens pela linha guardadas para a tabela de passagens recentes
+MAX_PASSAGENS_RECENTES = 200
+
+# Quantidade máxima de arquivos acompanhados ao mesmo tempo
+MAX_ARQUIVOS_AO_VIVO = 4
+
+COLUNAS_RESUMO = ['Piloto', 'Voltas', 'Volta_Atual', 'Ultima_Volta', 'Melhor_Volta', 'Maior_ST', 'Soma_ST',
+                  'Voltas_ST', 'Ultima_Passagem']
+
+
+class _MonitorArquivo(FileSystemEventHandler):
+    """Sinaliza `alterado` quando o watchdog vê qualquer evento no arquivo acompanhado."""
+
+    def __init__(self, caminho: str, alterado: threading.Event):
+        super().__init__()
+        self.caminho = caminho
+        self.alterado = alterado
+
+    def on_any_event(self, event):
+        caminhos = {getattr(event, 'src_path', None), getattr(event, 'dest_path', None)}
+        if self.caminho in {os.path.abspath(c) for c in caminhos if c}:
+            self.alterado.set()
+
+
+class EstadoAoVivo:
+    """
+    Tabelas atualizadas incrementalmente a cada lote de voltas novas.
+
+    Atributos:
+        driver_info: {piloto: DataFrame de voltas} no esquema compacto (como separar_pilotos_por_volta),
+                     montado só quando lido; a tela usa voltas_desde(), que lê só as partes recentes
+        resumo: Uma linha por piloto com Voltas, Volta_Atual, Ultima_Volta, Melhor_Volta, Maior_ST,
+                Soma_ST/Voltas_ST (média de ST) e Ultima_Passagem
+
+    O GAP de cada passagem (tempo para o carro anterior na mesma volta, como em processar_gap_st)
+    sai de ultimas_passagens().
+    """
+
+    def __init__(self):
+        # Voltas de cada piloto em partes, na ordem de chegada (concatenadas só quando lidas)
+        self._partes: Dict[str, List[pd.DataFrame]] = {}
+        self.resumo = pd.DataFrame({coluna: pd.Series(dtype='float64') for coluna in COLUNAS_RESUMO[1:]},
+                                   index=pd.Index([], name='Piloto'))
+        self.resumo['Ultima_Passagem'] = pd.Series(dtype='datetime64[ns]')
+        self._bloco_piloto: Dict[str, int] = {}
+        self._passagens_por_volta: Dict[int, np.ndarray] = {}
+        self._passagens = pd.DataFrame(columns=['Piloto', 'Lap', 'Time of Day', 'Lap Tm', 'ST'])
+
+    @property
+    def driver_info(self) -> Dict[str, pd.DataFrame]:
+        """Tabela completa de voltas de cada piloto (as partes acumuladas são unidas aqui)."""
+        for piloto, partes in self._partes.items():
+            if len(partes) > 1:
+                self._partes[piloto] = [pd.concat(partes, ignore_index=True)]
+        return {piloto: partes[0] for piloto, partes in self._partes.items()}
+
+    def voltas_desde(self, primeira_volta: int) -> Dict[str, pd.DataFrame]:
+        """
+        Voltas de cada piloto a partir de `primeira_volta`, lendo só as partes mais recentes
+        (o custo depende da janela de voltas, não do tamanho da sessão).
+        """
+        recentes = {}
+        for piloto, partes in self._partes.items():
+            inicio = len(partes)
+            while inicio > 0 and partes[inicio - 1]['Lap'].iloc[-1] >= primeira_volta:
+                inicio -= 1
+            if inicio == len(partes):
+                continue
+            voltas = partes[inicio] if inicio == len(partes) - 1 else pd.concat(partes[inicio:], ignore_index=True)
+            recentes[piloto] = voltas[voltas['Lap'] >= primeira_volta]
+        return recentes
+
+    def ultimas_passagens(self, quantidade: int = 20) -> pd.DataFrame:
+        """
+        Passagens mais recentes pela linha com o GAP para o carro anterior na mesma volta.
+
+        O GAP é calculado na hora (busca binária nos horários já ordenados de cada volta), então
+        continua correto mesmo quando passagens de uma volta chegam fora de ordem.
+        """
+        colunas = ['Piloto', 'Lap', 'Time of Day', 'Lap Tm', 'ST', 'GAP']
+        if self._passagens.empty:
+            return pd.DataFrame(columns=colunas)
+        recentes = self._passagens.nlargest(quantidade, 'Time of Day')
+
+        segundos = (recentes['Time of Day'] - DATA_BASE_HORARIO).dt.total_seconds().to_numpy()
+        gap = np.full(len(recentes), np.nan)
+        for i, (volta, horario) in enumerate(zip(recentes['Lap'].to_numpy(), segundos)):
+            todas = self._passagens_por_volta.get(int(volta))
+            if todas is None or np.isnan(horario):
+                continue
+            posicao = np.searchsorted(todas, horario, side='left')
+            # Primeiro carro da volta: GAP 0 (como em processar_gap_st)
+            gap[i] = horario - todas[posicao - 1] if posicao > 0 else 0.0
+        return recentes.assign(GAP=gap.round(3))[colunas].reset_index(drop=True)
+
+    def aplicar(self, partes: List[Tuple[str, int, pd.DataFrame]]) -> int:
+        """
+        Aplica as voltas novas de cada piloto (SeparadorPilotos.ultimas_partes).
+
+        :return: Quantidade de voltas novas
+        """
+        novas = []
+        for piloto, bloco, parte in partes:
+            if parte.empty:
+                continue
+            # Um novo cabeçalho do mesmo piloto substitui as voltas anteriores (como na separação do arquivo)
+            if self._bloco_piloto.get(piloto, bloco) != bloco:
+                self._partes.pop(piloto, None)
+                self.resumo = self.resumo.drop(index=piloto, errors='ignore')
+            self._bloco_piloto[piloto] = bloco
+
+            self._partes.setdefault(piloto, []).append(parte)
+            novas.append(parte[['Lap', 'Time of Day', 'Lap Tm', 'ST']].assign(Piloto=piloto))
+
+        if not novas:
+            return 0
+        novas = pd.concat(novas, ignore_index=True)
+        self._atualizar_resumo(novas)
+        self._registrar_passagens(novas)
+        return len(novas)
+
+    def _atualizar_resumo(self, novas: pd.DataFrame):
+        """Combina o resumo das voltas novas com o resumo acumulado (só os pilotos com voltas novas)."""
+        st_valido = novas['ST'].where(np.isfinite(novas['ST']))
+        lote = novas.assign(ST_valido=st_valido).groupby('Piloto', sort=False).agg(
+            Voltas=('Lap', 'size'),
+            Volta_Atual=('Lap', 'max'),
+            Ultima_Volta=('Lap Tm', 'last'),
+            Melhor_Volta=('Lap Tm', 'min'),
+            Maior_ST=('ST_valido', 'max'),
+            Soma_ST=('ST_valido', 'sum'),
+            Voltas_ST=('ST_valido', 'count'),
+            Ultima_Passagem=('Time of Day', 'last'),
+        )
+        anterior = self.resumo.reindex(lote.index)
+        combinado = lote.copy()
+        for coluna in ['Voltas', 'Soma_ST', 'Voltas_ST']:
+            combinado[coluna] = lote[coluna] + anterior[coluna].fillna(0)
+        combinado['Volta_Atual'] = np.fmax(lote['Volta_Atual'], anterior['Volta_Atual'])
+        combinado['Melhor_Volta'] = np.fmin(lote['Melhor_Volta'], anterior['Melhor_Volta'])
+        combinado['Maior_ST'] = np.fmax(lote['Maior_ST'], anterior['Maior_ST'])
+
+        outros = self.resumo.drop(index=lote.index, errors='ignore')
+        self.resumo = pd.concat([outros, combinado]) if not outros.empty else combinado
+
+    def _registrar_passagens(self, novas: pd.DataFrame):
+        """Insere os horários das passagens novas nos horários ordenados de cada volta."""
+        segundos = (novas['Time of Day'] - DATA_BASE_HORARIO).dt.total_seconds().to_numpy()
+        voltas = novas['Lap'].to_numpy()
+        validas = ~np.isnan(segundos)
+        for volta in np.unique(voltas[validas]):
+            existentes = self._passagens_por_volta.get(int(volta), np.empty(0))
+            novos = segundos[validas & (voltas == volta)]
+            self._passagens_por_volta[int(volta)] = np.sort(np.concatenate([existentes, novos]))
+        # Só as passagens mais recentes ficam guardadas (o custo não cresce com a sessão)
+        novas = novas[['Piloto', 'Lap', 'Time of Day', 'Lap Tm', 'ST']]
+        if not self._passagens.empty:
+            novas = pd.concat([self._passagens, novas], ignore_index=True)
+        self._passagens = novas.nlargest(MAX_PASSAGENS_RECENTES, 'Time of Day')
+
+    def classificacao(self) -> pd.DataFrame:
+        """Ordem atual: mais voltas primeiro e, na mesma volta, quem passou antes pela linha."""
+        if self.resumo.empty:
+            return pd.DataFrame(columns=['Posição', 'Piloto', 'Volta', 'Última Volta', 'Melhor Volta',
+                                         'Maior ST', 'Média ST'])
+        resumo = self.resumo.sort_values(['Volta_Atual', 'Ultima_Passagem'], ascending=[False, True])
+        return pd.DataFrame({
+            'Posição': np.arange(1, len(resumo) + 1),
+            'Piloto': resumo.index,
+            'Volta': resumo['Volta_Atual'].astype(int).to_numpy(),
+            'Última Volta': resumo['Ultima_Volta'].to_numpy(),
+            'Melhor Volta': resumo['Melhor_Volta'].to_numpy(),
+            'Maior ST': resumo['Maior_ST'].astype('float64').round(1).to_numpy(),
+            'Média ST': (resumo['Soma_ST'] / resumo['Voltas_ST'].replace(0, np.nan)).round(1).to_numpy(),
+        })
+
+
+class SessaoAoVivo:
+    """
+    Acompanha um CSV local que continua crescendo e mantém um EstadoAoVivo atualizado.
+
+    atualizar() lê só os bytes novos (linhas completas), no máximo BYTES_POR_ATUALIZACAO por
+    chamada. Se o arquivo diminuir ou os bytes já lidos mudarem, a leitura recomeça do início.
+
+    :param caminho: Caminho do arquivo CSV
+    :param campeonato: Formato dos cabeçalhos de piloto (ver functions.cabecalhos)
+    """
+
+    def __init__(self, caminho: str, campeonato: str = CAMPEONATO_AUTOMATICO):
+        self.caminho = os.path.abspath(caminho)
+        self.campeonato = campeonato
+        self._trava = threading.Lock()
+        self._alterado = threading.Event()
+        self._observador = self._iniciar_observador()
+        self._reiniciar()
+
+    def _iniciar_observador(self):
+        """Observa a pasta do arquivo com watchdog (None se o watchdog não estiver disponível)."""
+        if Observer is None or not os.path.isdir(os.path.dirname(self.caminho)):
+            return None
+        observador = Observer()
+        observador.schedule(_MonitorArquivo(self.caminho, self._alterado), os.path.dirname(self.caminho),
+                            recursive=False)
+        observador.daemon = True
+        observador.start()
+        return observador
+
+    def _reiniciar(self):
+        self.posicao = 0
+        self.versao = 0
+        self.estado = EstadoAoVivo()
+        self._resto = b''
+        self._verificacao = b''
+        self._colunas = None
+        self._validador: Optional[ValidadorCSV] = None
+        self._separador: Optional[SeparadorPilotos] = None
+        # Cabeçalho rejeitado: o erro se repete a cada atualização até o arquivo ser reescrito
+        self._relatorio_cabecalho: Optional[RelatorioValidacao] = None
+        self._alterado.set()
+
+    def atualizar(self) -> int:
+        """
+        Lê os bytes acrescentados desde a última chamada e aplica as voltas novas.
+
+        :return: Quantidade de voltas novas
+        :raises ValueError: Se o cabeçalho do arquivo for inválido (ErroValidacaoCSV)
+        """
+        with self._trava:
+            # Com watchdog, só há trabalho depois de um evento no arquivo
+            if self._observador is not None and not self._alterado.is_set():
+                self._verificar_cabecalho()
+                return 0
+            self._alterado.clear()
+
+            try:
+                tamanho = os.path.getsize(self.caminho)
+            except OSError:
+                return 0
+
+            with open(self.caminho, 'rb') as arquivo:
+                if tamanho < self.posicao or not self._bytes_lidos_inalterados(arquivo):
+                    self._reiniciar()
+                    self._alterado.clear()
+                self._verificar_cabecalho()
+                if tamanho == self.posicao:
+                    return 0
+                arquivo.seek(self.posicao)
+                lido = arquivo.read(min(tamanho - self.posicao, BYTES_POR_ATUALIZACAO))
+
+            self.posicao += len(lido)
+            self._verificacao = (self._verificacao + lido)[-BYTES_VERIFICACAO:]
+            if self.posicao < tamanho:
+                # Ainda há bytes a ler: a próxima atualização continua sem esperar outro evento
+                self._alterado.set()
+
+            dados = self._resto + lido
+            corte = dados.rfind(b'\n') + 1
+            completas, self._resto = dados[:corte], dados[corte:]
+            return self._aplicar_linhas(completas)
+
+    def situacao(self) -> str:
+        return f"Acompanhando {self.caminho}"
+
+    def parar(self):
+        """Encerra a thread do watchdog (o arquivo deixa de ser observado)."""
+        if self._observador is not None:
+            self._observador.stop()
+            self._observador.join(timeout=5)
+            self._observador = None
+
+    def _verificar_cabecalho(self):
+        """Levanta de novo o erro do cabeçalho rejeitado (os bytes dele já foram consumidos)."""
+        if self._relatorio_cabecalho is not None:
+            raise ErroValidacaoCSV(self._relatorio_cabecalho)
+
+    def _bytes_lidos_inalterados(self, arquivo) -> bool:
+        """Confere se os últimos bytes já lidos continuam iguais (arquivo não foi reescrito)."""
+        if not self._verificacao:
+            return True
+        arquivo.seek(self.posicao - len(self._verificacao))
+        return arquivo.read(len(self._verificacao)) == self._verificacao
+
+    def _aplicar_linhas(self, completas: bytes) -> int:
+        if self._colunas is None:
+            if not completas:
+                return 0
+            # Primeira linha completa: cabeçalho do CSV
+            cabecalho, completas = completas.split(b'\n', 1)
+            colunas = list(pd.read_csv(io.BytesIO(cabecalho + b'\n'), nrows=0).columns)
+            try:
+                self._validador = ValidadorCSV(colunas, PARSERS_CABECALHO.get(self.campeonato))
+            except ErroValidacaoCSV as e:
+                self._relatorio_cabecalho = e.relatorio
+                raise
+            self._colunas = colunas
+
+        if not completas.strip():
+            return 0
+
+        bloco = pd.read_csv(io.BytesIO(completas), header=None, names=self._colunas,
+                            usecols=list(self._validador.mapa), dtype=str)
+        bruto = preparar_bloco_bruto(bloco, self._validador.mapa)
+        compacto = compactar_dataframe_bruto(bruto)
+        cabecalho = self._validador.adicionar(bruto, compacto)
+        if self._separador is None:
+            self._separador = SeparadorPilotos(self._validador.parser)
+        self._separador.adicionar(compacto, cabecalho)
+
+        novas = self.estado.aplicar(self._separador.ultimas_partes)
+        self.versao += 1
+        return novas
+
+
+class ArquivosAoVivo:
+    """
+    SessaoAoVivo por (arquivo, campeonato), compartilhadas por todos os usuários do processo.
+    Acima de max_arquivos, a menos usada recentemente é parada (thread do watchdog encerrada) e removida.
+    """
+
+    def __init__(self, max_arquivos: int):
+        self.max_arquivos = max_arquivos
+        self._sessoes = OrderedDict()  # (caminho, campeonato) -> SessaoAoVivo
+        self._lock = threading.Lock()
+
+    def obter(self, caminho: str, campeonato: str) -> SessaoAoVivo:
+        """Retorna a sessão do arquivo (criando-a se necessário), marcando-a como usada recentemente."""
+        chave = (os.path.abspath(caminho), campeonato)
+        with self._lock:
+            sessao = self._sessoes.get(chave)
+            if sessao is None:
+                sessao = self._sessoes[chave] = SessaoAoVivo(caminho, campeonato)
+            self._sessoes.move_to_end(chave)
+            while len(self._sessoes) > self.max_arquivos:
+                _, removida = self._sessoes.popitem(last=False)
+                removida.parar()
+            return sessao
+
+
+@st.cache_resource
+def obter_arquivos_ao_vivo() -> ArquivosAoVivo:
+    """Retorna o registro único de arquivos acompanhados do processo."""
+    return ArquivosAoVivo(MAX_ARQUIVOS_AO_VIVO)
+
+
+def obter_sessao_ao_vivo(caminho: str, campeonato: str = CAMPEONATO_AUTOMATICO) -> SessaoAoVivo:
+    """SessaoAoVivo compartilhada por (arquivo, campeonato) entre reexecuções e abas do navegador."""
+    return obter_arquivos_ao_vivo().obter(caminho, campeonato)
@@ -0,0 +1,92 @@
+"""
+Módulo de interpretação das linhas de cabeçalho dos pilotos nos CSVs de cronometragem.
+Cada campeonato tem um par de expressões regulares pré-compiladas: uma que identifica as linhas
+de cabeçalho na coluna Time of Day e outra que extrai o número do carro e o nome do piloto.
+A extração é vetorizada (Series.str.extract) e o campeonato pode ser detectado automaticamente,
+o que permite usar arquivos das categorias de suporte sem mudar o código.
+"""
+import re
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+# "12 - Lucas Foresti - <categoria>": número, nome e o sufixo da categoria (descartado)
+_PADRAO_PILOTO = r'^\s*(?P<piloto>(?P<numero>\d+)\s*-\s*(?P<nome>.+?))(?:\s+-\s+{sufixo})?\s*$'
+
+
+class ParserCabecalhoPiloto:
+    """
+    Identifica as linhas de cabeçalho de piloto e extrai número do carro e nome.
+
+    :param campeonato: Nome do campeonato (exibido na interface)
+    :param padrao_cabecalho: Regex que identifica uma linha de cabeçalho na coluna Time of Day
+    :param sufixo: Regex do sufixo da categoria removido do nome ("Stock Car Pro", ...)
+    """
+
+    def __init__(self, campeonato: str, padrao_cabecalho: str, sufixo: str = r'.+'):
+        self.campeonato = campeonato
+        self.regex_cabecalho = re.compile(padrao_cabecalho)
+        self.regex_piloto = re.compile(_PADRAO_PILOTO.format(sufixo=sufixo), re.IGNORECASE)
+
+    def mascara_cabecalho(self, serie: pd.Series) -> np.ndarray:
+        """Máscara booleana das linhas de cabeçalho de piloto em `serie` (coluna Time of Day)."""
+        return serie.str.contains(self.regex_cabecalho, na=False).to_numpy()
+
+    def extrair(self, cabecalhos: pd.Series) -> pd.DataFrame:
+        """
+        Extrai número do carro e nome do piloto das linhas de cabeçalho, em uma única passada.
+
+        :param cabecalhos: Linhas de cabeçalho (já filtradas com mascara_cabecalho)
+        :return: DataFrame com o mesmo índice e as colunas Numero (Int16), Nome e Piloto
+                 ("12 - Lucas Foresti", a chave usada em driver_info e nas constantes)
+        """
+        partes = cabecalhos.str.extract(self.regex_piloto)
+        # Cabeçalhos fora do padrão ficam com o texto inteiro como nome do piloto
+        piloto = partes['piloto'].fillna(cabecalhos.str.strip())
+        return pd.DataFrame({
+            'Numero': pd.to_numeric(partes['numero'], errors='coerce').astype('Int16'),
+            'Nome': partes['nome'].str.strip().str.title(),
+            'Piloto': piloto.str.strip().str.title(),
+        }, index=cabecalhos.index)
+
+    def __repr__(self) -> str:
+        return f"ParserCabecalhoPiloto({self.campeonato!r})"
+
+
+# Campeonatos configurados, na ordem usada pela detecção automática (o genérico por último)
+PARSERS_CABECALHO: Dict[str, ParserCabecalhoPiloto] = {
+    'Stock Car Pro': ParserCabecalhoPiloto(
+        'Stock Car Pro', r'Stock', sufixo=r'Stock Car Pro(?:\s+Rookie|\s+\d{4})?'),
+    'Turismo Nacional': ParserCabecalhoPiloto(
+        'Turismo Nacional', r'Turismo Nacional', sufixo=r'Turismo Nacional(?:\s+\w+)?'),
+    'Copa Truck': ParserCabecalhoPiloto(
+        'Copa Truck', r'Copa Truck', sufixo=r'Copa Truck(?:\s+\w+)?'),
+    # "número - nome" sem ":" (os horários das voltas sempre têm ":")
+    'Genérico': ParserCabecalhoPiloto(
+        'Genérico', r'^\s*\d+\s*-\s*[^\d\s:][^:]*$'),
+}
+
+CAMPEONATO_AUTOMATICO = 'Automático'
+CAMPEONATO_PADRAO = 'Stock Car Pro'
+
+
+def detectar_parser_cabecalho(serie: pd.Series) -> ParserCabecalhoPiloto:
+    """
+    Escolhe o primeiro campeonato configurado cujo padrão encontra cabeçalhos em `serie`
+    (normalmente o primeiro bloco do arquivo); sem nenhum, usa CAMPEONATO_PADRAO.
+    """
+    for parser in PARSERS_CABECALHO.values():
+        if parser.mascara_cabecalho(serie).any():
+            return parser
+    return PARSERS_CABECALHO[CAMPEONATO_PADRAO]
+
+
+def obter_parser_cabecalho(campeonato: str, serie: pd.Series = None) -> ParserCabecalhoPiloto:
+    """Parser do campeonato escolhido ou, em CAMPEONATO_AUTOMATICO, detectado em `serie`."""
+    if campeonato in PARSERS_CABECALHO:
+        return PARSERS_CABECALHO[campeonato]
+    if serie is None:
+        return PARSERS_CABECALHO[CAMPEONATO_PADRAO]
+    return detectar_parser_cabecalho(serie)
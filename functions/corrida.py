@@ -0,0 +1,372 @@
+"""
+Módulo de análises de corrida baseadas em matrizes NumPy.
+A MatrizVoltas guarda os tempos de volta em uma matriz densa volta × piloto, de modo
+que o GAP de todos os pilotos para qualquer referência seja uma única subtração com broadcast.
+A ReconstrucaoCorrida usa os horários de passagem pela linha para obter posição, GAP para o
+líder e intervalo para o carro à frente em todas as voltas, e o ReplayCorrida acumula esse
+estado (classificação, melhores voltas e maiores ST até cada volta) para consulta direta por volta.
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from functions.esquema import DATA_BASE_HORARIO
+
+
+# Quantidade máxima de sessões com matrizes mantidas em cache
+MAX_SESSOES_MATRIZ_EM_CACHE = 8
+
+
+class MatrizVoltas:
+    """
+    Matriz densa volta × piloto com os tempos de volta (em segundos) de uma sessão.
+
+    Atributos:
+        pilotos: Lista de pilotos (ordem das colunas)
+        voltas: Números das voltas (ordem das linhas)
+        tempos: Matriz (n_voltas, n_pilotos) com os tempos de volta; NaN onde não há registro
+        tempos_acumulados: Tempo de prova acumulado ao fim de cada volta; NaN a partir da
+            primeira volta sem registro do piloto
+        horarios: Horário de passagem pela linha ao fim de cada volta (segundos desde
+            DATA_BASE_HORARIO); NaN onde não há Time of Day
+        velocidades: ST de cada volta; NaN onde não há registro (ou sem coluna ST)
+    """
+
+    def __init__(self, df_completo: pd.DataFrame):
+        if isinstance(df_completo['Piloto'].dtype, pd.CategoricalDtype):
+            self.pilotos = [str(p) for p in df_completo['Piloto'].cat.categories]
+        else:
+            self.pilotos = list(pd.unique(df_completo['Piloto']))
+        self._indice_piloto = {piloto: j for j, piloto in enumerate(self.pilotos)}
+
+        dados = df_completo.dropna(subset=['Lap', 'Lap_seconds'])
+        laps = dados['Lap'].to_numpy(dtype=np.int64)
+        self.voltas = np.unique(laps)
+
+        linhas = np.searchsorted(self.voltas, laps)
+        colunas = pd.Categorical(dados['Piloto'], categories=self.pilotos).codes
+
+        self.tempos = np.full((len(self.voltas), len(self.pilotos)), np.nan)
+        self.tempos[linhas, colunas] = dados['Lap_seconds'].to_numpy(dtype=np.float64)
+
+        self.tempos_acumulados = np.cumsum(self.tempos, axis=0)
+
+        self.horarios = np.full_like(self.tempos, np.nan)
+        if 'Time of Day' in dados.columns and pd.api.types.is_datetime64_any_dtype(dados['Time of Day']):
+            segundos = (dados['Time of Day'] - DATA_BASE_HORARIO).dt.total_seconds()
+            self.horarios[linhas, colunas] = segundos.to_numpy(dtype=np.float64)
+
+        self.velocidades = np.full_like(self.tempos, np.nan)
+        if 'ST' in dados.columns:
+            self.velocidades[linhas, colunas] = pd.to_numeric(dados['ST'], errors='coerce').to_numpy(dtype=np.float64)
+
+    def indice_piloto(self, piloto: str) -> int:
+        """Retorna a coluna do piloto na matriz (KeyError se não existir)."""
+        return self._indice_piloto[piloto]
+
+    def gap_para_referencia(self, piloto_referencia: str, acumulado: bool = False) -> np.ndarray:
+        """
+        Calcula o GAP de todos os pilotos para o piloto de referência.
+
+        :param piloto_referencia: Piloto usado como referência
+        :param acumulado: Se True, usa o tempo de prova acumulado (diferença de tempo de corrida);
+                          se False, a diferença volta a volta
+        :return: Matriz (n_voltas, n_pilotos) com o GAP em segundos (positivo = mais lento que a referência)
+        """
+        matriz = self.tempos_acumulados if acumulado else self.tempos
+        j = self.indice_piloto(piloto_referencia)
+        return matriz - matriz[:, j:j + 1]
+
+    def para_dataframe(self, valores: np.ndarray, nome_valor: str) -> pd.DataFrame:
+        """Converte uma matriz volta × piloto em DataFrame longo (Piloto, Lap, nome_valor), sem NaN."""
+        df = pd.DataFrame({
+            'Piloto': np.tile(np.array(self.pilotos, dtype=object), len(self.voltas)),
+            'Lap': np.repeat(self.voltas, len(self.pilotos)),
+            nome_valor: valores.ravel(),
+        })
+        return df.dropna(subset=[nome_valor]).reset_index(drop=True)
+
+
+class ReconstrucaoCorrida:
+    """
+    Reconstrução da corrida volta a volta a partir dos horários de passagem pela linha.
+
+    A posição ao fim da volta L é a ordem em que os carros completaram a volta L; o GAP para o
+    líder e o intervalo para o carro à frente são as diferenças entre esses horários de passagem.
+    Quando falta o Time of Day de uma volta, o horário é estimado pela passagem anterior somada
+    ao tempo da volta (sem nenhum Time of Day, usa-se o tempo de prova acumulado).
+
+    Atributos:
+        pilotos, voltas: Mesma ordem de colunas/linhas da MatrizVoltas
+        cruzamentos: Matriz (n_voltas, n_pilotos) com o horário de passagem (s) ao fim de cada volta
+        posicoes: Posição de cada carro ao fim de cada volta (NaN se não completou a volta)
+        gap_lider: Diferença (s) para o líder ao completar a mesma volta
+        intervalo: Diferença (s) para o carro imediatamente à frente na mesma volta
+    """
+
+    def __init__(self, matriz_voltas: MatrizVoltas):
+        self.pilotos = matriz_voltas.pilotos
+        self.voltas = matriz_voltas.voltas
+        self.cruzamentos = self._calcular_cruzamentos(matriz_voltas)
+
+        n_voltas, n_pilotos = self.cruzamentos.shape
+        self.posicoes = np.full((n_voltas, n_pilotos), np.nan)
+        self.gap_lider = np.full((n_voltas, n_pilotos), np.nan)
+        self.intervalo = np.full((n_voltas, n_pilotos), np.nan)
+        if n_voltas == 0 or n_pilotos == 0:
+            return
+
+        # Ordena cada volta pelo horário de passagem (NaN fica no fim)
+        ordem = np.argsort(self.cruzamentos, axis=1, kind='stable')
+        ordenados = np.take_along_axis(self.cruzamentos, ordem, axis=1)
+        validos = ~np.isnan(ordenados)
+
+        posicoes_ordenadas = np.where(validos, np.arange(1, n_pilotos + 1, dtype=np.float64), np.nan)
+        gap_ordenado = ordenados - ordenados[:, :1]
+        intervalo_ordenado = np.concatenate(
+            [np.where(validos[:, :1], 0.0, np.nan), np.diff(ordenados, axis=1)], axis=1)
+
+        np.put_along_axis(self.posicoes, ordem, posicoes_ordenadas, axis=1)
+        np.put_along_axis(self.gap_lider, ordem, gap_ordenado, axis=1)
+        np.put_along_axis(self.intervalo, ordem, intervalo_ordenado, axis=1)
+
+    @staticmethod
+    def _calcular_cruzamentos(matriz_voltas: MatrizVoltas) -> np.ndarray:
+        """Horários de passagem pela linha, completando as lacunas do Time of Day com os tempos de volta."""
+        tempos = matriz_voltas.tempos
+        cruzamentos = matriz_voltas.horarios.copy()
+        if cruzamentos.size == 0:
+            return cruzamentos
+
+        if np.isnan(cruzamentos).all():
+            # Sem Time of Day: largada simultânea, tempo de prova acumulado
+            cruzamentos[0] = tempos[0]
+
+        for i in range(1, len(cruzamentos)):
+            faltando = np.isnan(cruzamentos[i]) & ~np.isnan(tempos[i])
+            cruzamentos[i, faltando] = cruzamentos[i - 1, faltando] + tempos[i, faltando]
+
+        return cruzamentos
+
+    def matriz_posicoes(self) -> pd.DataFrame:
+        """Matriz volta × piloto com as posições (índice = volta), usada no gráfico de posições."""
+        return pd.DataFrame(self.posicoes, index=pd.Index(self.voltas, name='Lap'), columns=self.pilotos)
+
+    def classificacao(self) -> pd.DataFrame:
+        """
+        Classificação final: mais voltas completadas primeiro e, com o mesmo número de voltas,
+        quem completou a última volta antes.
+
+        :return: DataFrame na ordem de chegada com Piloto, Voltas, Gap/Intervalo (segundos) e as voltas
+                 de diferença para o líder (Voltas_Atras) e para o carro à frente (Voltas_Atras_Intervalo);
+                 pilotos sem nenhuma volta completada ficam de fora
+        """
+        completou = ~np.isnan(self.cruzamentos)
+        tem_volta = completou.any(axis=0)
+        colunas = np.flatnonzero(tem_volta)
+        if len(colunas) == 0:
+            return pd.DataFrame(columns=['Piloto', 'Voltas', 'Voltas_Atras', 'Gap', 'Intervalo', 'Voltas_Atras_Intervalo'])
+
+        # Índice da última volta completada por piloto
+        ultima = len(self.voltas) - 1 - np.argmax(completou[::-1, colunas], axis=0)
+        voltas = self.voltas[ultima]
+        horario_final = self.cruzamentos[ultima, colunas]
+
+        ordem = np.lexsort((horario_final, -voltas))
+        colunas, ultima, voltas, horario_final = colunas[ordem], ultima[ordem], voltas[ordem], horario_final[ordem]
+
+        # Passagem do líder e do carro à frente na última volta completada por cada piloto
+        lider = colunas[0]
+        a_frente = np.concatenate([colunas[:1], colunas[:-1]])
+        gap = horario_final - self.cruzamentos[ultima, lider]
+        intervalo = horario_final - self.cruzamentos[ultima, a_frente]
+
+        return pd.DataFrame({
+            'Piloto': [self.pilotos[j] for j in colunas],
+            'Voltas': voltas,
+            'Voltas_Atras': voltas[0] - voltas,
+            'Gap': gap,
+            'Intervalo': intervalo,
+            'Voltas_Atras_Intervalo': np.concatenate([[0], -np.diff(voltas)]),
+        })
+
+
+class ReplayCorrida:
+    """
+    Estado acumulado da corrida no momento em que o líder completa cada volta, pré-calculado em
+    matrizes (n_voltas, n_pilotos) para que qualquer volta do replay seja uma consulta direta.
+
+    Em cada instante cada piloto fica com a última volta que completou até a passagem do líder;
+    a ordem é por voltas completadas e, no empate, por quem passou antes pela linha. O GAP e o
+    intervalo seguem a regra das telas de cronometragem: diferença de horário para o líder (ou o
+    carro à frente) na mesma volta, ou as voltas de diferença se ele já tinha completado mais voltas.
+
+    Atributos (linha = índice da volta do líder; colunas na ordem da classificação):
+        ordem: Coluna (piloto) de cada posição
+        voltas_completadas, ultima_volta, melhor_volta, maior_st, st_ultima_volta: Do piloto de cada posição
+        gap, voltas_atras: GAP para o líder (s) e voltas de diferença
+        intervalo, voltas_atras_intervalo: Idem para o carro imediatamente à frente
+        ordem_st: Colunas ordenadas pela maior ST até a volta (maior primeiro)
+    """
+
+    def __init__(self, reconstrucao: ReconstrucaoCorrida, matriz_voltas: MatrizVoltas):
+        self.pilotos = reconstrucao.pilotos
+        self.voltas = reconstrucao.voltas
+        n_voltas, n_pilotos = reconstrucao.cruzamentos.shape
+        self.n_voltas = n_voltas
+        if n_voltas == 0 or n_pilotos == 0:
+            vazio = np.empty((0, n_pilotos))
+            self.ordem = self.ordem_st = vazio.astype(np.int64)
+            self.voltas_completadas = self.voltas_atras = self.voltas_atras_intervalo = vazio.astype(np.int64)
+            self.gap = self.intervalo = self.ultima_volta = self.melhor_volta = vazio
+            self.maior_st = self.st_ultima_volta = self.maior_st_pilotos = vazio
+            self.horario_lider = np.empty(0)
+            return
+
+        # Horários de passagem não decrescentes por piloto (passagens sem horário não contam)
+        cruzamentos = np.where(np.isnan(reconstrucao.cruzamentos), np.inf, reconstrucao.cruzamentos)
+        cruzamentos = np.maximum.accumulate(cruzamentos, axis=0)
+        with np.errstate(all='ignore'):
+            self.horario_lider = np.fmin.reduce(reconstrucao.cruzamentos, axis=1)
+
+        # Voltas completadas por cada piloto até a passagem do líder em cada volta
+        completadas = self._voltas_ate(cruzamentos, np.arange(n_pilotos), self.horario_lider[:, None])
+        ultima = completadas - 1
+        tem_volta = ultima >= 0
+        indice_ultima = np.maximum(ultima, 0)
+        colunas = np.arange(n_pilotos)
+        horario = np.where(tem_volta, cruzamentos[indice_ultima, colunas], np.inf)
+
+        # Classificação: mais voltas primeiro e, no empate, quem passou antes
+        ordem = np.lexsort((horario, -completadas), axis=-1)
+        self.ordem = ordem
+        ultima_ordenada = np.take_along_axis(ultima, ordem, axis=1)
+        horario_ordenado = np.take_along_axis(horario, ordem, axis=1)
+        self.voltas_completadas = ultima_ordenada + 1
+
+        self.gap, self.voltas_atras = self._diferenca_para(
+            cruzamentos, ultima_ordenada, horario_ordenado, ordem[:, :1], self.voltas_completadas[:, :1])
+        a_frente = np.concatenate([ordem[:, :1], ordem[:, :-1]], axis=1)
+        voltas_a_frente = np.concatenate([self.voltas_completadas[:, :1], self.voltas_completadas[:, :-1]], axis=1)
+        self.intervalo, self.voltas_atras_intervalo = self._diferenca_para(
+            cruzamentos, ultima_ordenada, horario_ordenado, a_frente, voltas_a_frente)
+
+        # Melhor volta e maior ST acumuladas até a última volta completada de cada piloto
+        with np.errstate(all='ignore'):
+            melhor = np.fmin.accumulate(matriz_voltas.tempos, axis=0)
+            maior_st = np.fmax.accumulate(matriz_voltas.velocidades, axis=0)
+        linhas = np.maximum(ultima_ordenada, 0)
+        sem_volta = ultima_ordenada < 0
+        self.ultima_volta = np.where(sem_volta, np.nan, matriz_voltas.tempos[linhas, ordem])
+        self.melhor_volta = np.where(sem_volta, np.nan, melhor[linhas, ordem])
+        self.maior_st = np.where(sem_volta, np.nan, maior_st[linhas, ordem])
+        self.st_ultima_volta = np.where(sem_volta, np.nan, matriz_voltas.velocidades[linhas, ordem])
+
+        # Ranking de ST (por piloto, não por posição)
+        maior_st_pilotos = np.full((n_voltas, n_pilotos), np.nan)
+        np.put_along_axis(maior_st_pilotos, ordem, self.maior_st, axis=1)
+        self.maior_st_pilotos = maior_st_pilotos
+        self.ordem_st = np.argsort(np.where(np.isnan(maior_st_pilotos), -np.inf, -maior_st_pilotos),
+                                   axis=1, kind='stable')
+
+    @staticmethod
+    def _diferenca_para(cruzamentos: np.ndarray, ultima: np.ndarray, horario: np.ndarray,
+                        referencia: np.ndarray, voltas_referencia_agora: np.ndarray):
+        """
+        Diferença de horário para o piloto de referência na mesma volta, ou as voltas de diferença:
+        as que a referência já tinha completado a mais na última passagem do piloto ou, para quem
+        parou na pista, as completadas desde então.
+        """
+        referencia = np.broadcast_to(referencia, ultima.shape)
+        voltas_referencia = ReplayCorrida._voltas_ate(cruzamentos, referencia, horario)
+        voltas = ultima + 1
+        voltas_atras = np.maximum(np.maximum(voltas_referencia - voltas, voltas_referencia_agora - voltas - 1), 0)
+
+        linhas = np.maximum(ultima, 0)
+        diferenca = horario - cruzamentos[linhas, referencia]
+        valida = (ultima >= 0) & (voltas_atras == 0) & np.isfinite(diferenca) & (diferenca >= 0)
+        return np.where(valida, diferenca, np.nan), voltas_atras
+
+    @staticmethod
+    def _voltas_ate(cruzamentos: np.ndarray, colunas: np.ndarray, horarios: np.ndarray) -> np.ndarray:
+        """Voltas completadas pelo piloto `colunas` até `horarios` (busca binária por piloto)."""
+        colunas, horarios = np.broadcast_arrays(colunas, horarios)
+        voltas = np.zeros(colunas.shape, dtype=np.int64)
+        for j in np.unique(colunas):
+            mascara = colunas == j
+            voltas[mascara] = np.searchsorted(cruzamentos[:, j], horarios[mascara], side='right')
+        return voltas
+
+    def indice_volta(self, volta: int) -> int:
+        """Linha da volta `volta` do líder (a última volta anterior, se não houver registro dela)."""
+        return int(np.clip(np.searchsorted(self.voltas, volta, side='right') - 1, 0, max(self.n_voltas - 1, 0)))
+
+    def classificacao(self, indice: int) -> pd.DataFrame:
+        """
+        Classificação no momento em que o líder completa a volta de índice `indice` (só indexação).
+
+        :return: DataFrame na ordem de posição com Piloto, Voltas, Gap, Voltas_Atras, Intervalo,
+                 Voltas_Atras_Intervalo, Ultima_Volta, Melhor_Volta, ST e Maior_ST; pilotos sem
+                 nenhuma volta completada ficam de fora
+        """
+        ordem = self.ordem[indice]
+        voltas = self.voltas_completadas[indice]
+        com_volta = voltas > 0
+        return pd.DataFrame({
+            'Piloto': [self.pilotos[j] for j in ordem[com_volta]],
+            'Voltas': voltas[com_volta],
+            'Gap': self.gap[indice, com_volta],
+            'Voltas_Atras': self.voltas_atras[indice, com_volta],
+            'Intervalo': self.intervalo[indice, com_volta],
+            'Voltas_Atras_Intervalo': self.voltas_atras_intervalo[indice, com_volta],
+            'Ultima_Volta': self.ultima_volta[indice, com_volta],
+            'Melhor_Volta': self.melhor_volta[indice, com_volta],
+            'ST': self.st_ultima_volta[indice, com_volta],
+            'Maior_ST': self.maior_st[indice, com_volta],
+        })
+
+    def ranking_st(self, indice: int) -> pd.DataFrame:
+        """Maior ST de cada piloto até a volta de índice `indice`, da maior para a menor."""
+        ordem = self.ordem_st[indice]
+        valores = self.maior_st_pilotos[indice, ordem]
+        validos = ~np.isnan(valores)
+        return pd.DataFrame({
+            'Piloto': [self.pilotos[j] for j in ordem[validos]],
+            'Maior_ST': valores[validos],
+        })
+
+
+def montar_matriz_voltas(driver_info: Dict[str, pd.DataFrame]) -> MatrizVoltas:
+    """Monta a MatrizVoltas diretamente do dicionário de pilotos."""
+    from functions.utils import montar_dataframe_completo
+    return MatrizVoltas(montar_dataframe_completo(driver_info))
+
+
+@st.cache_resource(max_entries=MAX_SESSOES_MATRIZ_EM_CACHE, show_spinner=False)
+def obter_matriz_voltas(chave_sessao: str, _driver_info: Dict[str, pd.DataFrame]) -> MatrizVoltas:
+    """
+    Retorna a MatrizVoltas da sessão, construída uma única vez e compartilhada (somente leitura).
+
+    Args:
+        chave_sessao: Identificador da sessão (hash do arquivo ou ID da sessão salva)
+        _driver_info: Dicionário de DataFrames por piloto
+
+    Returns:
+        MatrizVoltas: Matriz volta × piloto da sessão
+    """
+    return montar_matriz_voltas(_driver_info)
+
+
+@st.cache_resource(max_entries=MAX_SESSOES_MATRIZ_EM_CACHE, show_spinner=False)
+def obter_reconstrucao_corrida(chave_sessao: str, _driver_info: Dict[str, pd.DataFrame]) -> ReconstrucaoCorrida:
+    """Retorna a ReconstrucaoCorrida da sessão, calculada uma única vez sobre a MatrizVoltas em cache."""
+    return ReconstrucaoCorrida(obter_matriz_voltas(chave_sessao, _driver_info))
+
+
+@st.cache_resource(max_entries=MAX_SESSOES_MATRIZ_EM_CACHE, show_spinner=False)
+def obter_replay_corrida(chave_sessao: str, _driver_info: Dict[str, pd.DataFrame]) -> ReplayCorrida:
+    """Retorna o ReplayCorrida da sessão, pré-calculado uma única vez sobre a reconstrução em cache."""
+    return ReplayCorrida(obter_reconstrucao_corrida(chave_sessao, _driver_info),
+                         obter_matriz_voltas(chave_sessao, _driver_info))
@@ -7,13 +7,21 @@ import pandas as pd
 import json
 import pickle
 import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 import streamlit as st
 
+from functions.esquema import compactar_dataframe_bruto, compactar_driver_info
+from functions.ingestao import enriquecer_voltas
+
 
 DB_PATH = "amm_timing.db"
 
+# Limite de memória do cache de sessões compartilhado entre os usuários (em bytes)
+LIMITE_CACHE_SESSOES_BYTES = 512 * 1024 * 1024
+
 
 def get_connection():
     """Cria e retorna uma conexão com o banco de dados."""
@@ -233,12 +241,119 @@ def buscar_sessao_por_id(sessao_id: int) -> Optional[Dict[str, Any]]:
                 st.warning(f"Erro ao deserializar dados do tipo '{tipo_dado}': {e}")
             dados_processados[tipo_dado] = None
     
+    # Reaplicar o esquema compacto (o JSON não preserva os tipos)
+    if isinstance(dados_processados.get('df_original'), pd.DataFrame):
+        dados_processados['df_original'] = compactar_dataframe_bruto(dados_processados['df_original'])
+    if isinstance(dados_processados.get('driver_info'), dict):
+        dados_processados['driver_info'] = enriquecer_voltas(compactar_driver_info(dados_processados['driver_info']))
+    
     sessao['dados_processados'] = dados_processados
     conn.close()
     
     return sessao
 
 
+def calcular_tamanho_sessao(sessao: Dict[str, Any]) -> int:
+    """
+    Estima a memória ocupada pelos dados processados de uma sessão.
+    
+    Args:
+        sessao: Dicionário retornado por buscar_sessao_por_id
+    
+    Returns:
+        int: Tamanho aproximado em bytes
+    """
+    def tamanho(obj) -> int:
+        if isinstance(obj, pd.DataFrame):
+            return int(obj.memory_usage(index=True, deep=True).sum())
+        if isinstance(obj, dict):
+            return sum(tamanho(valor) for valor in obj.values())
+        if isinstance(obj, (list, tuple)):
+            return sum(tamanho(valor) for valor in obj)
+        return len(str(obj))
+    
+    return tamanho(sessao.get('dados_processados', {}))
+
+
+class CacheSessoes:
+    """
+    Cache LRU de sessões decodificadas, compartilhado por todos os usuários do processo.
+    A remoção é feita pela sessão menos usada recentemente até o total caber em limite_bytes.
+    As sessões em cache são compartilhadas e não devem ser modificadas por quem as lê.
+    """
+    
+    def __init__(self, limite_bytes: int):
+        self.limite_bytes = limite_bytes
+        self.total_bytes = 0
+        self._sessoes = OrderedDict()  # sessao_id -> (sessao, tamanho em bytes)
+        self._lock = threading.Lock()
+    
+    def obter(self, sessao_id: int) -> Optional[Dict[str, Any]]:
+        """Retorna a sessão em cache (marcando-a como usada recentemente) ou None."""
+        with self._lock:
+            item = self._sessoes.get(sessao_id)
+            if item is None:
+                return None
+            self._sessoes.move_to_end(sessao_id)
+            return item[0]
+    
+    def inserir(self, sessao_id: int, sessao: Dict[str, Any]):
+        """Adiciona uma sessão ao cache, removendo as menos usadas se o limite for excedido."""
+        tamanho = calcular_tamanho_sessao(sessao)
+        if tamanho > self.limite_bytes:
+            # Sessão maior que o cache inteiro: não armazena
+            return
+        
+        with self._lock:
+            if sessao_id in self._sessoes:
+                self.total_bytes -= self._sessoes.pop(sessao_id)[1]
+            self._sessoes[sessao_id] = (sessao, tamanho)
+            self.total_bytes += tamanho
+            
+            while self.total_bytes > self.limite_bytes:
+                _, (_, tamanho_removido) = self._sessoes.popitem(last=False)
+                self.total_bytes -= tamanho_removido
+    
+    def invalidar(self, sessao_id: int):
+        """Remove uma sessão do cache (por exemplo, após ser excluída do banco)."""
+        with self._lock:
+            item = self._sessoes.pop(sessao_id, None)
+            if item is not None:
+                self.total_bytes -= item[1]
+    
+    def limpar(self):
+        """Remove todas as sessões do cache."""
+        with self._lock:
+            self._sessoes.clear()
+            self.total_bytes = 0
+
+
+@st.cache_resource
+def obter_cache_sessoes() -> CacheSessoes:
+    """Retorna o cache de sessões único do processo (compartilhado entre usuários)."""
+    return CacheSessoes(LIMITE_CACHE_SESSOES_BYTES)
+
+
+def carregar_sessao(sessao_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Retorna uma sessão pelo ID usando o cache compartilhado.
+    A sessão só é lida e decodificada do banco quando não está em cache.
+    
+    Args:
+        sessao_id: ID da sessão
+    
+    Returns:
+        Dicionário com metadados e dados processados, ou None se não encontrada
+    """
+    cache = obter_cache_sessoes()
+    sessao = cache.obter(sessao_id)
+    if sessao is None:
+        sessao = buscar_sessao_por_id(sessao_id)
+        if sessao is not None:
+            cache.inserir(sessao_id, sessao)
+    return sessao
+
+
 def excluir_sessao(sessao_id: int) -> bool:
     """
     Exclui uma sessão e todos os seus dados processados.
@@ -261,6 +376,7 @@ def excluir_sessao(sessao_id: int) -> bool:
         
         conn.commit()
         conn.close()
+        obter_cache_sessoes().invalidar(sessao_id)
         return cursor.rowcount > 0
     except Exception as e:
         conn.rollback()
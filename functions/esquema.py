@@ -0,0 +1,172 @@
+"""
+Esquema canônico (tipos compactos) dos dados de volta mantidos em memória.
+Lap em int16, tempos de volta/setores em segundos float32, ST em float32,
+Piloto/Montadora/Equipe como categorias e Time of Day em datetime64.
+O esquema é aplicado na ingestão e novamente ao carregar sessões do banco de dados.
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+COLUNAS_TEMPO = ['Lap Tm', 'S1 Tm', 'S2 Tm', 'S3 Tm']
+COLUNAS_CATEGORICAS = ['Piloto', 'Montadora', 'Equipe']
+
+ESQUEMA_VOLTAS = {
+    'Lap': 'int16',
+    'Lap Tm': 'float32',
+    'S1 Tm': 'float32',
+    'S2 Tm': 'float32',
+    'S3 Tm': 'float32',
+    'ST': 'float32',
+    'Time of Day': 'datetime64[ns]',
+}
+
+# Data usada para os horários sem data (ex.: "14:03:22.123"), a mesma do datetime.strptime
+DATA_BASE_HORARIO = pd.Timestamp('1900-01-01')
+
+# Tempo no formato "m:ss.mmm" ou "ss.mmm"
+_PADRAO_TEMPO = r'^\s*(?:(\d+):)?(\d+(?:\.\d*)?)\s*$'
+
+
+def tempos_para_segundos(serie: pd.Series) -> pd.Series:
+    """
+    Converte uma coluna de tempos ("1:32.456", "32.456" ou já numérica) para segundos em float32.
+    Valores que não puderem ser interpretados viram NaN.
+
+    :param serie: Série com os tempos
+    :return: Série float32 com os tempos em segundos
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype('float32')
+
+    partes = serie.astype('string').str.extract(_PADRAO_TEMPO)
+    minutos = pd.to_numeric(partes[0], errors='coerce').fillna(0)
+    segundos = pd.to_numeric(partes[1], errors='coerce')
+    return (minutos * 60 + segundos).astype('float32')
+
+
+def horarios_para_datetime(serie: pd.Series) -> pd.Series:
+    """
+    Converte a coluna Time of Day para datetime64.
+    Horários sem data ("14:03:22.123") recebem DATA_BASE_HORARIO; textos com data completa
+    (como os salvos no banco) são interpretados diretamente.
+
+    :param serie: Série com os horários
+    :return: Série datetime64[ns]
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.astype('datetime64[ns]')
+
+    texto = serie.astype('string').str.strip()
+    resultado = DATA_BASE_HORARIO + pd.to_timedelta(texto, errors='coerce')
+
+    faltando = resultado.isna() & texto.notna()
+    if faltando.any():
+        resultado[faltando] = pd.to_datetime(texto[faltando], errors='coerce', format='mixed')
+
+    return resultado.astype('datetime64[ns]')
+
+
+def compactar_voltas(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplica o esquema canônico a um DataFrame de voltas (de um piloto ou de todos).
+    Colunas ausentes são ignoradas; linhas sem número de volta válido são descartadas.
+
+    :param df: DataFrame de voltas
+    :return: Novo DataFrame com os tipos compactos
+    """
+    df = df.copy()
+
+    if 'Lap' in df.columns:
+        df['Lap'] = pd.to_numeric(df['Lap'], errors='coerce')
+        df = df.dropna(subset=['Lap'])
+        df['Lap'] = df['Lap'].astype(ESQUEMA_VOLTAS['Lap'])
+
+    for coluna in COLUNAS_TEMPO:
+        if coluna in df.columns:
+            df[coluna] = tempos_para_segundos(df[coluna])
+
+    if 'ST' in df.columns:
+        df['ST'] = pd.to_numeric(df['ST'], errors='coerce').astype(ESQUEMA_VOLTAS['ST'])
+
+    if 'Time of Day' in df.columns:
+        df['Time of Day'] = horarios_para_datetime(df['Time of Day'])
+
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in df.columns and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].astype('category')
+
+    return df.reset_index(drop=True)
+
+
+def compactar_driver_info(driver_info: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Aplica o esquema canônico a cada DataFrame do dicionário de pilotos.
+
+    :param driver_info: Dicionário {piloto: DataFrame de voltas}
+    :return: Novo dicionário com os DataFrames compactados
+    """
+    return {
+        piloto: compactar_voltas(dados) if isinstance(dados, pd.DataFrame) else dados
+        for piloto, dados in driver_info.items()
+    }
+
+
+def compactar_dataframe_bruto(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compacta o DataFrame bruto do CSV (que ainda contém as linhas de cabeçalho dos pilotos
+    em 'Time of Day'). Lap vira Int16 (nulo nas linhas de cabeçalho), tempos viram segundos
+    float32 e ST float32; 'Time of Day' é mantida como texto por conter os nomes dos pilotos.
+
+    :param df: DataFrame bruto
+    :return: Novo DataFrame com os tipos compactos
+    """
+    df = df.copy()
+
+    if 'Lap' in df.columns:
+        df['Lap'] = pd.to_numeric(df['Lap'], errors='coerce').round().astype('Int16')
+
+    for coluna in COLUNAS_TEMPO:
+        if coluna in df.columns:
+            df[coluna] = tempos_para_segundos(df[coluna])
+
+    if 'ST' in df.columns:
+        df['ST'] = pd.to_numeric(df['ST'], errors='coerce').astype(ESQUEMA_VOLTAS['ST'])
+
+    return df
+
+
+def formatar_tempo(segundos) -> str:
+    """Formata um tempo em segundos como "m:ss.mmm" (ou "ss.mmm" abaixo de um minuto)."""
+    if pd.isna(segundos):
+        return ''
+    milesimos = int(round(float(segundos) * 1000))
+    minutos, milesimos = divmod(milesimos, 60000)
+    if minutos:
+        return f"{minutos}:{milesimos // 1000:02d}.{milesimos % 1000:03d}"
+    return f"{milesimos // 1000}.{milesimos % 1000:03d}"
+
+
+def formatar_voltas_para_exibicao(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Retorna uma cópia do DataFrame de voltas com os tempos no formato "m:ss.mmm"
+    e o Time of Day como "HH:MM:SS.mmm", para exibição em tabelas.
+
+    :param df: DataFrame de voltas no esquema canônico
+    :return: DataFrame formatado para exibição
+    """
+    df = df.copy()
+
+    for coluna in COLUNAS_TEMPO:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].map(formatar_tempo)
+
+    if 'Time of Day' in df.columns and pd.api.types.is_datetime64_any_dtype(df['Time of Day']):
+        df['Time of Day'] = df['Time of Day'].dt.strftime('%H:%M:%S.%f').str[:-3]
+
+    if 'ST' in df.columns:
+        df['ST'] = df['ST'].astype(np.float64).round(1)
+
+    return df
@@ -0,0 +1,199 @@
+"""
+Módulo de estatísticas robustas e filtros de outliers usados pelos gráficos.
+As estatísticas de cada grupo (mediana, MAD, quartis, mínimo e máximo) são calculadas de uma vez
+por (dados, agrupador) e as máscaras de cada (regra, parâmetro) ficam memorizadas, de modo que
+mover um slider só compara vetores já calculados.
+Também resume cada grupo em uma caixa (quartis, bigodes e outliers limitados) para que os
+boxplots possam ser montados sem enviar todas as amostras ao navegador.
+"""
+import hashlib
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+# Regras de outlier disponíveis (rótulo exibido -> regra)
+REGRAS_OUTLIER = {
+    '% acima do melhor': 'percentual_melhor',
+    'Mediana ± k·MAD': 'mad',
+    'IQR (Tukey)': 'iqr',
+}
+
+# Fator que torna o MAD comparável ao desvio padrão em dados normais
+ESCALA_MAD = 1.4826
+
+# Quantidade máxima de conjuntos de estatísticas mantidos em cache
+MAX_ESTATISTICAS_EM_CACHE = 64
+
+# Fator do IQR que define os bigodes do boxplot (mesmo critério padrão do Plotly)
+FATOR_BIGODE = 1.5
+# Quantidade máxima de pontos de outlier enviados por caixa (os mais extremos)
+MAX_OUTLIERS_POR_CAIXA = 30
+# Acima desta quantidade de amostras os boxplots usam as estatísticas calculadas no servidor
+LIMITE_AMOSTRAS_BOXPLOT = 2000
+
+
+class EstatisticasGrupo:
+    """
+    Estatísticas robustas de uma coluna por grupo, com máscaras de outliers memorizadas.
+
+    Regras (parametro):
+        'percentual_melhor': valor <= mínimo do grupo × parametro (ex.: 1.05 = até 5% acima do melhor)
+        'percentual_maximo': valor >= máximo do grupo × parametro (ex.: 0.85 para velocidades)
+        'mad': |valor - mediana| <= parametro × 1.4826 × MAD
+        'iqr': Q1 - parametro × IQR <= valor <= Q3 + parametro × IQR
+    Valores NaN nunca passam pelo filtro.
+    """
+
+    def __init__(self, valores: np.ndarray, codigos: np.ndarray):
+        self.valores = np.asarray(valores, dtype=np.float64)
+        self.codigos = codigos
+        self._mascaras: Dict[Tuple[str, float], np.ndarray] = {}
+        self._caixas: Dict[Tuple[float, int], Tuple[pd.DataFrame, pd.DataFrame]] = {}
+
+        serie = pd.Series(self.valores)
+        grupos = serie.groupby(codigos)
+        estatisticas = grupos.agg(['median', 'min', 'max'])
+        estatisticas['q1'] = grupos.quantile(0.25)
+        estatisticas['q3'] = grupos.quantile(0.75)
+
+        # MAD: mediana do desvio absoluto em relação à mediana do grupo
+        mediana_linha = estatisticas['median'].reindex(codigos).to_numpy()
+        estatisticas['mad'] = pd.Series(np.abs(self.valores - mediana_linha)).groupby(codigos).median()
+
+        # Estatísticas do grupo de cada linha (broadcast pelo código do grupo)
+        self.por_linha = {coluna: estatisticas[coluna].reindex(codigos).to_numpy() for coluna in estatisticas.columns}
+        self.por_grupo = estatisticas
+
+    def mascara(self, regra: str, parametro: float) -> np.ndarray:
+        """Máscara booleana (True = mantém) para a regra e o parâmetro, memorizada por (regra, parâmetro)."""
+        chave = (regra, float(parametro))
+        if chave not in self._mascaras:
+            x, est = self.valores, self.por_linha
+            if regra == 'percentual_melhor':
+                mascara = x <= est['min'] * parametro
+            elif regra == 'percentual_maximo':
+                mascara = x >= est['max'] * parametro
+            elif regra == 'mad':
+                mascara = np.abs(x - est['median']) <= parametro * ESCALA_MAD * est['mad']
+            elif regra == 'iqr':
+                iqr = est['q3'] - est['q1']
+                mascara = (x >= est['q1'] - parametro * iqr) & (x <= est['q3'] + parametro * iqr)
+            else:
+                raise ValueError(f"Regra de outlier desconhecida: {regra}")
+            self._mascaras[chave] = mascara
+        return self._mascaras[chave]
+
+    def caixas(self, fator: float = FATOR_BIGODE,
+               max_outliers: int = MAX_OUTLIERS_POR_CAIXA) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Estatísticas de boxplot de cada grupo, memorizadas por (fator, max_outliers).
+
+        Os bigodes vão até o valor mais extremo dentro de [Q1 - fator·IQR, Q3 + fator·IQR]
+        (como no Plotly) e, de cada grupo, só os `max_outliers` pontos mais distantes dos
+        bigodes são mantidos.
+
+        :return: (caixas, outliers)
+                 caixas: índice = código do grupo; colunas q1, median, q3, lowerfence, upperfence e n
+                 outliers: colunas codigo e valor
+        """
+        chave = (float(fator), int(max_outliers))
+        if chave not in self._caixas:
+            x, est = self.valores, self.por_linha
+            iqr = est['q3'] - est['q1']
+            dentro = (x >= est['q1'] - fator * iqr) & (x <= est['q3'] + fator * iqr)
+
+            caixas = self.por_grupo[['q1', 'median', 'q3']].copy()
+            valores_dentro = pd.Series(np.where(dentro, x, np.nan))
+            caixas['lowerfence'] = valores_dentro.groupby(self.codigos).min()
+            caixas['upperfence'] = valores_dentro.groupby(self.codigos).max()
+            caixas['n'] = pd.Series(x).groupby(self.codigos).count()
+            caixas = caixas.dropna(subset=['median'])
+
+            # Outliers: os mais distantes do bigode primeiro, limitados por grupo
+            fora = ~dentro & ~np.isnan(x)
+            distancia = np.maximum(est['q1'][fora] - x[fora], x[fora] - est['q3'][fora])
+            outliers = pd.DataFrame({'codigo': self.codigos[fora], 'valor': x[fora], 'distancia': distancia})
+            outliers = outliers.sort_values(['codigo', 'distancia'], ascending=[True, False], kind='stable')
+            outliers = outliers[outliers.groupby('codigo').cumcount() < max_outliers]
+
+            self._caixas[chave] = (caixas, outliers[['codigo', 'valor']].reset_index(drop=True))
+        return self._caixas[chave]
+
+
+def _codigos_grupo(df: pd.DataFrame, agrupador: Optional[str]) -> np.ndarray:
+    """Código inteiro do grupo de cada linha (um único grupo quando não há agrupador)."""
+    if agrupador is None:
+        return np.zeros(len(df), dtype=np.int64)
+    return df.groupby(agrupador, observed=True, sort=False).ngroup().to_numpy()
+
+
+@st.cache_resource(max_entries=MAX_ESTATISTICAS_EM_CACHE, show_spinner=False)
+def _estatisticas_em_cache(chave: str, _valores: np.ndarray, _codigos: np.ndarray) -> EstatisticasGrupo:
+    """EstatisticasGrupo compartilhada por chave de conteúdo (valores + grupos)."""
+    return EstatisticasGrupo(_valores, _codigos)
+
+
+def obter_estatisticas(df: pd.DataFrame, coluna: str, agrupador: Optional[str] = None) -> EstatisticasGrupo:
+    """
+    Retorna as estatísticas de `coluna` por `agrupador`, reaproveitadas enquanto os dados não mudarem.
+
+    :param df: DataFrame com a coluna e o agrupador
+    :param coluna: Coluna numérica analisada
+    :param agrupador: Coluna de grupo (None = todos os dados em um grupo)
+    :return: EstatisticasGrupo com as máscaras memorizadas
+    """
+    valores = pd.to_numeric(df[coluna], errors='coerce').to_numpy(dtype=np.float64)
+    codigos = _codigos_grupo(df, agrupador)
+
+    # Chave de conteúdo: valores, grupos e nomes das colunas
+    hasher = hashlib.sha256(f"{coluna}|{agrupador}".encode())
+    hasher.update(valores.tobytes())
+    hasher.update(codigos.tobytes())
+    chave = hasher.hexdigest()
+    return _estatisticas_em_cache(chave, valores, codigos)
+
+
+def mascara_outliers(df: pd.DataFrame, coluna: str, regra: str, parametro: float,
+                     agrupador: Optional[str] = None) -> np.ndarray:
+    """
+    Máscara booleana das linhas de `df` que NÃO são outliers de `coluna` segundo a regra.
+
+    :param df: DataFrame analisado
+    :param coluna: Coluna numérica (tempo ou velocidade)
+    :param regra: 'percentual_melhor', 'percentual_maximo', 'mad' ou 'iqr' (ver EstatisticasGrupo)
+    :param parametro: Parâmetro da regra (multiplicador, fator k do MAD ou do IQR)
+    :param agrupador: Coluna de grupo das estatísticas (None = todos os dados juntos)
+    :return: Array booleano alinhado às linhas de df
+    """
+    return obter_estatisticas(df, coluna, agrupador).mascara(regra, parametro)
+
+
+def resumo_boxplot(df: pd.DataFrame, coluna: str, agrupador: str, fator: float = FATOR_BIGODE,
+                   max_outliers: int = MAX_OUTLIERS_POR_CAIXA) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Resume `coluna` em uma caixa por valor de `agrupador` (na ordem de aparição em df).
+
+    :param df: DataFrame com a coluna e o agrupador
+    :param coluna: Coluna numérica (tempo ou velocidade)
+    :param agrupador: Coluna que define as caixas (ex.: Piloto ou Montadora)
+    :param fator: Fator do IQR dos bigodes
+    :param max_outliers: Quantidade máxima de outliers mantidos por caixa
+    :return: (caixas, outliers)
+             caixas: agrupador, q1, median, q3, lowerfence, upperfence e n
+             outliers: agrupador e valor
+    """
+    estatisticas = obter_estatisticas(df, coluna, agrupador)
+    caixas, outliers = estatisticas.caixas(fator, max_outliers)
+
+    # Nome de cada grupo a partir da primeira linha com o código
+    codigos, primeira = np.unique(estatisticas.codigos, return_index=True)
+    nomes = pd.Series(df[agrupador].to_numpy()[primeira], index=codigos)
+
+    caixas = caixas.reset_index(drop=False).rename(columns={'index': 'codigo'})
+    caixas.insert(0, agrupador, nomes.reindex(caixas['codigo']).to_numpy())
+    outliers = pd.DataFrame({agrupador: nomes.reindex(outliers['codigo']).to_numpy(),
+                             'valor': outliers['valor'].to_numpy()})
+    return caixas.drop(columns='codigo'), outliers
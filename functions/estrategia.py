@@ -0,0 +1,267 @@
+"""
+Módulo de simulação de estratégia de corrida (Monte Carlo).
+O ritmo de cada piloto vem do ajuste de degradação por stint (functions.ritmo): ritmo base,
+degradação por volta de pneu e dispersão volta a volta. Milhares de corridas são simuladas como
+tensores NumPy (simulações × pilotos × voltas), sem laço por volta: volta de parada, perda no box
+e um safety car aleatório por corrida (que reagrupa o pelotão e barateia a parada). O resultado é
+a distribuição de posições de chegada de cada piloto.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from functions.ritmo import ajustar_degradacao
+
+
+# Perda de tempo (s) de uma parada no box em bandeira verde
+PERDA_BOX_PADRAO = 25.0
+
+# Probabilidade de haver um safety car na corrida e sua duração (voltas)
+PROB_SAFETY_CAR_PADRAO = 0.3
+DURACAO_SAFETY_CAR_PADRAO = 4
+
+# Volta sob safety car: fator sobre o ritmo base mediano; parada sob safety car: fator sobre a perda no box
+FATOR_VOLTA_SAFETY_CAR = 1.4
+FATOR_BOX_SAFETY_CAR = 0.5
+
+# Distância (s) entre carros na relargada e entre posições do grid na largada
+INTERVALO_RELARGADA = 0.5
+INTERVALO_GRID = 0.3
+
+# Simulações por lote (limita a memória dos tensores simulações × pilotos × voltas)
+SIMULACOES_POR_LOTE = 2000
+
+# Quantidade máxima de simulações (sessão, parâmetros) mantidas em cache
+MAX_SIMULACOES_EM_CACHE = 8
+
+
+def montar_modelo_ritmo(driver_info: Dict[str, pd.DataFrame], efeito_combustivel: float = 0.0) -> pd.DataFrame:
+    """
+    Ritmo de cada piloto para a simulação, a partir do ajuste linear de degradação por stint.
+
+    Pilotos sem nenhum stint ajustável usam a mediana das próprias voltas como ritmo base e a
+    degradação/dispersão medianas dos demais.
+
+    :param driver_info: Dicionário {piloto: DataFrame de voltas}, com as colunas de stint se detectadas
+    :param efeito_combustivel: Ganho de tempo por volta devido ao combustível (s/volta), como no ajuste
+    :return: DataFrame com Piloto, Ritmo_Base (s), Degradacao (s/volta de pneu), Desvio (s) e
+             Grid (ordem de passagem na primeira volta)
+    """
+    coeficientes, _ = ajustar_degradacao(driver_info, grau=1, efeito_combustivel=efeito_combustivel)
+    coeficientes = coeficientes.dropna(subset=['Intercepto'])
+
+    # Média dos stints ponderada pelo número de voltas de cada um
+    peso = coeficientes['Voltas'].to_numpy(dtype=np.float64)
+    ponderado = coeficientes.assign(
+        Ritmo_Base=coeficientes['Intercepto'] * peso,
+        Degradacao=coeficientes['Degradacao'] * peso,
+        Variancia=coeficientes['RMSE'] ** 2 * peso,
+        Peso=peso,
+    ).groupby('Piloto', sort=False)[['Ritmo_Base', 'Degradacao', 'Variancia', 'Peso']].sum()
+    modelo = pd.DataFrame({
+        'Ritmo_Base': ponderado['Ritmo_Base'] / ponderado['Peso'],
+        'Degradacao': ponderado['Degradacao'] / ponderado['Peso'],
+        'Desvio': np.sqrt(ponderado['Variancia'] / ponderado['Peso']),
+    })
+
+    pilotos = [piloto for piloto, voltas in driver_info.items()
+               if isinstance(voltas, pd.DataFrame) and voltas['Lap Tm'].notna().any()]
+    modelo = modelo.reindex(pilotos)
+    sem_ajuste = modelo['Ritmo_Base'].isna()
+    if sem_ajuste.any():
+        medianas = pd.Series({piloto: float(driver_info[piloto]['Lap Tm'].median()) for piloto in pilotos})
+        modelo.loc[sem_ajuste, 'Ritmo_Base'] = medianas[sem_ajuste]
+        modelo['Degradacao'] = modelo['Degradacao'].fillna(modelo['Degradacao'].median()).fillna(0.0)
+        modelo['Desvio'] = modelo['Desvio'].fillna(modelo['Desvio'].median()).fillna(0.0)
+
+    # Grid: ordem de passagem ao fim da primeira volta (sem horário, ordem do ritmo base)
+    primeira_passagem = pd.Series({
+        piloto: driver_info[piloto].loc[driver_info[piloto]['Lap'] == driver_info[piloto]['Lap'].min(),
+                                        'Time of Day'].min()
+        if 'Time of Day' in driver_info[piloto].columns else pd.NaT
+        for piloto in pilotos
+    }, dtype='datetime64[ns]')
+    chave_grid = primeira_passagem.rank(method='first') if primeira_passagem.notna().all() \
+        else modelo['Ritmo_Base'].rank(method='first')
+    modelo['Grid'] = chave_grid.astype(int).to_numpy()
+
+    return modelo.rename_axis('Piloto').reset_index()
+
+
+class SimuladorEstrategia:
+    """
+    Simulação Monte Carlo de corridas com uma parada obrigatória por piloto.
+
+    Cada volta de cada piloto é ritmo_base + degradação·idade_do_pneu − combustível·volta +
+    ruído normal (desvio do ajuste). A parada soma a perda no box na volta de entrada; sem volta
+    fixa, cada piloto para em uma volta sorteada na janela. Com probabilidade prob_safety_car, um
+    safety car de duracao_safety_car voltas começa em uma volta sorteada: as voltas sob safety car
+    têm o mesmo tempo para todos, a relargada reagrupa o pelotão (mantendo a ordem) e a parada sob
+    safety car custa FATOR_BOX_SAFETY_CAR da perda normal — quem ainda não parou e está na janela
+    aproveita para parar.
+
+    :param modelo: Ritmo por piloto (montar_modelo_ritmo)
+    :param n_voltas: Voltas da corrida
+    :param janela_box: (primeira, última) volta em que a parada é permitida
+    :param perda_box: Perda de tempo (s) da parada em bandeira verde
+    :param prob_safety_car: Probabilidade de um safety car na corrida
+    :param duracao_safety_car: Voltas sob safety car
+    :param efeito_combustivel: Ganho de tempo por volta devido ao combustível (s/volta)
+    :raises ValueError: Se a janela de parada não tiver nenhuma volta dentro da corrida
+    """
+
+    def __init__(self, modelo: pd.DataFrame, n_voltas: int, janela_box: Tuple[int, int],
+                 perda_box: float = PERDA_BOX_PADRAO, prob_safety_car: float = PROB_SAFETY_CAR_PADRAO,
+                 duracao_safety_car: int = DURACAO_SAFETY_CAR_PADRAO, efeito_combustivel: float = 0.0):
+        self.pilotos = list(modelo['Piloto'])
+        self._indice_piloto = {piloto: j for j, piloto in enumerate(self.pilotos)}
+        self.ritmo_base = modelo['Ritmo_Base'].to_numpy(dtype=np.float32)
+        self.degradacao = modelo['Degradacao'].to_numpy(dtype=np.float32)
+        self.desvio = modelo['Desvio'].to_numpy(dtype=np.float32)
+        self.largada = ((modelo['Grid'].to_numpy() - 1) * INTERVALO_GRID).astype(np.float32)
+
+        self.n_voltas = int(n_voltas)
+        primeira, ultima = janela_box
+        self.janela_box = (max(1, int(primeira)), min(self.n_voltas - 1, int(ultima)))
+        if self.janela_box[0] > self.janela_box[1]:
+            raise ValueError(f"Janela de parada vazia: em uma corrida de {self.n_voltas} voltas a parada deve "
+                             f"ficar entre as voltas 1 e {self.n_voltas - 1} (janela informada: {primeira}–{ultima}).")
+        self.perda_box = float(perda_box)
+        self.prob_safety_car = float(prob_safety_car)
+        self.duracao_safety_car = int(duracao_safety_car)
+        self.efeito_combustivel = float(efeito_combustivel)
+        self.tempo_safety_car = np.float32(FATOR_VOLTA_SAFETY_CAR * np.median(self.ritmo_base))
+
+    def simular(self, n_simulacoes: int, voltas_box: Optional[Dict[str, int]] = None,
+                semente: Optional[int] = None) -> np.ndarray:
+        """
+        Simula `n_simulacoes` corridas.
+
+        :param voltas_box: {piloto: volta de entrada no box} fixas (os demais sorteiam na janela)
+        :param semente: Semente do gerador; a mesma semente repete os mesmos sorteios, o que torna
+                        comparáveis simulações que só diferem na estratégia
+        :return: Matriz (n_simulacoes, n_pilotos) com a posição de chegada (1 = vencedor)
+        """
+        rng = np.random.default_rng(semente)
+        voltas_fixas = np.zeros(len(self.pilotos), dtype=np.int64)
+        for piloto, volta in (voltas_box or {}).items():
+            voltas_fixas[self._indice_piloto[piloto]] = int(np.clip(volta, 1, self.n_voltas - 1))
+
+        lotes = [min(SIMULACOES_POR_LOTE, n_simulacoes - inicio)
+                 for inicio in range(0, n_simulacoes, SIMULACOES_POR_LOTE)]
+        return np.concatenate([self._simular_lote(rng, n, voltas_fixas) for n in lotes], axis=0)
+
+    def _simular_lote(self, rng: np.random.Generator, n: int, voltas_fixas: np.ndarray) -> np.ndarray:
+        n_pilotos, n_voltas = len(self.pilotos), self.n_voltas
+        volta = np.arange(n_voltas, dtype=np.int64)  # índice 0 = volta 1
+
+        # Safety car: início (índice da volta) e fim; sem safety car, fora da corrida
+        tem_sc = rng.random(n) < self.prob_safety_car
+        inicio_sc = np.where(tem_sc, rng.integers(1, max(n_voltas - self.duracao_safety_car, 2), n), n_voltas)
+        fim_sc = np.minimum(inicio_sc + self.duracao_safety_car - 1, n_voltas - 1)
+
+        # Volta de entrada no box (1..n_voltas-1): fixa ou sorteada na janela
+        primeira, ultima = self.janela_box
+        box = rng.integers(primeira, ultima + 1, (n, n_pilotos))
+        livre = voltas_fixas == 0
+        box = np.where(livre, box, voltas_fixas)
+        # Quem ainda não parou e está na janela para na primeira volta de safety car
+        volta_sc = inicio_sc[:, None] + 1
+        aproveita = livre & tem_sc[:, None] & (volta_sc >= primeira) & (volta_sc <= ultima) & (box > volta_sc)
+        box = np.where(aproveita, volta_sc, box)
+
+        # Tempo de cada volta (n, pilotos, voltas): idade do pneu zera depois da parada
+        idade = np.where(volta < box[:, :, None], volta, volta - box[:, :, None]).astype(np.float32)
+        tempos = self.ritmo_base[:, None] + self.degradacao[:, None] * idade \
+            - np.float32(self.efeito_combustivel) * volta.astype(np.float32)
+        tempos += rng.standard_normal(tempos.shape, dtype=np.float32) * self.desvio[:, None]
+
+        sob_sc = (volta >= inicio_sc[:, None]) & (volta <= fim_sc[:, None])
+        tempos = np.where(sob_sc[:, None, :], self.tempo_safety_car, tempos)
+
+        # Perda no box na volta de entrada (menor sob safety car)
+        indice_box = box - 1
+        box_sob_sc = (indice_box >= inicio_sc[:, None]) & (indice_box <= fim_sc[:, None])
+        perda = np.where(box_sob_sc, self.perda_box * FATOR_BOX_SAFETY_CAR, self.perda_box).astype(np.float32)
+        np.put_along_axis(tempos, indice_box[:, :, None], np.take_along_axis(tempos, indice_box[:, :, None], axis=2)
+                          + perda[:, :, None], axis=2)
+
+        acumulado_por_volta = self.largada[:, None] + np.cumsum(tempos, axis=2)
+        acumulado = acumulado_por_volta[:, :, -1]
+
+        # Relargada: pelotão reagrupado na ordem do fim do safety car, a INTERVALO_RELARGADA entre carros
+        if tem_sc.any():
+            na_relargada = np.take_along_axis(acumulado_por_volta, fim_sc[:, None, None], axis=2)[:, :, 0]
+            ordem = np.argsort(np.argsort(na_relargada, axis=1), axis=1)
+            alvo = na_relargada.min(axis=1, keepdims=True) + ordem * np.float32(INTERVALO_RELARGADA)
+            acumulado = acumulado - np.where(tem_sc[:, None], na_relargada - alvo, 0.0)
+
+        return (np.argsort(np.argsort(acumulado, axis=1), axis=1) + 1).astype(np.int16)
+
+    def comparar_voltas_box(self, piloto: str, voltas: Iterable[int], n_simulacoes: int,
+                            semente: int = 0) -> pd.DataFrame:
+        """
+        Distribuição de chegada de `piloto` para cada volta de parada candidata, com os mesmos
+        sorteios (ritmo, safety car, paradas dos demais) em todas as candidatas.
+
+        :return: DataFrame com Volta_Box, Posicao_Media, Prob_Vitoria, Prob_Top3 e Prob_Top10
+        """
+        j = self._indice_piloto[piloto]
+        linhas = []
+        for volta_box in voltas:
+            posicoes = self.simular(n_simulacoes, {piloto: volta_box}, semente=semente)[:, j]
+            linhas.append({
+                'Volta_Box': int(volta_box),
+                'Posicao_Media': posicoes.mean(),
+                'Prob_Vitoria': (posicoes == 1).mean(),
+                'Prob_Top3': (posicoes <= 3).mean(),
+                'Prob_Top10': (posicoes <= 10).mean(),
+            })
+        return pd.DataFrame(linhas)
+
+
+def distribuicao_posicoes(posicoes: np.ndarray, pilotos: list) -> pd.DataFrame:
+    """
+    Probabilidade de cada posição de chegada por piloto.
+
+    :param posicoes: Matriz (simulações, pilotos) retornada por SimuladorEstrategia.simular
+    :param pilotos: Pilotos na ordem das colunas
+    :return: DataFrame piloto × posição (1..n) com as probabilidades
+    """
+    n_simulacoes, n_pilotos = posicoes.shape
+    # Contagem de (piloto, posição) em uma única chamada
+    codigos = np.arange(n_pilotos) * n_pilotos + (posicoes.astype(np.int64) - 1)
+    contagem = np.bincount(codigos.ravel(), minlength=n_pilotos * n_pilotos).reshape(n_pilotos, n_pilotos)
+    return pd.DataFrame(contagem / n_simulacoes, index=pd.Index(pilotos, name='Piloto'),
+                        columns=pd.RangeIndex(1, n_pilotos + 1, name='Posição'))
+
+
+def resumo_posicoes(posicoes: np.ndarray, pilotos: list) -> pd.DataFrame:
+    """Posição média, mediana e probabilidades de vitória, pódio e top 10 de cada piloto."""
+    return pd.DataFrame({
+        'Piloto': pilotos,
+        'Posição Média': posicoes.mean(axis=0).round(2),
+        'Posição Mediana': np.median(posicoes, axis=0),
+        'Vitória': (posicoes == 1).mean(axis=0),
+        'Pódio': (posicoes <= 3).mean(axis=0),
+        'Top 10': (posicoes <= 10).mean(axis=0),
+    }).sort_values('Posição Média').reset_index(drop=True)
+
+
+@st.cache_data(max_entries=MAX_SIMULACOES_EM_CACHE, show_spinner=False)
+def obter_modelo_ritmo(chave_sessao: str, _driver_info: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """montar_modelo_ritmo da sessão, ajustado uma vez por sessão."""
+    return montar_modelo_ritmo(_driver_info)
+
+
+@st.cache_data(max_entries=MAX_SIMULACOES_EM_CACHE, show_spinner=False)
+def obter_simulacao_estrategia(chave_sessao: str, _driver_info: Dict[str, pd.DataFrame], n_simulacoes: int,
+                               n_voltas: int, janela_box: Tuple[int, int], perda_box: float,
+                               prob_safety_car: float, duracao_safety_car: int,
+                               semente: int = 0) -> Tuple[list, np.ndarray]:
+    """Pilotos e posições simuladas da sessão, em cache por sessão e parâmetros da simulação."""
+    simulador = SimuladorEstrategia(obter_modelo_ritmo(chave_sessao, _driver_info), n_voltas, janela_box, perda_box,
+                                    prob_safety_car, duracao_safety_car)
+    return simulador.pilotos, simulador.simular(n_simulacoes, semente=semente)
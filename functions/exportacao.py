@@ -0,0 +1,136 @@
+"""
+Módulo de exportação das análises para Excel.
+Os bytes das planilhas ficam em cache, indexados pelo hash dos dados de entrada,
+e a planilha completa da sessão é escrita em modo streaming (constant_memory) do xlsxwriter.
+"""
+import io
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+import xlsxwriter
+
+from functions.constants import equipes_pilotos
+from functions.utils import (calcular_hash_dados, processar_resultado_csv, montar_dataframe_resultado_corrida,
+                             criar_matriz_velocidades, montar_dataframe_completo, gerar_ranking_por_volta,
+                             processar_gap_st)
+
+
+MIME_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _valor_celula(valor):
+    """Converte um valor do DataFrame para um tipo aceito pelo xlsxwriter (NaN vira célula vazia)."""
+    if valor is None:
+        return None
+    if isinstance(valor, np.float32):
+        # str() do float32 dá a representação curta (29.991 em vez de 29.99099922...)
+        return None if not np.isfinite(valor) else float(str(valor))
+    if isinstance(valor, (float, np.floating)):
+        return None if not np.isfinite(valor) else float(valor)
+    if isinstance(valor, (np.integer, np.bool_)):
+        return valor.item()
+    if valor is pd.NA or valor is pd.NaT:
+        return None
+    if isinstance(valor, (pd.Timestamp, pd.Timedelta)):
+        return str(valor)
+    return valor
+
+
+def escrever_planilhas_streaming(planilhas: Dict[str, pd.DataFrame], incluir_indice: Optional[Dict[str, bool]] = None) -> bytes:
+    """
+    Escreve várias abas em uma planilha Excel usando o modo constant_memory do xlsxwriter.
+
+    No modo constant_memory cada linha é descarregada para o disco assim que a próxima
+    começa, por isso as linhas são escritas estritamente em ordem (cabeçalho e depois
+    uma linha por vez), sem passar pelo ExcelWriter do pandas.
+
+    Args:
+        planilhas: Dicionário {nome da aba: DataFrame}
+        incluir_indice: Dicionário {nome da aba: bool} indicando se o índice deve ser escrito
+
+    Returns:
+        bytes: Conteúdo do arquivo .xlsx
+    """
+    incluir_indice = incluir_indice or {}
+    buffer = io.BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {'constant_memory': True})
+    formato_cabecalho = workbook.add_format({'bold': True, 'border': 1})
+
+    for nome_aba, df in planilhas.items():
+        if df is None:
+            continue
+
+        worksheet = workbook.add_worksheet(nome_aba[:31])  # Limite de caracteres do Excel
+        com_indice = incluir_indice.get(nome_aba, False)
+
+        cabecalho = [str(col) for col in df.columns]
+        if com_indice:
+            cabecalho = [str(df.index.name or '')] + cabecalho
+        worksheet.write_row(0, 0, cabecalho, formato_cabecalho)
+
+        for linha, registro in enumerate(df.itertuples(index=com_indice, name=None), start=1):
+            worksheet.write_row(linha, 0, [_valor_celula(valor) for valor in registro])
+
+    workbook.close()
+    return buffer.getvalue()
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _gerar_excel_em_cache(chave: str, _planilhas: Dict[str, pd.DataFrame], _incluir_indice: Dict[str, bool]) -> bytes:
+    """Gera os bytes da planilha; o cache é indexado apenas pela chave (hash dos dados)."""
+    return escrever_planilhas_streaming(_planilhas, _incluir_indice)
+
+
+def gerar_excel_matriz_st(df_matriz_st: pd.DataFrame) -> bytes:
+    """
+    Retorna os bytes da planilha com a Matriz ST, reaproveitando o cache enquanto os dados não mudarem.
+
+    Args:
+        df_matriz_st: Matriz de velocidades ST (uma coluna por piloto)
+
+    Returns:
+        bytes: Conteúdo do arquivo matriz_st.xlsx
+    """
+    chave = calcular_hash_dados('matriz_st', df_matriz_st)
+    return _gerar_excel_em_cache(chave, {'Matriz ST': df_matriz_st}, {'Matriz ST': True})
+
+
+@st.cache_data(max_entries=8, show_spinner="Gerando planilha completa da sessão...")
+def _gerar_excel_sessao_completa(chave_sessao: str, _df: pd.DataFrame, _driver_info: dict, tipo_opcao: str) -> bytes:
+    """Monta todas as abas da sessão e escreve a planilha em modo streaming."""
+    if tipo_opcao == "Treino":
+        df_resultado = processar_resultado_csv(_df)
+    else:
+        df_resultado = montar_dataframe_resultado_corrida(_driver_info, equipes_pilotos)
+
+    df_completo = montar_dataframe_completo(_driver_info)
+    df_voltas = df_completo[['Piloto', 'Montadora', 'Lap', 'Lap Tm', 'S1 Tm', 'S2 Tm', 'S3 Tm', 'Lap_seconds', 'ST']]
+
+    planilhas = {
+        'Resultado': df_resultado,
+        'Matriz ST': criar_matriz_velocidades(_driver_info),
+        'Laptimes': df_voltas,
+        'Ranking por Volta': gerar_ranking_por_volta(df_completo),
+        'GAP': processar_gap_st(_df),
+    }
+    return escrever_planilhas_streaming(planilhas, {'Matriz ST': True})
+
+
+def gerar_excel_sessao_completa(df: pd.DataFrame, driver_info: dict, tipo_opcao: str, chave_sessao: str) -> bytes:
+    """
+    Retorna os bytes da planilha completa da sessão (Resultado, Matriz ST, Laptimes,
+    Ranking por Volta e GAP), gerada uma única vez por sessão.
+
+    Args:
+        df: DataFrame bruto da sessão (com as linhas de cabeçalho dos pilotos)
+        driver_info: Dicionário de DataFrames por piloto
+        tipo_opcao: 'Treino' ou 'Corrida'
+        chave_sessao: Identificador da sessão (hash do arquivo e do campeonato, ou ID da sessão salva);
+            o mesmo arquivo separado com outro formato de cabeçalho gera outro driver_info
+
+    Returns:
+        bytes: Conteúdo do arquivo .xlsx
+    """
+    return _gerar_excel_sessao_completa(chave_sessao, df, driver_info, tipo_opcao)
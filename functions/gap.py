@@ -0,0 +1,329 @@
+"""
+Módulo de análise de GAP entre pilotos.
+Mantém um índice das voltas ordenado por GAP, para que o filtro "ST para GAP > x"
+seja resolvido com um searchsorted e uma máscara booleana sobre uma única tabela longa.
+O GAP pode ser definido entre carros na mesma volta (processar_gap_st) ou pela proximidade
+física na linha de cronometragem (calcular_gap_pista), considerando carros em qualquer volta.
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from functions.constants import piloto_modelo
+from functions.utils import processar_gap_st
+
+
+# Quantidade máxima de sessões com dados de GAP mantidos em cache
+MAX_SESSOES_GAP_EM_CACHE = 8
+
+# Faixas de GAP da estatística de vácuo: largura padrão (s), GAP máximo considerado e ST mínimo
+LARGURA_FAIXA_GAP = 0.1
+GAP_MAXIMO_VACUO = 3.0
+ST_MINIMO_VACUO = 200.0
+
+# Condição de pista de cada volta (ver classificar_condicao_pista) e limites de GAP (s)
+CONDICOES_PISTA = ['Ar livre', 'Vácuo', 'Tráfego']
+LIMITE_VACUO = 1.0
+LIMITE_AR_LIVRE = 2.0
+
+# Definições de GAP disponíveis nas abas de Speed e GAP (rótulo exibido -> definição)
+DEFINICOES_GAP = {
+    'Mesma volta': 'volta',
+    'Na pista (carro à frente)': 'pista',
+}
+
+
+def _passagens_na_linha(driver_info: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Tabela de todas as passagens pela linha ordenadas por Time of Day, com o GAP para a passagem
+    anterior (GAP) e para a seguinte (GAP_Tras) de qualquer outro carro.
+
+    A passagem de outro carro imediatamente anterior é o elemento antes do início da sequência de
+    passagens consecutivas do mesmo carro (localizado com searchsorted); a seguinte é o elemento
+    depois do fim dessa sequência. A coluna _linha guarda a posição da volta no DataFrame do piloto.
+    """
+    partes = [
+        pd.DataFrame({
+            'Piloto': piloto,
+            'Time of Day': voltas['Time of Day'].to_numpy(),
+            'ST': voltas['ST'].to_numpy(dtype=np.float64),
+            'Lap': np.asarray(voltas['Lap'], dtype=np.int64),
+            '_linha': np.arange(len(voltas)),
+        })
+        for piloto, voltas in driver_info.items() if not voltas.empty
+    ]
+    if not partes:
+        return pd.DataFrame(columns=['Piloto', 'Time of Day', 'ST', 'Lap', '_linha', 'GAP', 'GAP_Tras', 'Piloto_Frente'])
+
+    passagens = pd.concat(partes, ignore_index=True).dropna(subset=['Time of Day'])
+    passagens = passagens.sort_values('Time of Day', kind='stable').reset_index(drop=True)
+    n = len(passagens)
+
+    horarios = passagens['Time of Day'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    codigos = pd.Categorical(passagens['Piloto']).codes
+
+    # Início e fim de cada sequência de passagens consecutivas do mesmo carro
+    inicio_sequencia = np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]])
+    fim_sequencia = np.r_[inicio_sequencia[1:], n]
+    sequencia = np.searchsorted(inicio_sequencia, np.arange(n), side='right') - 1
+    anterior = inicio_sequencia[sequencia] - 1
+    seguinte = fim_sequencia[sequencia]
+
+    tem_anterior = anterior >= 0
+    indice_anterior = np.where(tem_anterior, anterior, 0)
+    passagens['GAP'] = np.where(tem_anterior, (horarios - horarios[indice_anterior]) / 1e9, np.nan)
+    passagens['Piloto_Frente'] = np.where(
+        tem_anterior, passagens['Piloto'].to_numpy(dtype=object)[indice_anterior], None)
+
+    tem_seguinte = seguinte < n
+    indice_seguinte = np.where(tem_seguinte, seguinte, 0)
+    passagens['GAP_Tras'] = np.where(tem_seguinte, (horarios[indice_seguinte] - horarios) / 1e9, np.nan)
+
+    return passagens
+
+
+def calcular_gap_pista(driver_info: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Calcula o GAP de cada passagem pela linha para a passagem anterior de qualquer outro carro,
+    independentemente da volta (retardatários e carros em voltas diferentes também contam).
+
+    Args:
+        driver_info: Dicionário de DataFrames por piloto (esquema canônico)
+
+    Returns:
+        pd.DataFrame: Mesmas colunas de processar_gap_st (Piloto, Time of Day, ST, Lap, GAP, ST_next)
+        e Piloto_Frente (carro que passou antes). A primeira passagem da sessão fica com GAP NaN.
+    """
+    colunas = ['Piloto', 'Time of Day', 'ST', 'Lap', 'GAP', 'ST_next', 'Piloto_Frente']
+    passagens = _passagens_na_linha(driver_info)
+    if passagens.empty:
+        return pd.DataFrame(columns=colunas)
+
+    # ST da volta seguinte do mesmo piloto (como em processar_gap_st)
+    passagens = passagens.sort_values(['Piloto', 'Lap'], kind='stable').reset_index(drop=True)
+    passagens['ST_next'] = passagens.groupby('Piloto', sort=False)['ST'].shift(-1)
+    passagens = passagens.dropna(subset=['ST_next']).reset_index(drop=True)
+
+    return passagens[colunas]
+
+
+def classificar_condicao_pista(driver_info: Dict[str, pd.DataFrame], limite_vacuo: float = LIMITE_VACUO,
+                               limite_ar_livre: float = LIMITE_AR_LIVRE) -> Dict[str, np.ndarray]:
+    """
+    Classifica cada volta como 'Ar livre', 'Vácuo' ou 'Tráfego' pelos GAPs na pista no início da volta
+    (passagem pela linha que encerrou a volta anterior; na primeira volta, a própria passagem).
+
+    - Vácuo: carro à frente a até `limite_vacuo` s e nenhum carro colado atrás (sozinho no vácuo)
+    - Tráfego: carro à frente a até `limite_ar_livre` s sem ser vácuo (trem de carros ou ar sujo)
+    - Ar livre: carro à frente a mais de `limite_ar_livre` s (ou nenhum carro à frente)
+
+    :param driver_info: Dicionário {piloto: DataFrame de voltas}
+    :param limite_vacuo: GAP máximo (s) para o carro à frente puxar o vácuo
+    :param limite_ar_livre: GAP mínimo (s) para o carro à frente para considerar ar livre
+    :return: Dicionário {piloto: array com a condição de cada volta, na ordem do DataFrame}
+    """
+    passagens = _passagens_na_linha(driver_info)
+    condicoes = {piloto: np.full(len(voltas), None, dtype=object) for piloto, voltas in driver_info.items()}
+    if passagens.empty:
+        return condicoes
+
+    passagens = passagens.sort_values(['Piloto', 'Lap'], kind='stable')
+    grupos = passagens.groupby('Piloto', sort=False)
+    gap_frente = grupos['GAP'].shift(1).fillna(passagens['GAP']).to_numpy()
+    gap_tras = grupos['GAP_Tras'].shift(1).fillna(passagens['GAP_Tras']).to_numpy()
+
+    vacuo = (gap_frente <= limite_vacuo) & ~(gap_tras <= limite_vacuo)
+    trafego = (gap_frente <= limite_ar_livre) & ~vacuo
+    condicao = np.select([vacuo, trafego], [CONDICOES_PISTA[1], CONDICOES_PISTA[2]], CONDICOES_PISTA[0])
+
+    for (piloto, linhas) in passagens.groupby('Piloto', sort=False).indices.items():
+        condicoes[piloto][passagens['_linha'].to_numpy()[linhas]] = condicao[linhas]
+    return condicoes
+
+
+def anexar_condicao_pista(driver_info: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Acrescenta a coluna Condicao (categoria: Ar livre, Vácuo, Tráfego) às voltas de cada piloto,
+    para que as abas de Speed e Laptimes filtrem sem recalcular os GAPs.
+
+    :param driver_info: Dicionário {piloto: DataFrame de voltas} no esquema canônico
+    :return: Novo dicionário com a coluna Condicao
+    """
+    validos = {p: v for p, v in driver_info.items() if isinstance(v, pd.DataFrame) and 'Time of Day' in v.columns}
+    condicoes = classificar_condicao_pista(validos)
+
+    resultado = dict(driver_info)
+    for piloto, voltas in validos.items():
+        resultado[piloto] = voltas.assign(
+            Condicao=pd.Categorical(condicoes[piloto], categories=CONDICOES_PISTA))
+    return resultado
+
+
+def filtrar_por_condicao(driver_info: Dict[str, pd.DataFrame], condicoes: list) -> Dict[str, pd.DataFrame]:
+    """
+    Retorna driver_info apenas com as voltas nas condições de pista escolhidas (se a coluna existir).
+    Pilotos sem nenhuma volta nessas condições são removidos (como em IndiceGap.filtrar).
+    """
+    filtrado = {}
+    for piloto, voltas in driver_info.items():
+        if isinstance(voltas, pd.DataFrame) and 'Condicao' in voltas.columns:
+            voltas = voltas[voltas['Condicao'].isin(condicoes).to_numpy()]
+            if voltas.empty:
+                continue
+        filtrado[piloto] = voltas
+    return filtrado
+
+
+def calcular_estatisticas_vacuo(df_gap: pd.DataFrame, largura_faixa: float = LARGURA_FAIXA_GAP,
+                                gap_maximo: float = GAP_MAXIMO_VACUO, por_montadora: bool = False,
+                                st_minimo: float = ST_MINIMO_VACUO) -> pd.DataFrame:
+    """
+    Estatística do efeito de vácuo de todo o pelotão: o GAP é dividido em faixas e, para cada faixa,
+    calcula-se a distribuição do ST da volta seguinte (ST_next).
+
+    :param df_gap: Dados de GAP x ST (processar_gap_st ou calcular_gap_pista)
+    :param largura_faixa: Largura de cada faixa de GAP (s)
+    :param gap_maximo: GAP máximo considerado (s); passagens acima ficam de fora
+    :param por_montadora: Se True, separa as estatísticas por montadora
+    :param st_minimo: ST_next mínimo considerado (descarta voltas de box/lentas, como na visão por piloto)
+    :return: DataFrame com GAP (centro da faixa), [Montadora], Voltas, Media, Mediana, P25, P75 e P90
+    """
+    dados = df_gap[['Piloto', 'GAP', 'ST_next']].copy()
+    dados['GAP'] = dados['GAP'].astype(np.float64)
+    dados['ST_next'] = dados['ST_next'].astype(np.float64)
+    dados = dados[(dados['GAP'] >= 0) & (dados['GAP'] < gap_maximo) & (dados['ST_next'] > st_minimo)]
+
+    # Índice inteiro da faixa; o arredondamento evita que um GAP exatamente na borda (ex.: 0.3 / 0.1 =
+    # 2.9999999999999996) caia na faixa de baixo
+    dados['Faixa'] = np.floor(np.round(dados['GAP'].to_numpy() / largura_faixa, 6)).astype(int)
+
+    chaves = ['Faixa']
+    if por_montadora:
+        dados['Montadora'] = dados['Piloto'].astype(str).map(piloto_modelo).fillna('Desconhecido')
+        chaves = ['Montadora', 'Faixa']
+
+    st_next = dados.groupby(chaves)['ST_next']
+    resultado = pd.concat({
+        'Voltas': st_next.size(),
+        'Media': st_next.mean(),
+        'Mediana': st_next.median(),
+        'P25': st_next.quantile(0.25),
+        'P75': st_next.quantile(0.75),
+        'P90': st_next.quantile(0.90),
+    }, axis=1).reset_index()
+
+    resultado.insert(0, 'GAP', np.round((resultado.pop('Faixa') + 0.5) * largura_faixa, 3))
+    colunas = ['GAP'] + (['Montadora'] if por_montadora else []) + ['Voltas', 'Media', 'Mediana', 'P25', 'P75', 'P90']
+    return resultado[colunas].round(2)
+
+
+class IndiceGap:
+    """
+    Índice das voltas de todos os pilotos ordenado pelo GAP da volta.
+
+    A tabela longa concatena as voltas de driver_info na ordem dos pilotos; cada piloto
+    ocupa um intervalo contíguo de linhas. Voltas sem GAP calculado (ex.: a última volta
+    de cada piloto, que não tem ST_next) nunca passam pelo filtro.
+    """
+
+    def __init__(self, driver_info: Dict[str, pd.DataFrame], df_gap: pd.DataFrame):
+        self._driver_info = driver_info
+        self._intervalos = {}
+
+        # Tabela longa (Piloto, Lap) com uma linha por volta de driver_info
+        partes = []
+        inicio = 0
+        for piloto, voltas in driver_info.items():
+            self._intervalos[piloto] = (inicio, inicio + len(voltas))
+            inicio += len(voltas)
+            partes.append(pd.DataFrame({'Piloto': piloto, 'Lap': np.asarray(voltas['Lap'], dtype=np.int64)}))
+
+        if partes:
+            voltas_longas = pd.concat(partes, ignore_index=True)
+        else:
+            voltas_longas = pd.DataFrame({'Piloto': pd.Series(dtype=object), 'Lap': pd.Series(dtype=np.int64)})
+
+        gaps = df_gap[['Piloto', 'Lap', 'GAP']].drop_duplicates(subset=['Piloto', 'Lap'])
+        gaps = gaps.astype({'Lap': np.int64})
+        gap_por_volta = voltas_longas.merge(gaps, on=['Piloto', 'Lap'], how='left')['GAP'].to_numpy(dtype=np.float64)
+
+        # Voltas sem GAP recebem -inf e ficam no início da ordenação (nunca passam o filtro)
+        gap_por_volta = np.where(np.isnan(gap_por_volta), -np.inf, gap_por_volta)
+        self._ordem = np.argsort(gap_por_volta, kind='stable')
+        self._gaps_ordenados = gap_por_volta[self._ordem]
+
+        # GAPs de todas as linhas de df_gap, para a contagem exibida na tela (sem os NaN)
+        gaps_df_gap = df_gap['GAP'].to_numpy(dtype=np.float64)
+        self._gaps_df_gap = np.sort(gaps_df_gap[~np.isnan(gaps_df_gap)])
+
+    def mascara(self, limite_gap: float) -> np.ndarray:
+        """Máscara booleana sobre a tabela longa: True para as voltas com GAP > limite_gap."""
+        posicao = np.searchsorted(self._gaps_ordenados, limite_gap, side='right')
+        mascara = np.zeros(len(self._ordem), dtype=bool)
+        mascara[self._ordem[posicao:]] = True
+        return mascara
+
+    def contar(self, limite_gap: float) -> int:
+        """Quantidade de voltas de df_gap com GAP > limite_gap."""
+        return int(len(self._gaps_df_gap) - np.searchsorted(self._gaps_df_gap, limite_gap, side='right'))
+
+    def filtrar(self, limite_gap: float) -> Dict[str, pd.DataFrame]:
+        """
+        Retorna driver_info mantendo apenas as voltas com GAP > limite_gap.
+        Pilotos sem nenhuma volta acima do limite são removidos.
+        """
+        mascara = self.mascara(limite_gap)
+        filtrado = {}
+        for piloto, (inicio, fim) in self._intervalos.items():
+            mascara_piloto = mascara[inicio:fim]
+            if mascara_piloto.any():
+                filtrado[piloto] = self._driver_info[piloto][mascara_piloto]
+        return filtrado
+
+
+@st.cache_data(max_entries=MAX_SESSOES_GAP_EM_CACHE, show_spinner=False)
+def obter_dados_gap(chave_sessao: str, _df: pd.DataFrame, definicao_gap: str = 'volta',
+                    _driver_info: Dict[str, pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Retorna os dados de GAP x ST da sessão, calculados uma vez por sessão e definição.
+
+    Args:
+        chave_sessao: Identificador da sessão (hash do arquivo ou ID da sessão salva)
+        _df: DataFrame bruto da sessão (usado na definição 'volta')
+        definicao_gap: 'volta' (processar_gap_st) ou 'pista' (calcular_gap_pista)
+        _driver_info: Dicionário de DataFrames por piloto (obrigatório na definição 'pista')
+
+    Returns:
+        pd.DataFrame: Piloto, Time of Day, ST, GAP, ST_next, Lap
+    """
+    if definicao_gap == 'pista':
+        return calcular_gap_pista(_driver_info)
+    return processar_gap_st(_df)
+
+
+@st.cache_data(max_entries=MAX_SESSOES_GAP_EM_CACHE * 4, show_spinner=False)
+def obter_estatisticas_vacuo(chave_sessao: str, _df: pd.DataFrame, _driver_info: Dict[str, pd.DataFrame],
+                             definicao_gap: str, largura_faixa: float, por_montadora: bool) -> pd.DataFrame:
+    """Retorna calcular_estatisticas_vacuo da sessão, em cache por definição de GAP e parâmetros."""
+    df_gap = obter_dados_gap(chave_sessao, _df, definicao_gap, _driver_info)
+    return calcular_estatisticas_vacuo(df_gap, largura_faixa=largura_faixa, por_montadora=por_montadora)
+
+
+@st.cache_resource(max_entries=MAX_SESSOES_GAP_EM_CACHE, show_spinner=False)
+def obter_indice_gap(chave_sessao: str, _df: pd.DataFrame, _driver_info: Dict[str, pd.DataFrame],
+                     definicao_gap: str = 'volta') -> IndiceGap:
+    """
+    Retorna o IndiceGap da sessão, construído uma única vez e compartilhado (somente leitura).
+
+    Args:
+        chave_sessao: Identificador da sessão (hash do arquivo ou ID da sessão salva)
+        _df: DataFrame bruto da sessão
+        _driver_info: Dicionário de DataFrames por piloto
+        definicao_gap: 'volta' ou 'pista' (ver DEFINICOES_GAP)
+
+    Returns:
+        IndiceGap: Índice das voltas ordenado por GAP
+    """
+    return IndiceGap(_driver_info, obter_dados_gap(chave_sessao, _df, definicao_gap, _driver_info))
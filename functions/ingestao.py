@@ -0,0 +1,188 @@
+"""
+Módulo de ingestão dos arquivos CSV de cronometragem.
+O processamento do upload (leitura, validação, normalização e separação por piloto)
+fica em cache indexado pelo hash do conteúdo do arquivo, para que interações com
+widgets não repitam a leitura do CSV.
+"""
+import io
+from typing import Dict, Iterator, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from functions.cabecalhos import PARSERS_CABECALHO, CAMPEONATO_AUTOMATICO
+from functions.esquema import compactar_dataframe_bruto
+from functions.gap import anexar_condicao_pista
+from functions.stints import anexar_stints
+from functions.utils import SeparadorPilotos
+from functions.validacao import RelatorioValidacao, ValidadorCSV, ErroValidacaoCSV, preparar_bloco_bruto
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow é opcional: sem ele a leitura usa o motor C do pandas
+    pa = None
+    pa_csv = None
+
+
+# Tempo de vida (segundos) e quantidade máxima de arquivos processados mantidos em cache
+TTL_CACHE_UPLOAD = 60 * 60
+MAX_UPLOADS_EM_CACHE = 8
+
+# Linhas lidas por bloco (motor C) e tamanho do bloco em bytes (pyarrow)
+LINHAS_POR_BLOCO = 50_000
+BYTES_POR_BLOCO = 4 * 1024 * 1024
+
+# Motores de leitura: 'auto' usa pyarrow quando instalado
+MOTORES_CSV = ('auto', 'pyarrow', 'c')
+
+# Erros de leitura (derivam de ValueError, mas não são erros de validação)
+_ERROS_PYARROW = (pa.ArrowInvalid,) if pa is not None else ()
+_ERROS_LEITURA = (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError)
+
+
+def _blocos_pyarrow(conteudo: bytes, mapa: Dict[str, str], bytes_por_bloco: int) -> Iterator[pd.DataFrame]:
+    """Lê o CSV em blocos com o leitor em streaming do pyarrow (somente as colunas necessárias, como texto)."""
+    leitor = pa_csv.open_csv(
+        io.BytesIO(conteudo),
+        read_options=pa_csv.ReadOptions(block_size=bytes_por_bloco),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=list(mapa),
+            column_types={col: pa.string() for col in mapa},
+            strings_can_be_null=True,
+        ),
+    )
+    for lote in leitor:
+        yield lote.to_pandas()
+
+
+def _blocos_pandas(conteudo: bytes, mapa: Dict[str, str], linhas_por_bloco: int) -> Iterator[pd.DataFrame]:
+    """Lê o CSV em blocos com o motor C do pandas (somente as colunas necessárias, como texto)."""
+    yield from pd.read_csv(io.BytesIO(conteudo), usecols=list(mapa), dtype=str, chunksize=linhas_por_bloco)
+
+
+def ler_csv_em_blocos(conteudo: bytes, mapa: Dict[str, str], motor: str = 'auto',
+                      linhas_por_bloco: int = LINHAS_POR_BLOCO,
+                      bytes_por_bloco: int = BYTES_POR_BLOCO) -> Iterator[pd.DataFrame]:
+    """
+    Lê o CSV de cronometragem em blocos, já com as colunas canônicas.
+
+    Só as colunas de `mapa` são lidas, todas como texto (a coluna Time of Day contém as linhas
+    de cabeçalho dos pilotos), e cada bloco é devolvido antes de ler o próximo, limitando o
+    pico de memória em arquivos longos.
+
+    Args:
+        conteudo: Bytes do arquivo CSV
+        mapa: {nome no arquivo: nome canônico} (ver ValidadorCSV.mapa)
+        motor: 'auto' (pyarrow se instalado), 'pyarrow' ou 'c'
+        linhas_por_bloco: Linhas por bloco no motor C
+        bytes_por_bloco: Tamanho do bloco (bytes) no pyarrow
+
+    Yields:
+        pd.DataFrame: Bloco com COLUNAS_NECESSARIAS como texto (ver preparar_bloco_bruto)
+    """
+    if motor == 'auto':
+        motor = 'pyarrow' if pa_csv is not None else 'c'
+    if motor == 'pyarrow':
+        blocos = _blocos_pyarrow(conteudo, mapa, bytes_por_bloco)
+    else:
+        blocos = _blocos_pandas(conteudo, mapa, linhas_por_bloco)
+
+    for bloco in blocos:
+        yield preparar_bloco_bruto(bloco, mapa)
+
+
+def processar_csv_em_blocos(conteudo: bytes, motor: str = 'auto',
+                            campeonato: str = CAMPEONATO_AUTOMATICO) -> Tuple[pd.DataFrame, dict, RelatorioValidacao]:
+    """
+    Lê o CSV em blocos compactando, validando e separando as voltas por piloto à medida que os
+    blocos chegam (ver ler_csv_em_blocos, ValidadorCSV e SeparadorPilotos).
+
+    Args:
+        conteudo: Bytes do arquivo CSV
+        motor: Motor de leitura (ver MOTORES_CSV)
+        campeonato: Formato dos cabeçalhos de piloto (chave de PARSERS_CABECALHO ou
+            CAMPEONATO_AUTOMATICO para detectar no primeiro bloco)
+
+    Returns:
+        Tuple[pd.DataFrame, dict, RelatorioValidacao]: DataFrame compacto completo, driver_info
+        (sem enriquecer_voltas) e relatório de validação
+
+    Raises:
+        ErroValidacaoCSV: Se o arquivo for inválido (a exceção traz o relatório)
+    """
+    parser = PARSERS_CABECALHO.get(campeonato)
+    validador = ValidadorCSV(pd.read_csv(io.BytesIO(conteudo), nrows=0).columns, parser)
+    separador = None
+    blocos = []
+
+    for bruto in ler_csv_em_blocos(conteudo, validador.mapa, motor):
+        compacto = compactar_dataframe_bruto(bruto)
+        cabecalho = validador.adicionar(bruto, compacto)
+        # O separador usa o mesmo parser (detectado pelo validador no primeiro bloco) e a mesma máscara
+        if separador is None:
+            separador = SeparadorPilotos(validador.parser)
+        separador.adicionar(compacto, cabecalho)
+        blocos.append(compacto)
+
+    relatorio = validador.relatorio()
+    if not relatorio.valido:
+        raise ErroValidacaoCSV(relatorio)
+
+    df = pd.concat(blocos, ignore_index=True)
+    return df, separador.resultado(), relatorio
+
+
+def enriquecer_voltas(driver_info: dict) -> dict:
+    """
+    Anexa às voltas de cada piloto as colunas calculadas uma única vez por sessão:
+    stints e voltas de box (functions.stints) e condição de pista (functions.gap).
+
+    Args:
+        driver_info: Dicionário de DataFrames por piloto no esquema compacto
+
+    Returns:
+        dict: Novo dicionário com as colunas Stint, Volta_Entrada, Volta_Saida e Condicao
+    """
+    return anexar_condicao_pista(anexar_stints(driver_info))
+
+
+@st.cache_data(ttl=TTL_CACHE_UPLOAD, max_entries=MAX_UPLOADS_EM_CACHE, show_spinner="Processando arquivo CSV...")
+def processar_csv_upload(chave: str, _conteudo: bytes,
+                         campeonato: str = CAMPEONATO_AUTOMATICO) -> Tuple[pd.DataFrame, dict, RelatorioValidacao]:
+    """
+    Lê, valida, normaliza e separa por piloto o CSV enviado pelo usuário (ver enriquecer_voltas).
+    O resultado fica em cache indexado apenas por `chave` (hash do conteúdo do arquivo).
+
+    Args:
+        chave: Hash do conteúdo do arquivo (ver calcular_hash_dados)
+        _conteudo: Bytes do arquivo CSV (não entram no cálculo da chave do cache)
+        campeonato: Formato dos cabeçalhos de piloto (ver functions.cabecalhos)
+
+    Returns:
+        Tuple[pd.DataFrame, dict, RelatorioValidacao]: DataFrame normalizado e driver_info (DataFrames
+        por piloto), ambos no esquema compacto de functions.esquema, e o relatório de validação
+
+    Raises:
+        ValueError: Se o arquivo não puder ser lido ou for inválido (ErroValidacaoCSV, com o relatório)
+    """
+    try:
+        # Leitura em blocos: colunas necessárias, tipos explícitos e separação por piloto incremental
+        try:
+            df, driver_info, relatorio = processar_csv_em_blocos(_conteudo, campeonato=campeonato)
+        except _ERROS_PYARROW:
+            # Arquivos que o leitor do pyarrow não aceita (ex.: linhas com colunas a mais) vão pelo motor C
+            df, driver_info, relatorio = processar_csv_em_blocos(_conteudo, motor='c', campeonato=campeonato)
+    except _ERROS_LEITURA as e:
+        raise ValueError(f"Erro ao ler o arquivo CSV: {e}")
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Erro ao ler o arquivo CSV: {e}")
+
+    try:
+        driver_info = enriquecer_voltas(driver_info)
+    except Exception as e:
+        raise ValueError(f"Erro ao processar dados dos pilotos: {e}")
+
+    return df, driver_info, relatorio
@@ -0,0 +1,127 @@
+"""
+Módulo de modelo de ritmo: degradação por piloto e stint.
+Todas as curvas (linear ou quadrática) são ajustadas de uma vez por mínimos quadrados em lote:
+as equações normais de cada grupo (piloto, stint) são acumuladas com np.bincount e resolvidas
+em uma única chamada batched, sem laço de polyfit por piloto.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+# Voltas acima deste fator da mediana do stint (tráfego, erro) ficam fora do ajuste
+FATOR_OUTLIER_RITMO = 1.05
+
+# Quantidade máxima de ajustes (sessão, parâmetros) mantidos em cache
+MAX_AJUSTES_EM_CACHE = 16
+
+
+def _voltas_para_ajuste(driver_info: Dict[str, pd.DataFrame], efeito_combustivel: float,
+                        fator_outlier: float) -> pd.DataFrame:
+    """Tabela longa com as voltas usadas no ajuste (sem voltas de box e outliers do stint)."""
+    partes = []
+    for piloto, voltas in driver_info.items():
+        if not isinstance(voltas, pd.DataFrame) or voltas.empty:
+            continue
+        parte = pd.DataFrame({
+            'Piloto': piloto,
+            'Lap': np.asarray(voltas['Lap'], dtype=np.int64),
+            'Tempo': voltas['Lap Tm'].to_numpy(dtype=np.float64),
+            'Stint': voltas['Stint'].to_numpy() if 'Stint' in voltas.columns else 1,
+        })
+        if 'Volta_Entrada' in voltas.columns:
+            parte = parte[~(voltas['Volta_Entrada'] | voltas['Volta_Saida']).to_numpy()]
+        partes.append(parte)
+
+    colunas = ['Piloto', 'Stint', 'Lap', 'Idade', 'Tempo', 'Tempo_Corrigido']
+    if not partes:
+        return pd.DataFrame(columns=colunas)
+
+    voltas = pd.concat(partes, ignore_index=True).dropna(subset=['Tempo'])
+
+    # Correção de combustível: devolve o ganho de peso do combustível já queimado (tanque cheio)
+    voltas['Tempo_Corrigido'] = voltas['Tempo'] + efeito_combustivel * (voltas['Lap'] - 1)
+
+    grupos = voltas.groupby(['Piloto', 'Stint'], sort=False)
+    mediana = grupos['Tempo_Corrigido'].transform('median')
+    voltas = voltas[voltas['Tempo_Corrigido'] <= fator_outlier * mediana].copy()
+
+    # Idade do pneu: voltas desde o início do stint
+    voltas['Idade'] = voltas['Lap'] - voltas.groupby(['Piloto', 'Stint'], sort=False)['Lap'].transform('min')
+    return voltas[colunas].reset_index(drop=True)
+
+
+def ajustar_degradacao(driver_info: Dict[str, pd.DataFrame], grau: int = 1, efeito_combustivel: float = 0.0,
+                       fator_outlier: float = FATOR_OUTLIER_RITMO) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Ajusta tempo_de_volta = b0 + b1·idade (+ b2·idade²) para cada piloto e stint em um único solve.
+
+    :param driver_info: Dicionário {piloto: DataFrame de voltas}, com as colunas de stint se detectadas
+    :param grau: 1 (linear) ou 2 (quadrático)
+    :param efeito_combustivel: Ganho de tempo por volta devido ao combustível queimado (s/volta);
+                               0 desliga a correção
+    :param fator_outlier: Voltas acima deste fator da mediana do stint são descartadas
+    :return: (coeficientes, voltas)
+             coeficientes: Piloto, Stint, Voltas, Intercepto (s), Degradacao (s/volta na idade 0),
+                           Curvatura (s/volta², só no quadrático) e RMSE (s)
+             voltas: voltas usadas, com Ajuste e Residuo
+    """
+    voltas = _voltas_para_ajuste(driver_info, efeito_combustivel, fator_outlier)
+    n_coef = grau + 1
+    colunas_coef = ['Piloto', 'Stint', 'Voltas', 'Intercepto', 'Degradacao'] + \
+        (['Curvatura'] if grau == 2 else []) + ['RMSE']
+    if voltas.empty:
+        return pd.DataFrame(columns=colunas_coef), voltas.assign(Ajuste=np.nan, Residuo=np.nan)
+
+    grupo = voltas.groupby(['Piloto', 'Stint'], sort=False).ngroup().to_numpy()
+    n_grupos = grupo.max() + 1
+    x = voltas['Idade'].to_numpy(dtype=np.float64)
+    y = voltas['Tempo_Corrigido'].to_numpy(dtype=np.float64)
+
+    # Matriz de projeto (n_voltas, n_coef): [1, x, x²]
+    X = x[:, None] ** np.arange(n_coef)
+
+    # Equações normais por grupo: XtX (G, p, p) e Xty (G, p), acumuladas com bincount
+    XtX = np.empty((n_grupos, n_coef, n_coef))
+    for i in range(n_coef):
+        for j in range(i, n_coef):
+            XtX[:, i, j] = XtX[:, j, i] = np.bincount(grupo, weights=X[:, i] * X[:, j], minlength=n_grupos)
+    Xty = np.stack([np.bincount(grupo, weights=X[:, i] * y, minlength=n_grupos) for i in range(n_coef)], axis=1)
+
+    # pinv em lote: stints curtos (menos voltas que coeficientes) não quebram o solve
+    beta = np.einsum('gij,gj->gi', np.linalg.pinv(XtX), Xty)
+
+    ajuste = np.einsum('ni,ni->n', X, beta[grupo])
+    voltas['Ajuste'] = ajuste
+    voltas['Residuo'] = y - ajuste
+
+    n_voltas = np.bincount(grupo, minlength=n_grupos)
+    rmse = np.sqrt(np.bincount(grupo, weights=voltas['Residuo'].to_numpy() ** 2, minlength=n_grupos) / n_voltas)
+
+    primeiro = np.unique(grupo, return_index=True)[1]
+    coeficientes = pd.DataFrame({
+        'Piloto': voltas['Piloto'].to_numpy()[primeiro],
+        'Stint': voltas['Stint'].to_numpy()[primeiro],
+        'Voltas': n_voltas,
+        'Intercepto': beta[:, 0],
+        'Degradacao': beta[:, 1],
+    })
+    if grau == 2:
+        coeficientes['Curvatura'] = beta[:, 2]
+    coeficientes['RMSE'] = rmse
+
+    # Stints com menos voltas que o necessário para o ajuste ficam sem coeficientes
+    insuficiente = n_voltas < n_coef + 1
+    coeficientes.loc[insuficiente, colunas_coef[3:]] = np.nan
+    voltas.loc[insuficiente[grupo], ['Ajuste', 'Residuo']] = np.nan
+
+    return coeficientes[colunas_coef], voltas
+
+
+@st.cache_data(max_entries=MAX_AJUSTES_EM_CACHE, show_spinner=False)
+def obter_ajuste_degradacao(chave_sessao: str, _driver_info: Dict[str, pd.DataFrame], grau: int,
+                            efeito_combustivel: float) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Retorna ajustar_degradacao da sessão, em cache por sessão, grau e correção de combustível."""
+    return ajustar_degradacao(_driver_info, grau=grau, efeito_combustivel=efeito_combustivel)
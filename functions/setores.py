@@ -0,0 +1,183 @@
+"""
+Módulo de análise de setores.
+Melhores setores de cada piloto, volta ideal (soma dos melhores setores), melhores setores da
+sessão e a matriz de diferenças piloto × setor, calculados com um único groupby().min() sobre
+a tabela longa de voltas. O TensorSetores guarda os setores de todas as voltas em um array denso
+piloto × volta × setor (float32), montado uma vez por sessão; as diferenças para o melhor da
+sessão, para o melhor do próprio piloto ou para um piloto de referência são operações com broadcast.
+"""
+import warnings
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from functions.esquema import tempos_para_segundos
+
+
+SETORES_VOLTA = ['S1 Tm', 'S2 Tm', 'S3 Tm']
+
+# Referências de comparação do TensorSetores
+REFERENCIA_SESSAO = 'Melhor da sessão'
+REFERENCIA_PROPRIA = 'Melhor do próprio piloto'
+REFERENCIA_PILOTO_VOLTA = 'Piloto de referência (mesma volta)'
+REFERENCIA_PILOTO_MELHOR = 'Piloto de referência (melhor setor)'
+REFERENCIAS_SETORES = [REFERENCIA_SESSAO, REFERENCIA_PROPRIA, REFERENCIA_PILOTO_VOLTA, REFERENCIA_PILOTO_MELHOR]
+
+# Quantidade máxima de sessões com análise de setores mantida em cache
+MAX_SESSOES_SETORES_EM_CACHE = 8
+
+
+def _tabela_voltas(driver_info: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Tabela longa (Piloto, Lap Tm, S1 Tm, S2 Tm, S3 Tm) com as voltas de todos os pilotos."""
+    pilotos = [p for p, dados in driver_info.items() if isinstance(dados, pd.DataFrame) and not dados.empty]
+    if not pilotos:
+        return pd.DataFrame(columns=['Piloto', 'Lap Tm'] + SETORES_VOLTA)
+
+    voltas = pd.concat([driver_info[p][['Lap Tm'] + SETORES_VOLTA] for p in pilotos], ignore_index=True)
+    voltas['Piloto'] = pd.Categorical(
+        np.repeat(pilotos, [len(driver_info[p]) for p in pilotos]), categories=pilotos)
+    return voltas
+
+
+def calcular_melhores_setores(driver_info: Dict[str, pd.DataFrame]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Calcula os melhores setores e a volta ideal de cada piloto e as diferenças para os
+    melhores setores da sessão.
+
+    :param driver_info: Dicionário {piloto: DataFrame de voltas} no esquema canônico (tempos em segundos)
+    :return: (melhores, deltas)
+             melhores: Posição, Piloto, melhores S1/S2/S3, Volta_Ideal, Melhor_Volta e Diferenca
+                       (melhor volta real - volta ideal), ordenado pela volta ideal
+             deltas: matriz piloto × (S1, S2, S3, Volta Ideal) com a diferença (s) para o melhor da
+                     sessão, na mesma ordem de `melhores`
+    """
+    voltas = _tabela_voltas(driver_info)
+    colunas_tempo = ['Lap Tm'] + SETORES_VOLTA
+    # float32 -> float64 arredondado ao milésimo (precisão da cronometragem)
+    voltas[colunas_tempo] = voltas[colunas_tempo].astype(np.float64).round(3)
+
+    # Um único groupby: melhor volta real e melhor de cada setor por piloto
+    melhores = voltas.groupby('Piloto', observed=True)[colunas_tempo].min()
+    melhores = melhores.dropna(subset=SETORES_VOLTA, how='all')
+
+    melhores['Volta_Ideal'] = melhores[SETORES_VOLTA].sum(axis=1, min_count=len(SETORES_VOLTA))
+    melhores = melhores.rename(columns={'Lap Tm': 'Melhor_Volta'})
+    melhores['Volta_Ideal'] = melhores['Volta_Ideal'].round(3)
+    melhores['Diferenca'] = (melhores['Melhor_Volta'] - melhores['Volta_Ideal']).round(3)
+    melhores = melhores.sort_values('Volta_Ideal', na_position='last')
+
+    # Diferença para o melhor da sessão (melhor setor e volta ideal da sessão)
+    colunas_delta = SETORES_VOLTA + ['Volta_Ideal']
+    deltas = (melhores[colunas_delta] - melhores[colunas_delta].min()).round(3)
+    deltas = deltas.rename(columns={'S1 Tm': 'S1', 'S2 Tm': 'S2', 'S3 Tm': 'S3', 'Volta_Ideal': 'Volta Ideal'})
+    deltas.index = deltas.index.astype(str)
+
+    melhores = melhores.reset_index()
+    melhores['Piloto'] = melhores['Piloto'].astype(str)
+    melhores.insert(0, 'Posição', np.arange(1, len(melhores) + 1))
+    melhores = melhores[['Posição', 'Piloto'] + SETORES_VOLTA + ['Volta_Ideal', 'Melhor_Volta', 'Diferenca']]
+
+    return melhores, deltas
+
+
+@st.cache_data(max_entries=MAX_SESSOES_SETORES_EM_CACHE, show_spinner=False)
+def obter_melhores_setores(chave_sessao: str, _driver_info: Dict[str, pd.DataFrame]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Retorna calcular_melhores_setores da sessão, calculado uma vez por upload/sessão."""
+    return calcular_melhores_setores(_driver_info)
+
+
+class TensorSetores:
+    """
+    Tempos de setor de uma sessão em um array denso piloto × volta × setor (float32).
+
+    Atributos:
+        pilotos: Pilotos (eixo 0)
+        voltas: Números das voltas (eixo 1)
+        setores: Nomes dos setores (eixo 2)
+        tempos: Array (n_pilotos, n_voltas, n_setores) em segundos; NaN onde não há registro
+        volta_de_box: Máscara (n_pilotos, n_voltas) das voltas de entrada/saída do box
+        melhor_sessao: Melhor tempo de cada setor na sessão (n_setores)
+        melhor_piloto: Melhor tempo de cada setor por piloto (n_pilotos, n_setores)
+    """
+
+    def __init__(self, driver_info: Dict[str, pd.DataFrame]):
+        self.setores = [setor.replace(' Tm', '') for setor in SETORES_VOLTA]
+        self.pilotos = [p for p, dados in driver_info.items() if isinstance(dados, pd.DataFrame) and not dados.empty]
+        self._indice_piloto = {piloto: i for i, piloto in enumerate(self.pilotos)}
+
+        partes = [driver_info[p] for p in self.pilotos]
+        laps = np.concatenate([np.asarray(d['Lap'], dtype=np.int64) for d in partes]) if partes else np.empty(0, np.int64)
+        self.voltas = np.unique(laps)
+
+        linhas = np.repeat(np.arange(len(self.pilotos)), [len(d) for d in partes])
+        colunas = np.searchsorted(self.voltas, laps)
+        self.tempos = np.full((len(self.pilotos), len(self.voltas), len(SETORES_VOLTA)), np.nan, dtype=np.float32)
+        self.volta_de_box = np.zeros((len(self.pilotos), len(self.voltas)), dtype=bool)
+        if not partes:
+            self.melhor_sessao = np.full(len(SETORES_VOLTA), np.nan, dtype=np.float32)
+            self.melhor_piloto = np.full((0, len(SETORES_VOLTA)), np.nan, dtype=np.float32)
+            return
+
+        # Conversão dos textos acontece só aqui (as colunas já vêm em segundos no esquema compacto)
+        setores = pd.concat([d[SETORES_VOLTA] for d in partes], ignore_index=True)
+        for k, coluna in enumerate(SETORES_VOLTA):
+            self.tempos[linhas, colunas, k] = tempos_para_segundos(setores[coluna]).to_numpy()
+        if all('Volta_Entrada' in d.columns for d in partes):
+            box = np.concatenate([(d['Volta_Entrada'] | d['Volta_Saida']).to_numpy(dtype=bool) for d in partes])
+            self.volta_de_box[linhas, colunas] = box
+
+        # fmin ignora NaN (voltas sem registro)
+        self.melhor_piloto = np.fmin.reduce(self.tempos, axis=1)
+        self.melhor_sessao = np.fmin.reduce(self.melhor_piloto, axis=0)
+
+    def indice_piloto(self, piloto: str) -> int:
+        """Retorna o índice do piloto no eixo 0 (KeyError se não existir)."""
+        return self._indice_piloto[piloto]
+
+    def deltas(self, referencia: str = REFERENCIA_SESSAO, piloto_referencia: str = None,
+               sem_box: bool = False) -> np.ndarray:
+        """
+        Diferença (s) de cada setor de cada volta para a referência, com broadcast sobre o tensor.
+
+        :param referencia: Uma de REFERENCIAS_SETORES
+        :param piloto_referencia: Piloto usado nas referências de piloto
+        :param sem_box: Se True, as voltas de entrada/saída do box ficam NaN
+        :return: Array (n_pilotos, n_voltas, n_setores); positivo = mais lento que a referência
+        """
+        if referencia == REFERENCIA_SESSAO:
+            base = self.melhor_sessao[None, None, :]
+        elif referencia == REFERENCIA_PROPRIA:
+            base = self.melhor_piloto[:, None, :]
+        elif referencia == REFERENCIA_PILOTO_VOLTA:
+            base = self.tempos[self.indice_piloto(piloto_referencia)][None, :, :]
+        elif referencia == REFERENCIA_PILOTO_MELHOR:
+            base = self.melhor_piloto[self.indice_piloto(piloto_referencia)][None, None, :]
+        else:
+            raise ValueError(f"Referência desconhecida: {referencia}")
+
+        deltas = self.tempos - base
+        if sem_box:
+            deltas = np.where(self.volta_de_box[:, :, None], np.nan, deltas)
+        return deltas
+
+    def resumo_por_setor(self, deltas: np.ndarray) -> pd.DataFrame:
+        """Mediana da diferença de cada piloto em cada setor (piloto × setor), ignorando voltas sem registro."""
+        with warnings.catch_warnings():
+            # Piloto sem nenhuma volta válida no setor: NaN sem aviso
+            warnings.simplefilter('ignore', RuntimeWarning)
+            mediana = np.nanmedian(deltas, axis=1)
+        return pd.DataFrame(mediana, index=pd.Index(self.pilotos, name='Piloto'), columns=self.setores).round(3)
+
+    def por_volta(self, deltas: np.ndarray, setor: str) -> pd.DataFrame:
+        """Matriz piloto × volta da diferença em um setor (só indexação no tensor)."""
+        k = self.setores.index(setor)
+        return pd.DataFrame(deltas[:, :, k], index=pd.Index(self.pilotos, name='Piloto'),
+                            columns=pd.Index(self.voltas, name='Lap'))
+
+
+@st.cache_resource(max_entries=MAX_SESSOES_SETORES_EM_CACHE, show_spinner=False)
+def obter_tensor_setores(chave_sessao: str, _driver_info: Dict[str, pd.DataFrame]) -> TensorSetores:
+    """Retorna o TensorSetores da sessão, montado uma única vez e compartilhado (somente leitura)."""
+    return TensorSetores(_driver_info)
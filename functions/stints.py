@@ -0,0 +1,137 @@
+"""
+Módulo de detecção de stints e voltas de box (entrada e saída).
+As voltas de todos os pilotos são analisadas de uma vez em uma tabela longa: uma volta é
+considerada de box quando é bem mais lenta que o ritmo do próprio piloto sem que o S2 também
+esteja lento (o que exclui voltas de safety car), ou quando há uma descontinuidade no
+Time of Day / número da volta (carro parado nos boxes entre duas passagens).
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+# Volta lenta: tempo acima deste fator da mediana móvel do piloto
+FATOR_VOLTA_LENTA = 1.12
+# Janela (em voltas) da mediana móvel do ritmo de cada piloto
+JANELA_RITMO = 7
+# Tempo parado (s) entre duas passagens, além do tempo de volta, que caracteriza uma ida aos boxes
+LIMITE_PARADA_SEGUNDOS = 10.0
+
+COLUNAS_STINT = ['Stint', 'Volta_Entrada', 'Volta_Saida']
+
+
+def detectar_stints(voltas: pd.DataFrame, fator_volta_lenta: float = FATOR_VOLTA_LENTA,
+                    janela: int = JANELA_RITMO, limite_parada: float = LIMITE_PARADA_SEGUNDOS) -> pd.DataFrame:
+    """
+    Marca voltas de entrada/saída dos boxes e numera os stints de cada piloto.
+
+    Uma volta lenta é classificada como entrada quando o excesso relativo está no S3 (pit lane
+    antes da linha) e como saída quando está no S1. Uma descontinuidade entre duas passagens
+    marca a volta anterior como entrada e a atual como saída, e a volta seguinte a uma entrada é
+    sempre uma saída (mesmo que pouco mais lenta que o ritmo). Um novo stint começa em cada volta
+    de saída.
+
+    :param voltas: Tabela longa com Piloto, Lap, Lap Tm (s) e, se existirem, S1 Tm, S3 Tm e Time of Day
+    :param fator_volta_lenta: Fator sobre o ritmo de referência para considerar a volta lenta
+    :param janela: Janela da mediana móvel do ritmo do piloto
+    :param limite_parada: Tempo parado (s) entre passagens que caracteriza ida aos boxes
+    :return: DataFrame com o mesmo índice de `voltas` e as colunas Stint (int16), Volta_Entrada e Volta_Saida
+    """
+    resultado = pd.DataFrame(index=voltas.index, columns=COLUNAS_STINT)
+    if voltas.empty:
+        return resultado.astype({'Stint': 'int16', 'Volta_Entrada': bool, 'Volta_Saida': bool})
+
+    dados = voltas.sort_values(['Piloto', 'Lap'], kind='stable')
+    piloto = pd.Categorical(dados['Piloto']).codes
+    grupos = dados.groupby(piloto, sort=False)
+    tempo = dados['Lap Tm'].astype(np.float64)
+
+    # Ritmo de referência: mediana móvel do piloto
+    ritmo_piloto = (tempo.groupby(piloto, sort=False)
+                    .rolling(janela, center=True, min_periods=1).median()
+                    .reset_index(level=0, drop=True))
+    lenta = tempo > fator_volta_lenta * ritmo_piloto
+
+    if {'S1 Tm', 'S2 Tm', 'S3 Tm'}.issubset(dados.columns):
+        # Em voltas de box o tempo perdido fica no S1 (saída) ou no S3 (entrada) e o S2 é normal;
+        # em voltas neutralizadas (safety car) o S2 também fica lento
+        excesso = {
+            setor: dados[setor] / grupos[setor].transform('median')
+            for setor in ['S1 Tm', 'S2 Tm', 'S3 Tm']
+        }
+        lenta &= ~(excesso['S2 Tm'] > fator_volta_lenta)
+        perfil_saida = (excesso['S1 Tm'] > excesso['S3 Tm']).to_numpy()
+    else:
+        # Sem setores: a volta também precisa ser lenta em relação ao pelotão na mesma volta
+        ritmo_pelotao = tempo.groupby(dados['Lap']).transform('median')
+        lenta &= tempo > fator_volta_lenta * ritmo_pelotao
+        perfil_saida = np.zeros(len(dados), dtype=bool)
+
+    # Descontinuidade: voltas faltando ou tempo parado entre duas passagens do mesmo piloto
+    primeira = np.r_[True, piloto[1:] != piloto[:-1]]
+    salto_volta = dados['Lap'].astype(np.int64).diff().to_numpy() > 1
+    if 'Time of Day' in dados.columns and pd.api.types.is_datetime64_any_dtype(dados['Time of Day']):
+        intervalo = dados['Time of Day'].diff().dt.total_seconds().to_numpy()
+        parado = (intervalo - tempo.to_numpy()) > limite_parada
+    else:
+        parado = np.zeros(len(dados), dtype=bool)
+    descontinuidade = (salto_volta | parado) & ~primeira
+
+    lenta = lenta.to_numpy()
+    saida = (lenta & perfil_saida) | descontinuidade
+    entrada = lenta & ~saida
+    # A volta antes de uma descontinuidade é a volta de entrada
+    entrada[:-1] |= descontinuidade[1:]
+
+    # A volta seguinte a uma entrada (do mesmo piloto) é a saída: a mediana móvel inclui a própria
+    # volta de entrada e o excesso no S1 pode ficar abaixo do fator de volta lenta
+    saida |= np.r_[False, entrada[:-1]] & ~primeira
+
+    # Novo stint em cada volta de saída
+    inicio = saida & ~primeira
+    inicio_acumulado = np.cumsum(inicio)
+    base_piloto = np.maximum.accumulate(np.where(primeira, inicio_acumulado, 0))
+    stint = inicio_acumulado - base_piloto + 1
+
+    resultado.loc[dados.index, 'Stint'] = stint
+    resultado.loc[dados.index, 'Volta_Entrada'] = entrada
+    resultado.loc[dados.index, 'Volta_Saida'] = saida
+    return resultado.astype({'Stint': 'int16', 'Volta_Entrada': bool, 'Volta_Saida': bool})
+
+
+def anexar_stints(driver_info: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Acrescenta as colunas Stint, Volta_Entrada e Volta_Saida aos DataFrames de cada piloto,
+    com a detecção feita uma única vez sobre todas as voltas da sessão.
+
+    :param driver_info: Dicionário {piloto: DataFrame de voltas} no esquema canônico
+    :return: Novo dicionário com as colunas de stint (colunas antigas de stint são recalculadas)
+    """
+    pilotos = [p for p, dados in driver_info.items() if isinstance(dados, pd.DataFrame) and not dados.empty]
+    if not pilotos:
+        return dict(driver_info)
+
+    colunas = [c for c in ['Lap', 'Lap Tm', 'S1 Tm', 'S2 Tm', 'S3 Tm', 'Time of Day']
+               if all(c in driver_info[p].columns for p in pilotos)]
+    tamanhos = [len(driver_info[p]) for p in pilotos]
+    voltas = pd.concat([driver_info[p][colunas] for p in pilotos], ignore_index=True)
+    voltas['Piloto'] = np.repeat(np.arange(len(pilotos)), tamanhos)
+    stints = detectar_stints(voltas)
+
+    resultado = dict(driver_info)
+    limites = np.r_[0, np.cumsum(tamanhos)]
+    for i, p in enumerate(pilotos):
+        trecho = stints.iloc[limites[i]:limites[i + 1]]
+        resultado[p] = driver_info[p].assign(**{c: trecho[c].to_numpy() for c in COLUNAS_STINT})
+    return resultado
+
+
+def remover_voltas_de_box(driver_info: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Retorna driver_info sem as voltas de entrada e saída dos boxes (se as colunas existirem)."""
+    filtrado = {}
+    for piloto, dados in driver_info.items():
+        if isinstance(dados, pd.DataFrame) and 'Volta_Entrada' in dados.columns:
+            dados = dados[~(dados['Volta_Entrada'] | dados['Volta_Saida'])]
+        filtrado[piloto] = dados
+    return filtrado
@@ -0,0 +1,348 @@
+"""
+Módulo de consumo de um feed de cronometragem ao vivo e do servidor de replay usado para testá-lo.
+O feed é uma conexão TCP local com um registro JSON por linha, um por passagem pela linha:
+{"Piloto": "12 - Lucas Foresti", "Lap": 5, "Lap Tm": 92.456, "S1 Tm": 30.1, "S2 Tm": 31.2,
+"S3 Tm": 31.1, "ST": 241.3, "Time of Day": "14:03:22.123"} (tempos em segundos ou "m:ss.mmm").
+O consumidor roda um laço asyncio em uma thread própria e só acumula os registros recebidos; a
+cada atualização da tela os pendentes são aplicados em lote ao mesmo modelo de voltas por piloto
+de separar_pilotos_por_volta (EstadoAoVivo). O servidor de replay transmite uma sessão salva no
+banco respeitando os intervalos reais entre passagens divididos por um fator de velocidade, o
+que permite testar (e submeter a carga) todo o caminho sem uma cronometragem real.
+
+Uso do replay fora da interface:
+    python -m functions.transmissao --sessao 3 --velocidade 20 --porta 8765
+"""
+import argparse
+import asyncio
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from functions.ao_vivo import EstadoAoVivo
+from functions.database import carregar_sessao
+from functions.esquema import DATA_BASE_HORARIO, compactar_voltas
+from functions.utils import COLUNAS_VOLTA_PILOTO, separar_pilotos_por_volta
+
+
+HOST_PADRAO = '127.0.0.1'
+PORTA_PADRAO = 8765
+
+# Fator de velocidade padrão do replay (0 transmite sem esperas, para testes de carga)
+VELOCIDADE_PADRAO = 10.0
+
+# Segundos entre tentativas de reconexão do consumidor
+ESPERA_RECONEXAO = 2.0
+
+# Linhas enviadas entre esperas pelo cliente no replay sem esperas (velocidade 0)
+LINHAS_POR_ENVIO = 1000
+
+# Tamanho máximo de uma linha do feed
+LIMITE_LINHA = 64 * 1024
+
+CAMPOS_REGISTRO = ['Piloto'] + COLUNAS_VOLTA_PILOTO
+
+
+def registros_da_sessao(driver_info: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Passagens de todos os pilotos em ordem de horário (a ordem em que um feed as transmitiria).
+
+    :param driver_info: Dicionário {piloto: DataFrame de voltas}
+    :return: DataFrame com CAMPOS_REGISTRO, sem passagens sem horário
+    """
+    partes = [compactar_voltas(dados).assign(Piloto=piloto) for piloto, dados in driver_info.items()
+              if isinstance(dados, pd.DataFrame) and not dados.empty]
+    if not partes:
+        return pd.DataFrame(columns=CAMPOS_REGISTRO)
+    voltas = pd.concat(partes, ignore_index=True).reindex(columns=CAMPOS_REGISTRO)
+    voltas = voltas.dropna(subset=['Time of Day'])
+    return voltas.sort_values('Time of Day', kind='stable').reset_index(drop=True)
+
+
+def codificar_registros(voltas: pd.DataFrame) -> List[bytes]:
+    """Uma linha JSON (terminada em \\n) por passagem; tempos em segundos e Time of Day como "HH:MM:SS.mmm"."""
+    voltas = voltas.copy()
+    voltas['Time of Day'] = voltas['Time of Day'].dt.strftime('%H:%M:%S.%f').str[:-3]
+    voltas['Lap'] = voltas['Lap'].astype(int)
+    for coluna in ['Lap Tm', 'S1 Tm', 'S2 Tm', 'S3 Tm', 'ST']:
+        voltas[coluna] = voltas[coluna].astype('float64').round(3)
+    # NaN vira null no JSON
+    registros = voltas.astype(object).where(voltas.notna(), None).to_dict('records')
+    return [(json.dumps(registro, ensure_ascii=False) + '\n').encode('utf-8') for registro in registros]
+
+
+def voltas_da_sessao_salva(sessao_id: int) -> Dict[str, pd.DataFrame]:
+    """driver_info de uma sessão salva no banco (recalculado a partir do df_original se necessário)."""
+    sessao = carregar_sessao(sessao_id)
+    if sessao is None:
+        raise ValueError(f"Sessão ID {sessao_id} não encontrada no banco de dados.")
+    dados = sessao.get('dados_processados', {})
+    driver_info = dados.get('driver_info')
+    if isinstance(driver_info, dict):
+        return {piloto: pd.DataFrame(voltas) if isinstance(voltas, list) else voltas
+                for piloto, voltas in driver_info.items()}
+    if isinstance(dados.get('df_original'), pd.DataFrame):
+        return separar_pilotos_por_volta(dados['df_original'])
+    raise ValueError(f"Sessão ID {sessao_id} não tem dados de voltas.")
+
+
+class _LacoEmSegundoPlano:
+    """Laço asyncio rodando em uma thread daemon (a interface do Streamlit é síncrona)."""
+
+    def _iniciar_laco(self, nome: str):
+        self._laco = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._laco.run_forever, name=nome, daemon=True)
+        self._thread.start()
+
+    def _executar(self, corrotina):
+        """Agenda a corrotina no laço e devolve o concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(corrotina, self._laco)
+
+    def parar(self):
+        """Cancela as tarefas do laço e encerra a thread."""
+        async def _cancelar():
+            for tarefa in asyncio.all_tasks():
+                if tarefa is not asyncio.current_task():
+                    tarefa.cancel()
+
+        if self._laco.is_running():
+            self._executar(_cancelar()).result(timeout=5)
+            self._laco.call_soon_threadsafe(self._laco.stop)
+            self._thread.join(timeout=5)
+
+
+class ServidorReplay(_LacoEmSegundoPlano):
+    """
+    Servidor TCP que transmite uma sessão gravada como feed de cronometragem.
+
+    Cada cliente recebe a sessão inteira desde a primeira passagem, com os intervalos reais entre
+    passagens divididos por `velocidade` (0 = sem esperas).
+
+    :param driver_info: Dicionário {piloto: DataFrame de voltas} da sessão
+    :param velocidade: Fator de velocidade (10 = 10× mais rápido que a sessão real)
+    :param host: Endereço de escuta
+    :param porta: Porta de escuta (0 escolhe uma livre; ver atributo porta depois de iniciar)
+    """
+
+    def __init__(self, driver_info: Dict[str, pd.DataFrame], velocidade: float = VELOCIDADE_PADRAO,
+                 host: str = HOST_PADRAO, porta: int = PORTA_PADRAO):
+        voltas = registros_da_sessao(driver_info)
+        self.linhas = codificar_registros(voltas)
+        # Instante de cada passagem em segundos desde a primeira
+        segundos = (voltas['Time of Day'] - DATA_BASE_HORARIO).dt.total_seconds().to_numpy()
+        self.instantes = segundos - segundos[0] if len(segundos) else segundos
+        self.velocidade = velocidade
+        self.host = host
+        self.porta = porta
+        self.clientes = 0
+        self._servidor = None
+
+    def iniciar(self) -> 'ServidorReplay':
+        """Abre o servidor em uma thread própria e retorna quando ele já aceita conexões."""
+        self._iniciar_laco(f"replay-{self.porta}")
+        try:
+            self._servidor = self._executar(
+                asyncio.start_server(self._atender, self.host, self.porta)).result(timeout=5)
+        except BaseException:
+            # Porta em uso, por exemplo: a thread do laço não fica para trás
+            super().parar()
+            raise
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        return self
+
+    def parar(self):
+        """Fecha a porta de escuta, encerra as transmissões em andamento e a thread."""
+        if self._servidor is not None and self._laco.is_running():
+            self._laco.call_soon_threadsafe(self._servidor.close)
+        super().parar()
+
+    async def _atender(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.clientes += 1
+        laco = asyncio.get_running_loop()
+        inicio = laco.time()
+        try:
+            for i, (linha, instante) in enumerate(zip(self.linhas, self.instantes)):
+                if self.velocidade > 0:
+                    # Horário alvo absoluto: as esperas não acumulam atraso ao longo do replay
+                    espera = inicio + instante / self.velocidade - laco.time()
+                    if espera > 0:
+                        await writer.drain()
+                        await asyncio.sleep(espera)
+                elif i % LINHAS_POR_ENVIO == 0:
+                    await writer.drain()
+                writer.write(linha)
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clientes -= 1
+            writer.close()
+
+
+class ConsumidorFeed(_LacoEmSegundoPlano):
+    """
+    Cliente asyncio de um feed de cronometragem (JSON por linha sobre TCP).
+
+    A thread do consumidor só lê e decodifica os registros; atualizar() aplica os pendentes em
+    lote ao EstadoAoVivo, com a mesma interface de SessaoAoVivo. Passagens de uma volta que o
+    piloto já completou (reenvio depois de uma reconexão) são descartadas.
+
+    :param host: Endereço do feed
+    :param porta: Porta do feed
+    """
+
+    def __init__(self, host: str = HOST_PADRAO, porta: int = PORTA_PADRAO):
+        self.host = host
+        self.porta = porta
+        self.estado = EstadoAoVivo()
+        self.conectado = False
+        self.registros_recebidos = 0
+        self.registros_invalidos = 0
+        self._trava = threading.Lock()
+        self._pendentes: List[dict] = []
+        self._iniciar_laco(f"feed-{host}:{porta}")
+        # Referência mantida: o laço guarda só referências fracas às tarefas
+        self._tarefa = self._executar(self._consumir())
+
+    async def _consumir(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.porta, limit=LIMITE_LINHA)
+            except OSError:
+                await asyncio.sleep(ESPERA_RECONEXAO)
+                continue
+
+            self.conectado = True
+            try:
+                async for linha in reader:
+                    self._receber(linha)
+            except (ConnectionError, ValueError):
+                pass
+            finally:
+                self.conectado = False
+                writer.close()
+            await asyncio.sleep(ESPERA_RECONEXAO)
+
+    def reiniciar(self):
+        """Descarta as voltas recebidas (ex.: o replay na porta do feed passou a transmitir outra sessão)."""
+        with self._trava:
+            self._pendentes = []
+            self.estado = EstadoAoVivo()
+
+    def _receber(self, linha: bytes):
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            registro = None
+        if not isinstance(registro, dict) or not registro.get('Piloto'):
+            self.registros_invalidos += 1
+            return
+        with self._trava:
+            self._pendentes.append(registro)
+            self.registros_recebidos += 1
+
+    def atualizar(self) -> int:
+        """
+        Aplica os registros recebidos desde a última chamada.
+
+        :return: Quantidade de voltas novas
+        """
+        with self._trava:
+            registros, self._pendentes = self._pendentes, []
+        if not registros:
+            return 0
+
+        lote = compactar_voltas(pd.DataFrame.from_records(registros).reindex(columns=CAMPOS_REGISTRO))
+        lote['Piloto'] = lote['Piloto'].astype(str)
+        # Descarta voltas já recebidas (o replay reenvia a sessão desde o início a cada conexão)
+        ultima_volta = lote['Piloto'].map(self.estado.resumo['Volta_Atual']).fillna(0).to_numpy()
+        lote = lote[lote['Lap'].to_numpy() > ultima_volta]
+        lote = lote.drop_duplicates(subset=['Piloto', 'Lap'], keep='last')
+
+        partes = [(piloto, 0, voltas[COLUNAS_VOLTA_PILOTO].reset_index(drop=True))
+                  for piloto, voltas in lote.groupby('Piloto', sort=False)]
+        return self.estado.aplicar(partes)
+
+    def situacao(self) -> str:
+        endereco = f"{self.host}:{self.porta}"
+        if self.conectado:
+            return f"Conectado a {endereco} · {self.registros_recebidos} passagens recebidas"
+        return f"Sem conexão com {endereco} (nova tentativa a cada {ESPERA_RECONEXAO:g} s)"
+
+
+@st.cache_resource(show_spinner=False)
+def obter_consumidor_feed(host: str = HOST_PADRAO, porta: int = PORTA_PADRAO) -> ConsumidorFeed:
+    """ConsumidorFeed compartilhado por endereço entre reexecuções e abas do navegador."""
+    return ConsumidorFeed(host, porta)
+
+
+class ServidoresReplay:
+    """
+    No máximo um ServidorReplay por porta, compartilhado por todos os usuários do processo.
+    Iniciar um replay com outra sessão ou velocidade em uma porta ocupada para o anterior antes.
+    """
+
+    def __init__(self):
+        self._servidores: Dict[int, Tuple[Tuple[int, float], ServidorReplay]] = {}
+        self._lock = threading.Lock()
+
+    def iniciar(self, sessao_id: int, velocidade: float = VELOCIDADE_PADRAO,
+                porta: int = PORTA_PADRAO) -> ServidorReplay:
+        """
+        Inicia o replay da sessão salva na porta (ou retorna o que já transmite a mesma sessão e velocidade).
+
+        :raises OSError: Se a porta não puder ser aberta
+        :raises ValueError: Se a sessão não existir ou não tiver voltas
+        """
+        with self._lock:
+            atual = self._servidores.get(porta)
+            if atual is not None and atual[0] == (sessao_id, velocidade):
+                return atual[1]
+            if atual is not None:
+                self._servidores.pop(porta)[1].parar()
+            servidor = ServidorReplay(voltas_da_sessao_salva(sessao_id), velocidade, HOST_PADRAO, porta).iniciar()
+            self._servidores[porta] = ((sessao_id, velocidade), servidor)
+            return servidor
+
+    def ativo(self, porta: int) -> Optional[ServidorReplay]:
+        """Servidor que transmite na porta, se houver."""
+        with self._lock:
+            atual = self._servidores.get(porta)
+            return atual[1] if atual is not None else None
+
+    def parar(self, porta: int):
+        """Para o replay da porta (se houver) e libera a porta."""
+        with self._lock:
+            atual = self._servidores.pop(porta, None)
+        if atual is not None:
+            atual[1].parar()
+
+
+@st.cache_resource
+def obter_servidores_replay() -> ServidoresReplay:
+    """Retorna o registro único de servidores de replay do processo."""
+    return ServidoresReplay()
+
+
+def main(argumentos: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Transmite uma sessão salva como feed de cronometragem.")
+    parser.add_argument('--sessao', type=int, required=True, help="ID da sessão no banco de dados")
+    parser.add_argument('--velocidade', type=float, default=VELOCIDADE_PADRAO,
+                        help="Fator de velocidade (0 = sem esperas)")
+    parser.add_argument('--host', default=HOST_PADRAO)
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    args = parser.parse_args(argumentos)
+
+    servidor = ServidorReplay(voltas_da_sessao_salva(args.sessao), args.velocidade, args.host, args.porta).iniciar()
+    print(f"Replay da sessão {args.sessao} em {servidor.host}:{servidor.porta} "
+          f"({len(servidor.linhas)} passagens, {args.velocidade:g}×). Ctrl+C para encerrar.")
+    try:
+        servidor._thread.join()
+    except KeyboardInterrupt:
+        servidor.parar()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,11 @@
 import pandas as pd
 from functions.constants import piloto_modelo, modelo_cor, pilotos_cor_amattheis
+from functions.esquema import compactar_voltas, tempos_para_segundos, formatar_tempo
+from functions.corrida import MatrizVoltas, ReconstrucaoCorrida, ReplayCorrida, montar_matriz_voltas
+from functions.estatisticas import mascara_outliers, resumo_boxplot, LIMITE_AMOSTRAS_BOXPLOT
+from functions.amostragem import indices_min_max, usar_webgl
+from functions.validacao import validar_dataframe_csv
+from functions.cabecalhos import ParserCabecalhoPiloto, detectar_parser_cabecalho
 import plotly.express as px
 import plotly.graph_objects as go
 import matplotlib.pyplot as plt
@@ -12,54 +18,56 @@ import tempfile
 import plotly.io as pio
 import numpy as np
 import base64
+import hashlib
 from io import BytesIO
 from PIL import Image
 from typing import Tuple
 
 
+def calcular_hash_dados(*objetos) -> str:
+    """
+    Calcula um hash estável (sha256) para DataFrames, dicionários de DataFrames e bytes.
+
+    Args:
+        *objetos: DataFrames, dicionários (como driver_info), bytes ou valores simples
+
+    Returns:
+        str: Hash hexadecimal que identifica o conteúdo dos dados
+    """
+    hasher = hashlib.sha256()
+
+    def atualizar(obj):
+        if isinstance(obj, pd.DataFrame):
+            hasher.update(str(list(obj.columns)).encode())
+            hasher.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+        elif isinstance(obj, pd.Series):
+            hasher.update(str(obj.name).encode())
+            hasher.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+        elif isinstance(obj, dict):
+            for chave in sorted(obj, key=str):
+                hasher.update(str(chave).encode())
+                atualizar(obj[chave])
+        elif isinstance(obj, (bytes, bytearray)):
+            hasher.update(obj)
+        else:
+            hasher.update(repr(obj).encode())
+
+    for obj in objetos:
+        atualizar(obj)
+
+    return hasher.hexdigest()
+
+
 def validar_csv(df: pd.DataFrame) -> Tuple[bool, str]:
     """
     Valida se o CSV possui todas as colunas obrigatórias e dados válidos.
+    O relatório completo (avisos e linhas com problema) é dado por validacao.validar_dataframe_csv.
     
     :param df: DataFrame a ser validado
     :return: Tupla (é_válido, mensagem_erro)
     """
-    # Colunas obrigatórias esperadas
-    colunas_obrigatorias = ['Time of Day', 'Lap', 'Lap Tm', 'S1 Tm', 'S2 Tm', 'S3 Tm']
-    
-    # Verificar se o DataFrame está vazio
-    if df.empty:
-        return False, "O arquivo CSV está vazio. Verifique se o arquivo contém dados."
-    
-    # Verificar colunas obrigatórias
-    colunas_faltando = []
-    colunas_df = [col.strip() for col in df.columns]
-    
-    for col_obrigatoria in colunas_obrigatorias:
-        if col_obrigatoria not in colunas_df:
-            colunas_faltando.append(col_obrigatoria)
-    
-    if colunas_faltando:
-        return False, f"Colunas obrigatórias não encontradas: {', '.join(colunas_faltando)}. " \
-                     f"Colunas encontradas: {', '.join(colunas_df[:10])}" + \
-                     ("..." if len(colunas_df) > 10 else "")
-    
-    # Verificar se há coluna de velocidade (ST ou SPT)
-    colunas_upper = [col.strip().upper() for col in df.columns]
-    if 'ST' not in colunas_upper and 'SPT' not in colunas_upper:
-        return False, "Coluna de velocidade final ('ST' ou 'SPT') não encontrada no CSV."
-    
-    # Verificar se há dados válidos (não apenas cabeçalhos)
-    if len(df) == 0:
-        return False, "O arquivo CSV não contém dados, apenas cabeçalhos."
-    
-    # Verificar se há pelo menos alguns dados não nulos nas colunas principais
-    colunas_principais = ['Lap', 'Lap Tm']
-    for col in colunas_principais:
-        if col in df.columns and df[col].isna().all():
-            return False, f"A coluna '{col}' está completamente vazia."
-    
-    return True, ""
+    relatorio = validar_dataframe_csv(df)
+    return relatorio.valido, relatorio.mensagem_erro()
 
 
 def normalizar_coluna_velocidade(df):
@@ -76,35 +84,78 @@ def normalizar_coluna_velocidade(df):
     return df
 
 
-def separar_pilotos_por_volta(df):
-    """Separa os dados por piloto, com base na linha que contém 'Stock' no Time of Day."""
-    driver_info = {}
-    current_driver = None
+# Colunas de volta mantidas para cada piloto
+COLUNAS_VOLTA_PILOTO = ['Lap', 'Lap Tm', 'S1 Tm', 'S2 Tm', 'S3 Tm', 'ST', 'Time of Day']
 
-    # Identifica linhas com nome dos pilotos
-    piloto_mask = df['Time of Day'].str.contains('Stock', na=False)
 
-    for i, row in df.iterrows():
-        if piloto_mask[i]:
-            current_driver = (
-                row['Time of Day']
-                .replace(' - Stock Car PRO 2024', '')
-                .replace(' - Stock Car Pro Rookie', '')
-                .replace(' - Stock Car Pro', '')
-                .strip()
-                .title()
-            )
-            driver_info[current_driver] = []
-        elif current_driver:
-            driver_info[current_driver].append(row)
+class SeparadorPilotos:
+    """
+    Separa as voltas por piloto de forma incremental, um bloco de linhas do CSV por vez.
+
+    Cada linha de cabeçalho de piloto no Time of Day (ver functions.cabecalhos) abre um novo
+    bloco; as linhas seguintes (inclusive as do próximo bloco de leitura) pertencem a ele. As
+    voltas de cada bloco são compactadas assim que chegam, de modo que só o esquema compacto
+    fica em memória. Se um piloto aparecer em mais de um cabeçalho, vale o último bloco (como
+    na separação original).
 
-    # Converte listas de linhas em DataFrames com colunas específicas
-    for driver in driver_info:
-        temp_df = pd.DataFrame(driver_info[driver])
-        driver_info[driver] = temp_df[['Lap', 'Lap Tm',
-                                       'S1 Tm', 'S2 Tm', 'S3 Tm', 'ST']].copy()
+    :param parser: Parser de cabeçalho do campeonato; None detecta no primeiro bloco
+    """
 
-    return driver_info
+    def __init__(self, parser: ParserCabecalhoPiloto = None):
+        self.parser = parser
+        self._pilotos = []   # nome do piloto de cada bloco
+        self._partes = []    # lista de DataFrames compactos de cada bloco
+        self._colunas = None
+        # (piloto, bloco, voltas compactas) recebidos na última chamada de adicionar()
+        self.ultimas_partes = []
+
+    def adicionar(self, df: pd.DataFrame, cabecalho: np.ndarray = None) -> 'SeparadorPilotos':
+        """
+        Processa mais um bloco de linhas (DataFrame bruto ou já compactado por compactar_dataframe_bruto).
+
+        :param df: Bloco de linhas do CSV
+        :param cabecalho: Máscara das linhas de cabeçalho de piloto, se já calculada (ver ValidadorCSV.adicionar)
+        :return: O próprio separador
+        """
+        if self._colunas is None:
+            self._colunas = list(df.columns)
+
+        if self.parser is None:
+            self.parser = detectar_parser_cabecalho(df['Time of Day'])
+        if cabecalho is None:
+            cabecalho = self.parser.mascara_cabecalho(df['Time of Day'])
+        primeiro_bloco = len(self._pilotos)
+        self.ultimas_partes = []
+
+        for piloto in self.parser.extrair(df.loc[cabecalho, 'Time of Day'])['Piloto']:
+            self._pilotos.append(piloto)
+            self._partes.append([])
+
+        # Bloco de cada volta: linhas antes do primeiro cabeçalho deste trecho continuam o bloco anterior
+        bloco = np.cumsum(cabecalho) + primeiro_bloco - 1
+        voltas = ~cabecalho & (bloco >= 0)
+        if voltas.any():
+            dados = df.loc[voltas, COLUNAS_VOLTA_PILOTO]
+            for b, parte in dados.groupby(bloco[voltas], sort=False):
+                parte = compactar_voltas(parte)
+                self._partes[b].append(parte)
+                self.ultimas_partes.append((self._pilotos[b], b, parte))
+        return self
+
+    def resultado(self) -> dict:
+        """Dicionário {piloto: DataFrame de voltas} no esquema compacto."""
+        driver_info = {}
+        for piloto, partes in zip(self._pilotos, self._partes):
+            if partes:
+                driver_info[piloto] = pd.concat(partes, ignore_index=True)
+            else:
+                driver_info[piloto] = compactar_voltas(pd.DataFrame(columns=self._colunas)[COLUNAS_VOLTA_PILOTO])
+        return driver_info
+
+
+def separar_pilotos_por_volta(df, parser: ParserCabecalhoPiloto = None):
+    """Separa os dados por piloto, com base nas linhas de cabeçalho de piloto no Time of Day."""
+    return SeparadorPilotos(parser).adicionar(df).resultado()
 
 
 def maior_velocidade_por_piloto(driver_info):
@@ -182,6 +233,9 @@ def convert_time_to_seconds(time_str):
     try:
         if pd.isna(time_str):
             return None
+        if isinstance(time_str, (int, float, np.number)):
+            # Já convertido para segundos (esquema compacto)
+            return float(time_str)
         if ':' in time_str:
             minutes, seconds = time_str.split(':')
             seconds, milliseconds = seconds.split('.')
@@ -202,8 +256,7 @@ def processar_resultado_csv(df):
 
     for piloto, dados in driver_info.items():
         dados = dados.copy()
-        dados['Lap_Tm_Segundos'] = dados['Lap Tm'].apply(
-            convert_time_to_seconds)
+        dados['Lap_Tm_Segundos'] = tempos_para_segundos(dados['Lap Tm'])
         dados = dados.dropna(subset=['Lap_Tm_Segundos'])
 
         if not dados.empty:
@@ -212,10 +265,10 @@ def processar_resultado_csv(df):
                 'Piloto': piloto,
                 'Numeral': piloto.split(' - ')[0],
                 'Melhor_Volta': melhor_volta['Lap Tm'],
-                'S1 Tm': melhor_volta['S1 Tm'],
-                'S2 Tm': melhor_volta['S2 Tm'],
-                'S3 Tm': melhor_volta['S3 Tm'],
-                'Lap_Tm_Segundos': melhor_volta['Lap_Tm_Segundos']
+                'S1 Tm': round(float(melhor_volta['S1 Tm']), 3),
+                'S2 Tm': round(float(melhor_volta['S2 Tm']), 3),
+                'S3 Tm': round(float(melhor_volta['S3 Tm']), 3),
+                'Lap_Tm_Segundos': round(float(melhor_volta['Lap_Tm_Segundos']), 3)
             })
 
     df_resultado = pd.DataFrame(resultados)
@@ -224,15 +277,83 @@ def processar_resultado_csv(df):
         by='Lap_Tm_Segundos').reset_index(drop=True)
     df_resultado['Posição'] = df_resultado.index + 1
 
-    df_resultado['Melhor_Volta'] = df_resultado['Lap_Tm_Segundos'].apply(
-        lambda x: f"{int(x // 60)}:{int(x % 60):02d}.{int((x * 1000) % 1000):03d}" if pd.notna(x) else ''
-    )
+    df_resultado['Melhor_Volta'] = df_resultado['Lap_Tm_Segundos'].apply(formatar_tempo)
 
     df_resultado = df_resultado[[
         'Posição', 'Numeral', 'Piloto', 'Melhor_Volta', 'S1 Tm', 'S2 Tm', 'S3 Tm']]
     df_resultado['Piloto'] = df_resultado['Piloto']
     return df_resultado
 
+
+def gerar_heatmap_deltas_setores(df_deltas: pd.DataFrame) -> go.Figure:
+    """
+    Gera o heatmap piloto × setor com a diferença (s) para o melhor setor da sessão.
+
+    Args:
+        df_deltas (pd.DataFrame): Matriz retornada por calcular_melhores_setores (índice = piloto).
+
+    Returns:
+        go.Figure: Heatmap Plotly (verde = próximo do melhor da sessão).
+    """
+    fig = go.Figure(go.Heatmap(
+        z=df_deltas.to_numpy(),
+        x=list(df_deltas.columns),
+        y=list(df_deltas.index),
+        colorscale='RdYlGn_r',
+        text=np.round(df_deltas.to_numpy(), 3),
+        texttemplate='%{text:.3f}',
+        hovertemplate='%{y}<br>%{x}: +%{z:.3f}s<extra></extra>',
+        colorbar=dict(title='Δ (s)')
+    ))
+
+    fig.update_layout(
+        title='Diferença para o Melhor Setor da Sessão',
+        title_x=0.35,
+        height=max(400, 25 * len(df_deltas)),
+        yaxis=dict(autorange='reversed')
+    )
+
+    return fig
+
+
+def gerar_heatmap_deltas_tensor(df_deltas: pd.DataFrame, titulo: str, rotulo_x: str) -> go.Figure:
+    """
+    Gera o heatmap das diferenças do TensorSetores (piloto × setor ou piloto × volta).
+
+    Args:
+        df_deltas (pd.DataFrame): Diferenças em segundos (índice = piloto).
+        titulo (str): Título do gráfico.
+        rotulo_x (str): Rótulo do eixo X ('Setor' ou 'Volta').
+
+    Returns:
+        go.Figure: Heatmap Plotly; com diferenças negativas (referência de piloto) a escala é centrada em zero.
+    """
+    valores = df_deltas.to_numpy(dtype=np.float64)
+    tem_negativo = np.nanmin(valores, initial=0.0) < 0
+    poucas_colunas = df_deltas.shape[1] <= 10
+
+    fig = go.Figure(go.Heatmap(
+        z=valores,
+        x=[str(c) for c in df_deltas.columns],
+        y=list(df_deltas.index),
+        colorscale='RdBu_r' if tem_negativo else 'RdYlGn_r',
+        zmid=0 if tem_negativo else None,
+        text=np.round(valores, 3) if poucas_colunas else None,
+        texttemplate='%{text:.3f}' if poucas_colunas else None,
+        hovertemplate=f'%{{y}}<br>{rotulo_x} %{{x}}: %{{z:+.3f}}s<extra></extra>',
+        colorbar=dict(title='Δ (s)')
+    ))
+
+    fig.update_layout(
+        title=titulo,
+        title_x=0.35,
+        xaxis_title=rotulo_x,
+        height=max(400, 25 * len(df_deltas)),
+        yaxis=dict(autorange='reversed')
+    )
+
+    return fig
+
 # Função para montar um dataframe com todos os dados, já com a montadora associada
 
 
@@ -243,36 +364,93 @@ def montar_dataframe_completo(driver_info: dict) -> pd.DataFrame:
     for piloto, df_piloto in driver_info.items():
         df_temp = df_piloto.copy()
         df_temp['Piloto'] = piloto
-        df_temp['Lap_seconds'] = df_temp['Lap Tm'].apply(
-            convert_time_to_seconds)
+        df_temp['Lap_seconds'] = tempos_para_segundos(df_temp['Lap Tm'])
         modelo = piloto_modelo.get(piloto, 'Desconhecido')
         df_temp['Montadora'] = modelo
         lista_dfs.append(df_temp)
 
-    return pd.concat(lista_dfs, ignore_index=True)
+    df_completo = pd.concat(lista_dfs, ignore_index=True)
+
+    # Piloto e Montadora como categorias (nomes repetidos em todas as linhas)
+    df_completo['Piloto'] = pd.Categorical(df_completo['Piloto'], categories=list(driver_info.keys()))
+    df_completo['Montadora'] = df_completo['Montadora'].astype('category')
+
+    return df_completo
+
+
+def gerar_boxplot_resumido(df: pd.DataFrame, x: str, y: str, cor: str = None, mapa_cores: dict = None,
+                           rotulo_y: str = None) -> go.Figure:
+    """
+    Boxplot montado a partir das estatísticas de cada caixa calculadas no servidor (quartis,
+    bigodes e só os outliers mais extremos), sem enviar todas as amostras ao navegador.
+
+    :param df: DataFrame longo com as amostras
+    :param x: Coluna que define as caixas (ex.: Piloto)
+    :param y: Coluna numérica
+    :param cor: Coluna que define a cor/legenda de cada caixa (padrão: a própria x)
+    :param mapa_cores: Dicionário {valor de cor: cor}; sem ele usa a sequência padrão do Plotly
+    :param rotulo_y: Rótulo do eixo/hover de y
+    :return: go.Figure com um go.Box por valor de cor e os outliers em pontos
+    """
+    cor = cor or x
+    rotulo_y = rotulo_y or y
+    caixas, outliers = resumo_boxplot(df, y, x)
+
+    primeiras = df.drop_duplicates(x)
+    cor_de_x = dict(zip(primeiras[x].to_numpy(), primeiras[cor].to_numpy()))
+    caixas['_cor'] = caixas[x].map(cor_de_x)
+    outliers['_cor'] = outliers[x].map(cor_de_x)
+
+    sequencia = px.colors.qualitative.Plotly
+    fig = go.Figure()
+    for i, (valor_cor, caixas_cor) in enumerate(caixas.groupby('_cor', sort=False)):
+        cor_trace = (mapa_cores or {}).get(valor_cor, sequencia[i % len(sequencia)])
+        fig.add_trace(go.Box(
+            x=caixas_cor[x], q1=caixas_cor['q1'], median=caixas_cor['median'], q3=caixas_cor['q3'],
+            lowerfence=caixas_cor['lowerfence'], upperfence=caixas_cor['upperfence'],
+            name=str(valor_cor), legendgroup=str(valor_cor), marker_color=cor_trace, boxpoints=False
+        ))
+        pontos = outliers[outliers['_cor'] == valor_cor]
+        if not pontos.empty:
+            fig.add_trace(go.Scatter(
+                x=pontos[x], y=pontos['valor'], mode='markers', name=str(valor_cor),
+                legendgroup=str(valor_cor), showlegend=False, marker=dict(color=cor_trace, size=5),
+                hovertemplate=f'%{{x}}<br>{rotulo_y}: %{{y}}<extra></extra>'
+            ))
+
+    fig.update_layout(boxmode='overlay')
+    fig.update_xaxes(categoryorder='array', categoryarray=list(caixas[x]), title_text=x)
+    fig.update_yaxes(title_text=rotulo_y)
+    return fig
+
 
 # Função para gerar boxplot de setores (S1, S2, S3 ou volta completa)
 
 
-def gerar_boxplot_setor(df: pd.DataFrame, coluna_tempo: str, titulo: str, margem: float = 0.02, agrupador: str = 'Montadora') -> go.Figure:
+def gerar_boxplot_setor(df: pd.DataFrame, coluna_tempo: str, titulo: str, margem: float = 0.02, agrupador: str = 'Montadora',
+                        resumido: bool = None) -> go.Figure:
     df[coluna_tempo] = pd.to_numeric(df[coluna_tempo], errors='coerce')
-    df[coluna_tempo] = df[coluna_tempo].fillna(float('inf'))
-
-    melhores = df.groupby(agrupador)[coluna_tempo].min()
-    limites = melhores * (1 + margem)
 
-    filtrado = df[df.apply(lambda x: x[coluna_tempo] <=
-                           limites.get(x[agrupador], float('inf')), axis=1)]
+    # Mantém as voltas até (1 + margem) × melhor tempo do grupo
+    filtrado = df[mascara_outliers(df, coluna_tempo, 'percentual_melhor', 1 + margem, agrupador)]
+    mapa_cores = modelo_cor if agrupador == 'Montadora' else None
 
-    fig = px.box(
-        filtrado,
-        x=agrupador,
-        y=coluna_tempo,
-        title=titulo,
-        color=agrupador,
-        labels={coluna_tempo: f'Tempo ({coluna_tempo})'},
-        color_discrete_map=modelo_cor if agrupador == 'Montadora' else None
-    )
+    # Sessões longas: estatísticas das caixas calculadas no servidor
+    if resumido is None:
+        resumido = len(filtrado) > LIMITE_AMOSTRAS_BOXPLOT
+    if resumido:
+        fig = gerar_boxplot_resumido(filtrado, agrupador, coluna_tempo, mapa_cores=mapa_cores,
+                                     rotulo_y=f'Tempo ({coluna_tempo})')
+    else:
+        fig = px.box(
+            filtrado,
+            x=agrupador,
+            y=coluna_tempo,
+            title=titulo,
+            color=agrupador,
+            labels={coluna_tempo: f'Tempo ({coluna_tempo})'},
+            color_discrete_map=mapa_cores
+        )
 
     fig.update_layout(
         title=dict(text=titulo, font=dict(size=24), x=0.5, xanchor='center'),
@@ -282,44 +460,35 @@ def gerar_boxplot_setor(df: pd.DataFrame, coluna_tempo: str, titulo: str, margem
     return fig
 
 
-def processar_gap_st(df):
+def processar_gap_st(df, parser: ParserCabecalhoPiloto = None):
     """
     Processa o DataFrame bruto para gerar um novo com colunas:
     Piloto, Time of Day, ST, GAP, ST_next, Lap
 
     GAP: diferença em segundos para o piloto imediatamente mais rápido na mesma volta.
+    Os cabeçalhos de piloto são interpretados por `parser` (detectado no arquivo se None).
     """
 
-    results = []
-    current_pilot = None
+    tod = df['Time of Day']
+    if parser is None:
+        parser = detectar_parser_cabecalho(tod)
 
-    # Extrair linhas com dados válidos (tempo e ST) e piloto
-    for index, row in df.iterrows():
-        if isinstance(row[0], str) and "Stock" in row[0]:
-            current_pilot = row[0]
-        elif isinstance(row[0], str) and ':' in row[0]:
-            try:
-                time_str = row[0]
-                st_value = row[6]  # índice da coluna ST na linha
-                lap = row[1]       # número da volta
+    # Piloto de cada linha: nome extraído nas linhas de cabeçalho, propagado para as voltas seguintes
+    cabecalho = parser.mascara_cabecalho(tod)
+    piloto_linha = pd.Series(None, index=df.index, dtype=object)
+    piloto_linha[cabecalho] = parser.extrair(tod[cabecalho])['Piloto']
+    piloto_linha = piloto_linha.ffill()
 
-                results.append((current_pilot, time_str, st_value, lap))
-            except Exception:
-                continue
+    # Linhas com dados válidos (horário com ':') fora dos cabeçalhos
+    dados = ~cabecalho & tod.str.contains(':', na=False, regex=False).to_numpy()
 
     # Criar DataFrame limpo
-    cleaned_df = pd.DataFrame(
-        results, columns=['Piloto', 'Time of Day', 'ST', 'Lap'])
-
-    # Limpar nome do piloto
-    cleaned_df['Piloto'] = (
-        cleaned_df['Piloto']
-        .str.replace(' - Stock Car PRO 2024', '', regex=False)
-        .str.replace(' - Stock Car Pro Rookie', '', regex=False)
-        .str.replace(' - Stock Car Pro', '', regex=False)
-        .str.strip()
-        .str.title()
-    )
+    cleaned_df = pd.DataFrame({
+        'Piloto': piloto_linha[dados],
+        'Time of Day': tod[dados],
+        'ST': df['ST'][dados],
+        'Lap': df['Lap'][dados],
+    }).reset_index(drop=True)
 
     # Converter 'Time of Day' para datetime
     cleaned_df['Time of Day'] = pd.to_datetime(
@@ -422,22 +591,84 @@ def gerar_grafico_gap_vs_volta(filtered_data, piloto):
     return fig
 
 
-def montar_dataframe_resultado_corrida(driver_info, equipes_pilotos):
-    """Gera o dataframe final do resultado da corrida com base nas voltas de cada piloto."""
-    dados_resultado = []
+def gerar_grafico_vacuo(df_vacuo: pd.DataFrame, cores: dict = None) -> go.Figure:
+    """
+    Gera o gráfico do efeito de vácuo do pelotão: mediana do ST da volta seguinte por faixa de GAP,
+    com a faixa entre os percentis 25 e 75 sombreada.
 
-    for piloto, df_piloto in driver_info.items():
-        if not df_piloto.empty:
-            ultima_volta = df_piloto['Lap'].max()
-            equipe = equipes_pilotos.get(piloto, 'Desconhecida')
-            dados_resultado.append(
-                {'Piloto': piloto, 'Equipe': equipe, 'Voltas': ultima_volta})
+    Args:
+        df_vacuo (pd.DataFrame): Tabela de calcular_estatisticas_vacuo (com ou sem a coluna Montadora).
+        cores (dict, opcional): Cor de cada montadora.
 
-    df_resultado = pd.DataFrame(dados_resultado)
+    Returns:
+        go.Figure: Gráfico Plotly com o ST em função do GAP.
+    """
+    fig = go.Figure()
+    grupos = df_vacuo.groupby('Montadora') if 'Montadora' in df_vacuo.columns else [('Pelotão', df_vacuo)]
 
-    # Ordena do maior para menor número de voltas
-    df_resultado = df_resultado.sort_values(
-        by='Voltas', ascending=False).reset_index(drop=True)
+    for nome, dados in grupos:
+        cor = (cores or {}).get(nome, 'steelblue')
+        fig.add_trace(go.Scatter(
+            x=np.r_[dados['GAP'].to_numpy(), dados['GAP'].to_numpy()[::-1]],
+            y=np.r_[dados['P75'].to_numpy(), dados['P25'].to_numpy()[::-1]],
+            fill='toself',
+            fillcolor=cor,
+            opacity=0.2,
+            line=dict(width=0),
+            hoverinfo='skip',
+            showlegend=False,
+            legendgroup=nome
+        ))
+        fig.add_trace(go.Scatter(
+            x=dados['GAP'],
+            y=dados['Mediana'],
+            mode='lines+markers',
+            name=nome,
+            legendgroup=nome,
+            line=dict(color=cor),
+            customdata=dados[['Voltas', 'Media', 'P90']].to_numpy(),
+            hovertemplate=('GAP %{x:.2f}s<br>Mediana %{y:.1f} km/h<br>Média %{customdata[1]:.1f} · '
+                           'P90 %{customdata[2]:.1f}<br>%{customdata[0]} voltas')
+        ))
+
+    fig.update_layout(
+        title='Efeito de Vácuo: ST da Volta Seguinte por Faixa de GAP',
+        title_x=0.3,
+        xaxis_title='GAP (s)',
+        yaxis_title='ST (km/h)',
+        height=550
+    )
+    return fig
+
+
+def _formatar_diferenca_corrida(segundos, voltas_atras) -> str:
+    """Formata GAP/intervalo da classificação: "+1.234", "+1 volta" ou "-" para o líder."""
+    if voltas_atras > 0:
+        return f"+{int(voltas_atras)} volta" if voltas_atras == 1 else f"+{int(voltas_atras)} voltas"
+    if pd.isna(segundos) or segundos <= 0:
+        return '-'
+    return f"+{formatar_tempo(segundos)}"
+
+
+def montar_dataframe_resultado_corrida(driver_info, equipes_pilotos, reconstrucao: ReconstrucaoCorrida = None):
+    """
+    Gera o dataframe final do resultado da corrida com base nas voltas de cada piloto.
+    A ordem usa o número de voltas e, no empate, o horário de passagem na última volta
+    (ver ReconstrucaoCorrida), com o GAP para o líder e o intervalo para o carro à frente.
+    """
+    if reconstrucao is None:
+        reconstrucao = ReconstrucaoCorrida(montar_matriz_voltas(driver_info))
+
+    classificacao = reconstrucao.classificacao()
+
+    df_resultado = pd.DataFrame({
+        'Piloto': classificacao['Piloto'],
+        'Equipe': [equipes_pilotos.get(piloto, 'Desconhecida') for piloto in classificacao['Piloto']],
+        'Voltas': classificacao['Voltas'],
+        'Gap': [_formatar_diferenca_corrida(g, v) for g, v in zip(classificacao['Gap'], classificacao['Voltas_Atras'])],
+        'Intervalo': [_formatar_diferenca_corrida(i, v) for i, v in
+                      zip(classificacao['Intervalo'], classificacao['Voltas_Atras_Intervalo'])],
+    }).reset_index(drop=True)
 
     # Adiciona coluna de posição
     df_resultado.insert(0, 'Posição', df_resultado.index + 1)
@@ -445,6 +676,65 @@ def montar_dataframe_resultado_corrida(driver_info, equipes_pilotos):
     return df_resultado
 
 
+def montar_dataframe_classificacao_replay(replay: ReplayCorrida, indice: int, equipes_pilotos: dict) -> pd.DataFrame:
+    """
+    Classificação do replay no momento em que o líder completa a volta de índice `indice`,
+    no mesmo formato do resultado da corrida, com os tempos e ST acumulados até ali.
+    """
+    classificacao = replay.classificacao(indice)
+    df_replay = pd.DataFrame({
+        'Posição': np.arange(1, len(classificacao) + 1),
+        'Piloto': classificacao['Piloto'],
+        'Equipe': [equipes_pilotos.get(piloto, 'Desconhecida') for piloto in classificacao['Piloto']],
+        'Voltas': classificacao['Voltas'],
+        'Gap': [_formatar_diferenca_corrida(g, v) for g, v in zip(classificacao['Gap'], classificacao['Voltas_Atras'])],
+        'Intervalo': [_formatar_diferenca_corrida(i, v) for i, v in
+                      zip(classificacao['Intervalo'], classificacao['Voltas_Atras_Intervalo'])],
+        'Última Volta': classificacao['Ultima_Volta'].map(formatar_tempo),
+        'Melhor Volta': classificacao['Melhor_Volta'].map(formatar_tempo),
+        'ST': classificacao['ST'].astype('float64').round(1),
+        'Maior ST': classificacao['Maior_ST'].astype('float64').round(1),
+    })
+    return df_replay
+
+
+def gerar_grafico_posicoes_por_volta(reconstrucao: ReconstrucaoCorrida) -> go.Figure:
+    """
+    Gera o gráfico de posições volta a volta (lap chart) a partir da matriz volta × carro.
+
+    Args:
+        reconstrucao (ReconstrucaoCorrida): Reconstrução da corrida da sessão.
+
+    Returns:
+        go.Figure: Gráfico com a posição de cada piloto ao fim de cada volta.
+    """
+    fig = go.Figure()
+    for k, piloto in enumerate(reconstrucao.pilotos):
+        fig.add_trace(go.Scatter(
+            x=reconstrucao.voltas,
+            y=reconstrucao.posicoes[:, k],
+            mode='lines+markers',
+            name=piloto,
+            marker=dict(size=5),
+            customdata=np.stack([reconstrucao.gap_lider[:, k], reconstrucao.intervalo[:, k]], axis=-1),
+            hovertemplate=(f'{piloto}<br>Volta %{{x}} - P%{{y}}'
+                           '<br>GAP líder: %{customdata[0]:.3f}s<br>Intervalo: %{customdata[1]:.3f}s<extra></extra>')
+        ))
+
+    n_pilotos = len(reconstrucao.pilotos)
+    fig.update_layout(
+        title='Posições por Volta',
+        title_x=0.4,
+        xaxis_title='Volta',
+        yaxis_title='Posição',
+        legend_title_text='Piloto',
+        height=max(500, 22 * n_pilotos)
+    )
+    fig.update_yaxes(autorange='reversed', dtick=1)
+
+    return fig
+
+
 def colorir_piloto(row):
     color_map = {
         '83 - Gabriel Casagrande': 'background-color: purple; color: white;',
@@ -533,39 +823,43 @@ def preparar_dados_boxplot(driver_info: dict, piloto_modelo: dict) -> pd.DataFra
     """
     Prepara um DataFrame longo para boxplot, removendo outliers com ST < max(ST) * 0.85.
     """
-    registros = []
-
-    for piloto, df_piloto in driver_info.items():
-        modelo = piloto_modelo.get(piloto, 'Desconhecido')
-        for st in df_piloto['ST']:
-            registros.append({'Piloto': piloto, 'ST': st, 'Montadora': modelo})
-
-    df = pd.DataFrame(registros)
+    df = pd.concat([
+        pd.DataFrame({'Piloto': piloto, 'ST': df_piloto['ST'].to_numpy(dtype=np.float64),
+                      'Montadora': piloto_modelo.get(piloto, 'Desconhecido')})
+        for piloto, df_piloto in driver_info.items()
+    ], ignore_index=True)
 
     # Remove valores ST considerados muito baixos (outliers)
-    max_st = df['ST'].max()
-    limite_minimo = max_st * 0.85
-    df_filtrado = df[df['ST'] >= limite_minimo]
+    df_filtrado = df[mascara_outliers(df, 'ST', 'percentual_maximo', 0.85)]
 
     return df_filtrado
 
 
-def gerar_boxplot_st(df_filtrado: pd.DataFrame) -> px.box:
+def gerar_boxplot_st(df_filtrado: pd.DataFrame, resumido: bool = None) -> px.box:
     """
     Gera boxplot de ST por piloto, colorido pela montadora com cores fixas.
+    Com muitas amostras (ou resumido=True) as caixas vêm das estatísticas calculadas no servidor
+    e só os outliers mais extremos são exibidos, em vez de todos os pontos.
     """
-    fig = px.box(
-        df_filtrado,
-        x='Piloto',
-        y='ST',
-        color='Montadora',
-        title='Distribuição de Velocidade por Piloto',
-        labels={'ST': 'Velocidade (ST)', 'Piloto': 'Piloto'},
-        points='all',
-        color_discrete_map=modelo_cor  # Aplica as cores fixas
-    )
+    if resumido is None:
+        resumido = len(df_filtrado) > LIMITE_AMOSTRAS_BOXPLOT
+    if resumido:
+        fig = gerar_boxplot_resumido(df_filtrado, 'Piloto', 'ST', cor='Montadora', mapa_cores=modelo_cor,
+                                     rotulo_y='Velocidade (ST)')
+    else:
+        fig = px.box(
+            df_filtrado,
+            x='Piloto',
+            y='ST',
+            color='Montadora',
+            title='Distribuição de Velocidade por Piloto',
+            labels={'ST': 'Velocidade (ST)', 'Piloto': 'Piloto'},
+            points='all',
+            color_discrete_map=modelo_cor  # Aplica as cores fixas
+        )
 
     fig.update_layout(
+        title_text='Distribuição de Velocidade por Piloto',
         title_x=0.38,
         annotations=[  # Adicionando a anotação
             dict(
@@ -945,42 +1239,49 @@ def gerar_relatorio_completo_speed_report(
         return output_path
 
 
-def gerar_boxplot_laptimes(df: pd.DataFrame, modelo_cor: dict, multiplicador_outlier: float):
+def gerar_boxplot_laptimes(df: pd.DataFrame, modelo_cor: dict, multiplicador_outlier: float,
+                           regra_outlier: str = 'percentual_melhor', agrupador_outlier: str = 'Montadora',
+                           resumido: bool = None):
     """Gera o boxplot dos laptimes dos pilotos, com filtragem interativa de outliers.
 
     Argumentos:
         df (pd.DataFrame): DataFrame com os tempos de volta dos pilotos.
         modelo_cor (dict): Dicionário com as cores associadas a cada montadora.
-        multiplicador_outlier (float): Fator de multiplicação para definir o limite do outlier.
+        multiplicador_outlier (float): Parâmetro da regra de outlier (multiplicador do melhor tempo ou fator k).
+        regra_outlier (str): Regra de outlier (ver functions.estatisticas.EstatisticasGrupo).
+        agrupador_outlier (str): Coluna usada para agrupar as estatísticas do filtro (Montadora ou Piloto).
+        resumido (bool): Monta as caixas com estatísticas calculadas no servidor (None = automático
+            acima de LIMITE_AMOSTRAS_BOXPLOT amostras).
 
     Retorno:
         go.Figure: Gráfico box plot gerado com Plotly.
     """
     # Converte os tempos de volta para segundos, caso não tenha sido feito
     if 'Lap_seconds' not in df.columns:
-        df['Lap_seconds'] = df['Lap Tm'].apply(convert_time_to_seconds)
+        df['Lap_seconds'] = tempos_para_segundos(df['Lap Tm'])
 
     # Verifica se há valores NaN e os descarta
     df = df.dropna(subset=['Lap_seconds'])
 
-    # Calcula o melhor tempo por montadora
-    melhores = df.groupby('Montadora')['Lap_seconds'].min()
-    limites = melhores * multiplicador_outlier
-
-    # Filtra os dados, removendo os outliers
-    filtrado = df[df.apply(lambda x: x['Lap_seconds'] <=
-                           limites.get(x['Montadora'], float('inf')), axis=1)]
-
-    # Cria o boxplot
-    fig = px.box(
-        filtrado,
-        x='Piloto',
-        y='Lap_seconds',  # Usando a coluna 'Lap_seconds' no eixo Y
-        title="Box Plot - Laptimes por Piloto",
-        color='Montadora',
-        color_discrete_map=modelo_cor,
-        labels={'Lap_seconds': 'Tempo de Volta (s)', 'Piloto': 'Piloto'}
-    )
+    # Filtra os dados, removendo os outliers (estatísticas por grupo reaproveitadas entre reexecuções)
+    filtrado = df[mascara_outliers(df, 'Lap_seconds', regra_outlier, multiplicador_outlier, agrupador_outlier)]
+
+    # Cria o boxplot (sessões longas: estatísticas das caixas calculadas no servidor)
+    if resumido is None:
+        resumido = len(filtrado) > LIMITE_AMOSTRAS_BOXPLOT
+    if resumido:
+        fig = gerar_boxplot_resumido(filtrado, 'Piloto', 'Lap_seconds', cor='Montadora', mapa_cores=modelo_cor,
+                                     rotulo_y='Tempo de Volta (s)')
+    else:
+        fig = px.box(
+            filtrado,
+            x='Piloto',
+            y='Lap_seconds',  # Usando a coluna 'Lap_seconds' no eixo Y
+            title="Box Plot - Laptimes por Piloto",
+            color='Montadora',
+            color_discrete_map=modelo_cor,
+            labels={'Lap_seconds': 'Tempo de Volta (s)', 'Piloto': 'Piloto'}
+        )
 
     fig.update_layout(
         title=dict(text="Box Plot - Laptimes por Piloto",
@@ -994,40 +1295,46 @@ def gerar_boxplot_laptimes(df: pd.DataFrame, modelo_cor: dict, multiplicador_out
     return fig
 
 
-def gerar_boxplot_laptimes_sem_cor(df: pd.DataFrame, multiplicador_outlier: float):
+def gerar_boxplot_laptimes_sem_cor(df: pd.DataFrame, multiplicador_outlier: float,
+                                   regra_outlier: str = 'percentual_melhor', agrupador_outlier: str = 'Montadora',
+                                   resumido: bool = None):
     """Gera o boxplot dos laptimes dos pilotos, com filtragem interativa de outliers, sem coloração por montadora.
 
     Argumentos:
         df (pd.DataFrame): DataFrame com os tempos de volta dos pilotos.
-        multiplicador_outlier (float): Fator de multiplicação para definir o limite do outlier.
+        multiplicador_outlier (float): Parâmetro da regra de outlier (multiplicador do melhor tempo ou fator k).
+        regra_outlier (str): Regra de outlier (ver functions.estatisticas.EstatisticasGrupo).
+        agrupador_outlier (str): Coluna usada para agrupar as estatísticas do filtro (Montadora ou Piloto).
+        resumido (bool): Monta as caixas com estatísticas calculadas no servidor (None = automático
+            acima de LIMITE_AMOSTRAS_BOXPLOT amostras).
 
     Retorno:
         go.Figure: Gráfico box plot gerado com Plotly.
     """
     # Converte os tempos de volta para segundos, caso não tenha sido feito
     if 'Lap_seconds' not in df.columns:
-        df['Lap_seconds'] = df['Lap Tm'].apply(convert_time_to_seconds)
+        df['Lap_seconds'] = tempos_para_segundos(df['Lap Tm'])
 
     # Verifica se há valores NaN e os descarta
     df = df.dropna(subset=['Lap_seconds'])
 
-    # Calcula o melhor tempo por montadora
-    melhores = df.groupby('Montadora')['Lap_seconds'].min()
-    limites = melhores * multiplicador_outlier
-
-    # Filtra os dados, removendo os outliers
-    filtrado = df[df.apply(lambda x: x['Lap_seconds'] <=
-                           limites.get(x['Montadora'], float('inf')), axis=1)]
-
-    # Cria o boxplot sem coloração por montadora
-    fig = px.box(
-        filtrado,
-        x='Piloto',
-        y='Lap_seconds',  # Usando a coluna 'Lap_seconds' no eixo Y
-        title="Box Plot - Laptimes por Piloto (Sem Cor por Montadora)",
-        labels={'Lap_seconds': 'Tempo de Volta (s)', 'Piloto': 'Piloto'},
-        color='Piloto'
-    )
+    # Filtra os dados, removendo os outliers (estatísticas por grupo reaproveitadas entre reexecuções)
+    filtrado = df[mascara_outliers(df, 'Lap_seconds', regra_outlier, multiplicador_outlier, agrupador_outlier)]
+
+    # Cria o boxplot sem coloração por montadora (sessões longas: estatísticas calculadas no servidor)
+    if resumido is None:
+        resumido = len(filtrado) > LIMITE_AMOSTRAS_BOXPLOT
+    if resumido:
+        fig = gerar_boxplot_resumido(filtrado, 'Piloto', 'Lap_seconds', rotulo_y='Tempo de Volta (s)')
+    else:
+        fig = px.box(
+            filtrado,
+            x='Piloto',
+            y='Lap_seconds',  # Usando a coluna 'Lap_seconds' no eixo Y
+            title="Box Plot - Laptimes por Piloto (Sem Cor por Montadora)",
+            labels={'Lap_seconds': 'Tempo de Volta (s)', 'Piloto': 'Piloto'},
+            color='Piloto'
+        )
 
     fig.update_layout(
         title=dict(text="Box Plot - Laptimes por Piloto (Sem Cor)",
@@ -1041,29 +1348,57 @@ def gerar_boxplot_laptimes_sem_cor(df: pd.DataFrame, multiplicador_outlier: floa
     return fig
 
 
-def gerar_grafico_laptimes_por_volta(driver_info: dict) -> go.Figure:
+def gerar_grafico_laptimes_por_volta(driver_info: dict, faixa_voltas: Tuple[int, int] = None,
+                                     max_pontos_por_piloto: int = None, webgl: bool = None) -> go.Figure:
     """
     Gera um gráfico de linha com o tempo de volta (em segundos) por volta para cada piloto.
 
     Args:
         driver_info (dict): Dicionário com dados dos pilotos extraído pela função `separar_pilotos_por_volta`.
+        faixa_voltas (tuple): (primeira, última) volta exibida; None exibe a corrida inteira.
+        max_pontos_por_piloto (int): Se informado, reduz cada piloto a ~esse número de pontos mantendo
+            o mínimo e o máximo de cada trecho (visão geral); None exibe todos os pontos (detalhe).
+        webgl (bool): Usa Scattergl; None decide automaticamente pela quantidade de pontos.
 
     Returns:
         go.Figure: Gráfico de linha (Plotly) com voltas no eixo X e tempo de volta no eixo Y.
     """
     fig = go.Figure()
 
+    series = []
     for piloto, df_piloto in driver_info.items():
         df_temp = df_piloto.copy()
-        df_temp['Lap_Tm_Segundos'] = df_temp['Lap Tm'].apply(
-            convert_time_to_seconds)
+        df_temp['Lap_Tm_Segundos'] = tempos_para_segundos(df_temp['Lap Tm'])
         df_temp = df_temp.dropna(subset=['Lap_Tm_Segundos'])
 
-        fig.add_trace(go.Scatter(
+        if faixa_voltas is not None:
+            df_temp = df_temp[df_temp['Lap'].between(*faixa_voltas)]
+        if max_pontos_por_piloto is not None:
+            df_temp = df_temp.iloc[indices_min_max(df_temp['Lap_Tm_Segundos'].to_numpy(), max_pontos_por_piloto)]
+        series.append((piloto, df_temp))
+
+    # Muitos pontos: WebGL em vez de SVG
+    if webgl is None:
+        webgl = usar_webgl(sum(len(df_temp) for _, df_temp in series))
+    tipo_trace = go.Scattergl if webgl else go.Scatter
+
+    for piloto, df_temp in series:
+        # Stint no hover e voltas de box destacadas (quando detectados, ver functions/stints.py)
+        extras = {}
+        if 'Stint' in df_temp.columns:
+            box = (df_temp['Volta_Entrada'] | df_temp['Volta_Saida']).to_numpy()
+            extras = dict(
+                customdata=df_temp['Stint'].to_numpy(),
+                hovertemplate='%{y:.3f}s (stint %{customdata})',
+                marker=dict(symbol=np.where(box, 'x', 'circle'), size=np.where(box, 9, 6))
+            )
+
+        fig.add_trace(tipo_trace(
             x=df_temp['Lap'],
             y=df_temp['Lap_Tm_Segundos'],
             mode='lines+markers',
-            name=piloto
+            name=piloto,
+            **extras
         ))
 
     fig.update_layout(
@@ -1088,56 +1423,61 @@ def gerar_grafico_laptimes_por_volta(driver_info: dict) -> go.Figure:
     return fig
 
 
-def gerar_grafico_gap_para_piloto_referencia(df_completo: pd.DataFrame, piloto_modelo: dict = None):
+def gerar_grafico_gap_para_piloto_referencia(df_completo: pd.DataFrame, piloto_modelo: dict = None,
+                                             matriz_voltas: MatrizVoltas = None):
     """
     Gera gráfico de linha com o GAP por volta de cada piloto em relação a um piloto de referência.
+    O GAP é calculado sobre a matriz volta × piloto (MatrizVoltas), então trocar o piloto de
+    referência custa apenas uma subtração com broadcast.
 
     Args:
         df_completo (pd.DataFrame): DataFrame com todas as voltas e tempos de cada piloto.
         piloto_modelo (dict, opcional): Dicionário com mapeamento de pilotos e suas montadoras (para uso futuro).
+        matriz_voltas (MatrizVoltas, opcional): Matriz já construída (ex.: em cache por sessão);
+            se omitida, é montada a partir de df_completo.
 
     Returns:
         fig (go.Figure): Gráfico Plotly com o GAP entre os pilotos e o piloto de referência.
         pilotos (list): Lista de pilotos para seleção externa (usado no Streamlit).
     """
+    if matriz_voltas is None:
+        matriz_voltas = MatrizVoltas(df_completo)
+
     # Lista de pilotos disponíveis
-    pilotos = df_completo['Piloto'].unique().tolist()
+    pilotos = list(matriz_voltas.pilotos)
 
     # Função interna para gerar o gráfico do GAP para o piloto de referência selecionado
-    def gerar_figura_para_piloto_referencia(reference_pilot: str):
+    def gerar_figura_para_piloto_referencia(reference_pilot: str, acumulado: bool = False):
         if not reference_pilot or reference_pilot not in pilotos:
             return None
 
-        # Filtra os dados do piloto de referência
-        reference_times = df_completo[df_completo['Piloto'] == reference_pilot]
-        if reference_times.empty:
+        # Piloto de referência sem nenhuma volta registrada
+        j = matriz_voltas.indice_piloto(reference_pilot)
+        if np.isnan(matriz_voltas.tempos[:, j]).all():
             return None
 
-        # Mapeia os tempos do piloto de referência por volta
-        reference_time_dict = reference_times.set_index(
-            'Lap')['Lap_seconds'].to_dict()
-
-        # Calcula o GAP para todos os pilotos em relação ao piloto de referência
-        df_copy = df_completo.copy()
-        df_copy['Reference Time'] = df_copy['Lap'].map(reference_time_dict)
-        df_copy['GAP to Reference'] = df_copy['Lap_seconds'] - \
-            df_copy['Reference Time']
-
-        # Cria o gráfico de linha para o GAP
-        fig = px.line(
-            df_copy,
-            x='Lap',
-            y='GAP to Reference',
-            color='Piloto',
-            title=f'GAP por Volta em Relação a {reference_pilot}',
-            labels={'Lap': 'Volta', 'GAP to Reference': 'GAP (s)'},
-            markers=True
-        )
+        # GAP de todos os pilotos para a referência (matriz volta × piloto)
+        gaps = matriz_voltas.gap_para_referencia(reference_pilot, acumulado=acumulado)
+
+        titulo = 'GAP Acumulado' if acumulado else 'GAP por Volta'
+        fig = go.Figure()
+        for k, piloto in enumerate(pilotos):
+            fig.add_trace(go.Scatter(
+                x=matriz_voltas.voltas,
+                y=gaps[:, k],
+                mode='lines+markers',
+                name=piloto,
+                marker=dict(size=6, opacity=0.7)
+            ))
 
         # Personaliza o layout do gráfico
-        fig.update_layout(title_x=0.38)
-        fig.update_traces(mode='lines+markers',
-                          marker=dict(size=6, opacity=0.7))
+        fig.update_layout(
+            title=f'{titulo} em Relação a {reference_pilot}',
+            title_x=0.38,
+            xaxis_title='Volta',
+            yaxis_title='GAP (s)',
+            legend_title_text='Piloto'
+        )
 
         return fig
 
@@ -1145,6 +1485,57 @@ def gerar_grafico_gap_para_piloto_referencia(df_completo: pd.DataFrame, piloto_m
     return gerar_figura_para_piloto_referencia, pilotos
 
 
+def gerar_grafico_degradacao(voltas_ajuste: pd.DataFrame, pilotos: list, cores: dict = None) -> go.Figure:
+    """
+    Gera o gráfico de degradação: tempos de volta usados no ajuste (pontos) e a curva ajustada
+    de cada stint (linhas), para os pilotos selecionados.
+
+    Args:
+        voltas_ajuste (pd.DataFrame): Voltas retornadas por ajustar_degradacao (Tempo_Corrigido, Ajuste).
+        pilotos (list): Pilotos a exibir.
+        cores (dict, opcional): Cor de cada piloto.
+
+    Returns:
+        go.Figure: Gráfico Plotly com os tempos e as curvas de degradação.
+    """
+    fig = go.Figure()
+    paleta = px.colors.qualitative.Plotly
+
+    for i, piloto in enumerate(pilotos):
+        dados_piloto = voltas_ajuste[voltas_ajuste['Piloto'] == piloto]
+        cor = (cores or {}).get(piloto, paleta[i % len(paleta)])
+
+        fig.add_trace(go.Scatter(
+            x=dados_piloto['Lap'],
+            y=dados_piloto['Tempo_Corrigido'],
+            mode='markers',
+            name=piloto,
+            legendgroup=piloto,
+            marker=dict(size=6, opacity=0.6, color=cor)
+        ))
+
+        for stint, dados_stint in dados_piloto.groupby('Stint'):
+            fig.add_trace(go.Scatter(
+                x=dados_stint['Lap'],
+                y=dados_stint['Ajuste'],
+                mode='lines',
+                name=f'{piloto} (stint {stint})',
+                legendgroup=piloto,
+                showlegend=False,
+                line=dict(width=3, color=cor)
+            ))
+
+    fig.update_layout(
+        title='Degradação por Stint',
+        title_x=0.4,
+        xaxis_title='Volta',
+        yaxis_title='Tempo de Volta (s)',
+        height=600
+    )
+
+    return fig
+
+
 def gerar_ranking_por_volta(df: pd.DataFrame) -> pd.DataFrame:
     """
     Gera o ranking por volta com base na coluna 'Lap_seconds'.
@@ -1279,3 +1670,68 @@ def plotar_raising_average_st(
     )
 
     return fig
+
+
+def gerar_heatmap_distribuicao_posicoes(distribuicao: pd.DataFrame) -> go.Figure:
+    """
+    Gera o mapa de calor da distribuição de posições de chegada simulada.
+
+    Args:
+        distribuicao (pd.DataFrame): Piloto × posição com as probabilidades (ver distribuicao_posicoes).
+
+    Returns:
+        go.Figure: Mapa de calor com a probabilidade (%) de cada posição para cada piloto.
+    """
+    fig = px.imshow(
+        distribuicao * 100,
+        x=[f"P{p}" for p in distribuicao.columns],
+        y=list(distribuicao.index),
+        color_continuous_scale='Blues',
+        aspect='auto',
+        labels=dict(x='Posição de chegada', y='Piloto', color='Probabilidade (%)'),
+    )
+    fig.update_traces(hovertemplate='%{y}<br>%{x}: %{z:.1f}%<extra></extra>')
+    fig.update_layout(
+        title='Distribuição de Posições de Chegada',
+        title_x=0.4,
+        height=max(300, 40 * len(distribuicao) + 120)
+    )
+    return fig
+
+
+def gerar_grafico_comparacao_voltas_box(comparacao: pd.DataFrame, piloto: str) -> go.Figure:
+    """
+    Gera o gráfico da posição média de chegada simulada para cada volta de parada candidata.
+
+    Args:
+        comparacao (pd.DataFrame): Resultado de SimuladorEstrategia.comparar_voltas_box.
+        piloto (str): Piloto avaliado.
+
+    Returns:
+        go.Figure: Posição média (eixo invertido) e probabilidade de pódio por volta de parada.
+    """
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=comparacao['Volta_Box'],
+        y=comparacao['Posicao_Media'],
+        mode='lines+markers',
+        name='Posição média',
+        hovertemplate='Parada na volta %{x}<br>Posição média: %{y:.2f}<extra></extra>'
+    ))
+    fig.add_trace(go.Bar(
+        x=comparacao['Volta_Box'],
+        y=comparacao['Prob_Top3'] * 100,
+        name='Pódio (%)',
+        yaxis='y2',
+        opacity=0.3,
+        hovertemplate='Parada na volta %{x}<br>Pódio: %{y:.1f}%<extra></extra>'
+    ))
+    fig.update_layout(
+        title=f'Volta de Parada - {piloto}',
+        title_x=0.4,
+        xaxis_title='Volta de entrada no box',
+        yaxis=dict(title='Posição média de chegada', autorange='reversed'),
+        yaxis2=dict(title='Probabilidade de pódio (%)', overlaying='y', side='right', rangemode='tozero'),
+        legend=dict(orientation='h', y=-0.2)
+    )
+    return fig
@@ -0,0 +1,252 @@
+"""
+Módulo de validação dos arquivos CSV de cronometragem.
+Todas as verificações (colunas, nulos, tempos e velocidades interpretáveis, linhas de cabeçalho
+dos pilotos e voltas duplicadas) são feitas em uma única passada vetorizada por bloco de linhas,
+comparando o texto lido com o resultado da compactação. O relatório guarda os índices das linhas
+com problema para a interface exibir, e a máscara de cabeçalhos é reaproveitada na separação
+por piloto.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from functions.cabecalhos import ParserCabecalhoPiloto, detectar_parser_cabecalho
+from functions.esquema import COLUNAS_TEMPO, compactar_dataframe_bruto
+
+
+COLUNAS_NECESSARIAS = ['Time of Day', 'Lap', 'Lap Tm', 'S1 Tm', 'S2 Tm', 'S3 Tm', 'ST']
+
+# Fração de voltas sem valor em uma coluna a partir da qual o relatório emite um aviso
+LIMITE_NULOS = 0.05
+
+# Quantidade de linhas de exemplo exibidas por problema
+EXEMPLOS_POR_PROBLEMA = 10
+
+GRAVIDADE_ERRO = 'erro'
+GRAVIDADE_AVISO = 'aviso'
+
+
+class RelatorioValidacao:
+    """
+    Relatório de qualidade de um CSV.
+
+    Atributos:
+        linhas: Linhas de dados lidas (sem o cabeçalho do arquivo)
+        linhas_piloto: Linhas de cabeçalho de piloto
+        voltas: Linhas de volta (dados após um cabeçalho de piloto)
+        nulos: {coluna: voltas sem valor}
+        problemas: Lista de {'verificacao', 'gravidade', 'mensagem'}
+        indices: {verificacao: posições (0 = primeira linha de dados) das linhas com o problema}
+    """
+
+    def __init__(self):
+        self.linhas = 0
+        self.linhas_piloto = 0
+        self.voltas = 0
+        self.nulos: Dict[str, int] = {}
+        self.problemas: List[Dict[str, str]] = []
+        self.indices: Dict[str, np.ndarray] = {}
+
+    def adicionar_problema(self, verificacao: str, gravidade: str, mensagem: str, indices: np.ndarray = None):
+        self.problemas.append({'verificacao': verificacao, 'gravidade': gravidade, 'mensagem': mensagem})
+        if indices is not None:
+            self.indices[verificacao] = np.asarray(indices, dtype=np.int64)
+
+    @property
+    def valido(self) -> bool:
+        return not any(p['gravidade'] == GRAVIDADE_ERRO for p in self.problemas)
+
+    def mensagem_erro(self) -> str:
+        """Mensagens dos erros (que impedem o uso do arquivo), em uma única linha."""
+        return ' | '.join(p['mensagem'] for p in self.problemas if p['gravidade'] == GRAVIDADE_ERRO)
+
+    def para_dataframe(self) -> pd.DataFrame:
+        """Tabela do relatório para exibição, com as linhas do arquivo (contando o cabeçalho) de exemplo."""
+        registros = []
+        for problema in self.problemas:
+            indices = self.indices.get(problema['verificacao'], np.array([], dtype=np.int64))
+            # Linha no arquivo: cabeçalho na linha 1, primeira linha de dados na linha 2
+            exemplos = ', '.join(str(i + 2) for i in indices[:EXEMPLOS_POR_PROBLEMA])
+            if len(indices) > EXEMPLOS_POR_PROBLEMA:
+                exemplos += ', ...'
+            registros.append({
+                'Verificação': problema['verificacao'],
+                'Gravidade': problema['gravidade'],
+                'Linhas afetadas': len(indices),
+                'Linhas do arquivo': exemplos,
+                'Mensagem': problema['mensagem'],
+            })
+        return pd.DataFrame(registros, columns=['Verificação', 'Gravidade', 'Linhas afetadas',
+                                                'Linhas do arquivo', 'Mensagem'])
+
+
+class ErroValidacaoCSV(ValueError):
+    """Arquivo CSV inválido; `relatorio` traz todos os problemas encontrados."""
+
+    def __init__(self, relatorio: RelatorioValidacao):
+        super().__init__(f"Erro na validação do CSV: {relatorio.mensagem_erro()}")
+        self.relatorio = relatorio
+
+
+class ValidadorCSV:
+    """
+    Valida um CSV de forma incremental, um bloco de linhas por vez (ver ingestao.ler_csv_em_blocos).
+
+    O construtor confere o cabeçalho e monta `mapa` ({nome no arquivo: nome canônico});
+    adicionar() acumula as verificações de cada bloco e relatorio() fecha o relatório.
+    Sem `parser`, o campeonato (formato dos cabeçalhos de piloto) é detectado no primeiro bloco.
+    """
+
+    def __init__(self, colunas, parser: ParserCabecalhoPiloto = None):
+        self.mapa = {}
+        self.parser = parser
+        self._relatorio = RelatorioValidacao()
+        self._resolver_colunas(list(colunas))
+
+        self._nulos = {col: 0 for col in COLUNAS_NECESSARIAS[1:]}
+        self._preenchidas = {'Lap': 0, 'Lap Tm': 0}
+        self._invalidos: Dict[str, List[np.ndarray]] = {}
+        self._sem_piloto: List[np.ndarray] = []
+        self._bloco_atual = -1
+        self._chaves_volta: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+
+    def _resolver_colunas(self, colunas: list):
+        """Colunas obrigatórias (espaços nas bordas são ignorados) e coluna de velocidade ('SPT' ou 'ST')."""
+        limpas = [str(col).strip() for col in colunas]
+        self.mapa = {col: limpa for col, limpa in zip(colunas, limpas) if limpa in COLUNAS_NECESSARIAS[:-1]}
+
+        faltando = [col for col in COLUNAS_NECESSARIAS[:-1] if col not in self.mapa.values()]
+        if faltando:
+            self._relatorio.adicionar_problema(
+                'Colunas', GRAVIDADE_ERRO,
+                f"Colunas obrigatórias não encontradas: {', '.join(faltando)}. "
+                f"Colunas encontradas: {', '.join(limpas[:10])}" + ("..." if len(limpas) > 10 else ""))
+
+        # 'SPT' tem prioridade sobre 'ST', como em utils.normalizar_coluna_velocidade
+        maiusculas = [col.upper() for col in limpas]
+        for nome in ('SPT', 'ST'):
+            if nome in maiusculas:
+                self.mapa[colunas[maiusculas.index(nome)]] = 'ST'
+                break
+        else:
+            self._relatorio.adicionar_problema(
+                'Colunas', GRAVIDADE_ERRO, "Coluna de velocidade final ('ST' ou 'SPT') não encontrada no CSV.")
+
+        if not self._relatorio.valido:
+            raise ErroValidacaoCSV(self._relatorio)
+
+    def adicionar(self, bruto: pd.DataFrame, compacto: pd.DataFrame) -> np.ndarray:
+        """
+        Acumula as verificações de um bloco.
+
+        :param bruto: Bloco com as colunas canônicas como texto (antes da compactação)
+        :param compacto: O mesmo bloco após compactar_dataframe_bruto
+        :return: Máscara das linhas de cabeçalho de piloto do bloco (reaproveitada na separação por piloto)
+        """
+        inicio = self._relatorio.linhas
+        n = len(bruto)
+        posicoes = np.arange(inicio, inicio + n)
+        self._relatorio.linhas += n
+
+        if self.parser is None:
+            self.parser = detectar_parser_cabecalho(bruto['Time of Day'])
+        cabecalho = self.parser.mascara_cabecalho(bruto['Time of Day'])
+        self._relatorio.linhas_piloto += int(cabecalho.sum())
+
+        # Bloco de piloto de cada linha; linhas antes do primeiro cabeçalho ficam sem piloto (-1)
+        bloco = np.cumsum(cabecalho) + self._bloco_atual
+        self._bloco_atual = int(bloco[-1]) if n else self._bloco_atual
+        preenchida = bruto.notna().to_numpy()
+        volta = ~cabecalho & preenchida.any(axis=1)
+        self._sem_piloto.append(posicoes[volta & (bloco < 0)])
+        volta &= bloco >= 0
+        self._relatorio.voltas += int(volta.sum())
+
+        for coluna in self._preenchidas:
+            self._preenchidas[coluna] += int(compacto[coluna].notna().sum())
+
+        for j, coluna in enumerate(bruto.columns):
+            if coluna in self._nulos:
+                self._nulos[coluna] += int((volta & ~preenchida[:, j]).sum())
+            if coluna in COLUNAS_TEMPO or coluna in ('Lap', 'ST'):
+                # Texto presente que a compactação não conseguiu interpretar
+                invalido = volta & preenchida[:, j] & compacto[coluna].isna().to_numpy()
+                if invalido.any():
+                    self._invalidos.setdefault(coluna, []).append(posicoes[invalido])
+
+        lap = compacto['Lap'].to_numpy(dtype=np.float64, na_value=np.nan)
+        com_volta = volta & ~np.isnan(lap)
+        self._chaves_volta.append((bloco[com_volta], lap[com_volta].astype(np.int64), posicoes[com_volta]))
+        return cabecalho
+
+    def relatorio(self) -> RelatorioValidacao:
+        """Fecha o relatório com as verificações acumuladas."""
+        relatorio = self._relatorio
+        relatorio.nulos = dict(self._nulos)
+
+        if relatorio.linhas == 0:
+            relatorio.adicionar_problema('Dados', GRAVIDADE_ERRO, "O arquivo CSV não contém dados, apenas cabeçalhos.")
+            return relatorio
+        for coluna, preenchidas in self._preenchidas.items():
+            if preenchidas == 0:
+                relatorio.adicionar_problema('Dados', GRAVIDADE_ERRO, f"A coluna '{coluna}' está completamente vazia.")
+        if relatorio.linhas_piloto == 0:
+            campeonato = self.parser.campeonato if self.parser is not None else ''
+            relatorio.adicionar_problema(
+                'Pilotos', GRAVIDADE_ERRO,
+                f"Nenhuma linha de cabeçalho de piloto encontrada em 'Time of Day' (formato: {campeonato}).")
+
+        sem_piloto = np.concatenate(self._sem_piloto) if self._sem_piloto else np.array([], dtype=np.int64)
+        if len(sem_piloto):
+            relatorio.adicionar_problema(
+                'Voltas sem piloto', GRAVIDADE_AVISO,
+                f"{len(sem_piloto)} linha(s) antes do primeiro cabeçalho de piloto serão ignoradas.", sem_piloto)
+
+        for coluna, nulos in self._nulos.items():
+            if relatorio.voltas and nulos / relatorio.voltas > LIMITE_NULOS:
+                relatorio.adicionar_problema(
+                    f"Nulos em {coluna}", GRAVIDADE_AVISO,
+                    f"{nulos / relatorio.voltas:.0%} das voltas sem valor em '{coluna}'.")
+
+        for coluna, partes in self._invalidos.items():
+            indices = np.concatenate(partes)
+            tipo = 'velocidade numérica' if coluna == 'ST' else 'número de volta' if coluna == 'Lap' else 'tempo'
+            relatorio.adicionar_problema(
+                f"Formato de {coluna}", GRAVIDADE_AVISO,
+                f"{len(indices)} valor(es) de '{coluna}' não reconhecidos como {tipo}; ficam vazios.", indices)
+
+        if self._chaves_volta:
+            blocos, laps, posicoes = (np.concatenate(partes) for partes in zip(*self._chaves_volta))
+            duplicada = pd.DataFrame({'bloco': blocos, 'lap': laps}).duplicated().to_numpy()
+            if duplicada.any():
+                relatorio.adicionar_problema(
+                    'Voltas duplicadas', GRAVIDADE_AVISO,
+                    f"{int(duplicada.sum())} volta(s) repetida(s) para o mesmo piloto.", posicoes[duplicada])
+
+        return relatorio
+
+
+def preparar_bloco_bruto(bloco: pd.DataFrame, mapa: Dict[str, str]) -> pd.DataFrame:
+    """Renomeia as colunas do bloco para os nomes canônicos e troca a vírgula decimal da velocidade."""
+    bloco = bloco.rename(columns=mapa)[COLUNAS_NECESSARIAS].astype('object')
+    bloco['ST'] = bloco['ST'].where(bloco['ST'].isna(), bloco['ST'].astype(str).str.replace(',', '.', regex=False))
+    return bloco
+
+
+def validar_dataframe_csv(df: pd.DataFrame, parser: ParserCabecalhoPiloto = None) -> RelatorioValidacao:
+    """
+    Valida um DataFrame já lido do CSV em uma única passada (ver ValidadorCSV).
+
+    :param df: DataFrame lido do CSV
+    :param parser: Parser de cabeçalho do campeonato (None = detectado no arquivo)
+    :return: RelatorioValidacao (relatorio.valido indica se o arquivo pode ser usado)
+    """
+    try:
+        validador = ValidadorCSV(df.columns, parser)
+    except ErroValidacaoCSV as e:
+        return e.relatorio
+
+    bruto = preparar_bloco_bruto(df, validador.mapa)
+    validador.adicionar(bruto, compactar_dataframe_bruto(bruto))
+    return validador.relatorio()
@@ -0,0 +1,1208 @@
+"""
+Módulo com as visualizações (abas) de análise de Treino e Corrida.
+Apenas a visualização selecionada é processada a cada execução do script, e os widgets
+locais de cada aba ficam dentro de st.fragment para reexecutar somente a própria seção.
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+
+from functions.constants import pilotos_cor, equipes_pilotos, equipes_cor, modelo_cor, piloto_modelo, pilotos_cor_amattheis
+from functions.corrida import obter_matriz_voltas, obter_reconstrucao_corrida, obter_replay_corrida
+from functions.esquema import formatar_voltas_para_exibicao, formatar_tempo
+from functions.estatisticas import REGRAS_OUTLIER
+from functions.amostragem import PONTOS_VISAO_GERAL
+from functions.ao_vivo import obter_sessao_ao_vivo
+from functions.transmissao import obter_consumidor_feed
+from functions.ritmo import obter_ajuste_degradacao
+from functions.estrategia import (obter_simulacao_estrategia, obter_modelo_ritmo, SimuladorEstrategia,
+                                  distribuicao_posicoes, resumo_posicoes, PERDA_BOX_PADRAO,
+                                  PROB_SAFETY_CAR_PADRAO, DURACAO_SAFETY_CAR_PADRAO)
+from functions.setores import (obter_melhores_setores, obter_tensor_setores, REFERENCIAS_SETORES,
+                               REFERENCIA_PILOTO_VOLTA, REFERENCIA_PILOTO_MELHOR)
+from functions.stints import remover_voltas_de_box
+from functions.gap import (obter_dados_gap, obter_indice_gap, obter_estatisticas_vacuo, filtrar_por_condicao,
+                           DEFINICOES_GAP, CONDICOES_PISTA)
+from functions.exportacao import gerar_excel_matriz_st, gerar_excel_sessao_completa, MIME_XLSX
+from functions.utils import (maior_velocidade_por_piloto, processar_resultado_csv,
+                             montar_dataframe_completo, gerar_boxplot_setor, gerar_grafico_gap_vs_st,
+                             gerar_grafico_gap_vs_volta, montar_dataframe_resultado_corrida, colorir_piloto,
+                             criar_matriz_velocidades, formatar_st_com_cores_interativo, preparar_dados_boxplot,
+                             gerar_boxplot_st, calcular_st_maior_e_media, plotar_maior_st, plotar_media_top_5_st,
+                             gerar_relatorio_completo_speed_report, gerar_ranking_st, gerar_boxplot_laptimes_sem_cor,
+                             gerar_boxplot_laptimes, gerar_grafico_laptimes_por_volta, montar_dataframe_classificacao_replay,
+                             gerar_grafico_gap_para_piloto_referencia, gerar_ranking_por_volta, gerar_grafico_posicoes_por_volta,
+                             gerar_grafico_degradacao, gerar_heatmap_deltas_setores, gerar_grafico_vacuo,
+                             criar_matriz_velocidades_numeral, plotar_raising_average_st,
+                             calcular_raising_average_st, gerar_heatmap_distribuicao_posicoes,
+                             gerar_grafico_comparacao_voltas_box, gerar_heatmap_deltas_tensor)
+
+
+SETORES = {
+    'S1 Tm': 'Setor 1',
+    'S2 Tm': 'Setor 2',
+    'S3 Tm': 'Setor 3',
+    'Lap_seconds': 'Laptimes'
+}
+
+
+def _exibir_exportacao_completa(df: pd.DataFrame, driver_info: dict, opcao: str, chave_sessao: str):
+    """Oferece o download da planilha completa, gerada apenas quando solicitada (e mantida em cache)."""
+    if st.checkbox("Preparar planilha completa da sessão (Excel)", value=False):
+        st.download_button(
+            label="📥 Baixar sessão completa em Excel",
+            data=gerar_excel_sessao_completa(df, driver_info, opcao, chave_sessao),
+            file_name='sessao_completa.xlsx',
+            mime=MIME_XLSX
+        )
+
+
+def _selecionar_definicao_gap(key: str) -> str:
+    """Seletor da definição de GAP: mesma volta ou carro imediatamente à frente na pista."""
+    rotulo = st.radio(
+        "Definição de GAP:",
+        list(DEFINICOES_GAP.keys()),
+        horizontal=True,
+        key=key,
+        help="'Na pista' considera a passagem anterior de qualquer carro pela linha, "
+             "inclusive retardatários e carros em outra volta."
+    )
+    return DEFINICOES_GAP[rotulo]
+
+
+def _filtrar_driver_info_por_gap(df: pd.DataFrame, driver_info: dict, chave_sessao: str) -> dict:
+    """
+    Exibe o filtro "ST para GAP > x" e retorna driver_info filtrado pelo limite escolhido.
+    O índice de GAP é construído uma vez por sessão; cada limite é só um searchsorted.
+    """
+    is_filtrar_gap = st.checkbox(
+        "Filtrar ST para GAP > x", value=False)
+
+    if not is_filtrar_gap:
+        return driver_info
+
+    definicao_gap = _selecionar_definicao_gap(key="definicao_gap_filtro")
+    limite_gap = st.number_input(
+        "Digite o limite de GAP (em segundos):", min_value=0.0, value=1.0, step=0.1)
+
+    indice_gap = obter_indice_gap(chave_sessao, df, driver_info, definicao_gap)
+    st.caption(
+        f"{indice_gap.contar(limite_gap)} voltas consideradas após remover STs com GAP ≤ {limite_gap:.1f}s")
+    return indice_gap.filtrar(limite_gap)
+
+
+def _filtrar_por_condicao_pista(driver_info: dict, key: str) -> dict:
+    """
+    Seletor da condição de pista das voltas (ar livre, vácuo, tráfego); retorna driver_info filtrado.
+    Se nenhum piloto ficar com voltas (também após o filtro de GAP), exibe um aviso e retorna {}.
+    """
+    condicoes = st.multiselect(
+        "Condição de pista:",
+        CONDICOES_PISTA,
+        default=CONDICOES_PISTA,
+        key=key,
+        help="Vácuo: carro à frente a até 1 s e ninguém colado atrás. Tráfego: carro à frente a até 2 s "
+             "(trem de carros ou ar sujo). Ar livre: carro à frente a mais de 2 s."
+    )
+    if len(condicoes) < len(CONDICOES_PISTA):
+        driver_info = filtrar_por_condicao(driver_info, condicoes)
+    if not driver_info:
+        st.warning("⚠️ Nenhuma volta atende aos filtros escolhidos.")
+    return driver_info
+
+
+@st.fragment
+def _exibir_matriz_st(df_matriz_st: pd.DataFrame, use_container_width: bool = True):
+    """Exibe a matriz de ST com a formatação condicional ajustável pelo usuário."""
+    df_st_formatado = formatar_st_com_cores_interativo(df_matriz_st)
+    st.dataframe(df_st_formatado, use_container_width=use_container_width,
+                 hide_index=True)
+
+
+# ========== TREINO ==========
+
+def exibir_resultado_treino(df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    # Processa o resultado do Qualy
+    df_resultado = processar_resultado_csv(df)
+
+    # Exibe o DataFrame no Streamlit
+    st.dataframe(df_resultado, hide_index=True)
+
+    # Volta ideal (soma dos melhores setores) e diferença para os melhores setores da sessão
+    df_setores, df_deltas = obter_melhores_setores(chave_sessao, driver_info)
+    if not df_setores.empty:
+        st.subheader("Volta Ideal e Melhores Setores")
+        df_setores_show = df_setores.copy()
+        for coluna in ['Volta_Ideal', 'Melhor_Volta']:
+            df_setores_show[coluna] = df_setores_show[coluna].map(formatar_tempo)
+        st.dataframe(df_setores_show.round(3), hide_index=True)
+        melhores_da_sessao = df_setores[['S1 Tm', 'S2 Tm', 'S3 Tm']].min()
+        st.caption(
+            f"Melhores setores da sessão: S1 {melhores_da_sessao['S1 Tm']:.3f} · S2 {melhores_da_sessao['S2 Tm']:.3f} · "
+            f"S3 {melhores_da_sessao['S3 Tm']:.3f} — volta ideal da sessão {formatar_tempo(melhores_da_sessao.sum())}")
+        st.plotly_chart(gerar_heatmap_deltas_setores(df_deltas), use_container_width=True)
+
+    _exibir_exportacao_completa(df, driver_info, "Treino", chave_sessao)
+
+
+@st.fragment
+def _exibir_top_speed_treino(pilotos: tuple, velocidades_max: tuple, y_min: float, y_max: float):
+    """Gráfico de top speed com o seletor de esquema de cores (reexecuta apenas esta seção)."""
+    # Seletor de esquema de cores (Padrão Amattheis pré-selecionado)
+    esquema_cores = st.radio(
+        "Esquema de cores:",
+        ('Equipe', 'Padrão Amattheis'),
+        index=1,  # Padrão Amattheis pré-selecionado
+        horizontal=True
+    )
+
+    # Cores conforme o esquema selecionado
+    cores = []
+    legendas = []
+
+    if esquema_cores == 'Equipe':
+        # Cores por equipe (comportamento original)
+        for piloto in pilotos:
+            equipe = equipes_pilotos.get(piloto)
+            cor = equipes_cor.get(equipe, 'gray')
+            cores.append(cor)
+            legendas.append(equipe)
+    else:
+        # Padrão Amattheis: todos em silver, exceto os pilotos Amattheis destacados
+        # Lista dos pilotos Amattheis que devem ser destacados
+        pilotos_amattheis = ['6 - Helio Castroneves', '12 - Lucas Foresti',
+                             '21 - Thiago Camilo', '30 - Cesar Ramos',
+                             '83 - Gabriel Casagrande']
+
+        for piloto in pilotos:
+            # Tenta encontrar a cor no dicionário pilotos_cor_amattheis
+            # Usa get() com fallback para 'silver' se não encontrar
+            cor = pilotos_cor_amattheis.get(piloto, 'silver')
+            cores.append(cor)
+            # Para o padrão Amattheis, usa o nome do piloto se for Amattheis, senão "Outros"
+            if piloto in pilotos_amattheis and cor != 'silver':
+                legendas.append(piloto)  # Nome do piloto individual
+            else:
+                legendas.append('Outros')
+
+    # Gráfico
+    fig = go.Figure()
+    barras_adicionadas = set()
+
+    # Equipe: agrupa por equipe na legenda; Padrão Amattheis: cada piloto Amattheis individualmente, outros agrupados
+    for piloto, velocidade, legenda, cor in zip(pilotos, velocidades_max, legendas, cores):
+        show_legend = legenda not in barras_adicionadas
+        barras_adicionadas.add(legenda)
+        fig.add_trace(go.Bar(
+            x=[piloto],
+            y=[velocidade],
+            name=legenda if show_legend else None,
+            marker_color=cor,
+            width=[0.6],
+            showlegend=show_legend
+        ))
+    legend_title = 'Equipe' if esquema_cores == 'Equipe' else 'Pilotos'
+
+    fig.update_layout(
+        title="<b>Top speed</b><br><span style='font-size:12px; color:gray;'>Clique e arraste o eixo Y para alterar a escala</span>",
+        title_x=0.4,
+        xaxis_title='Piloto',
+        yaxis_title='Velocidade Máxima (km/h)',
+        yaxis=dict(range=[y_min, y_max]),
+        height=600,
+        barmode='group',
+        legend_title_text=legend_title
+    )
+    st.plotly_chart(fig)
+
+
+def exibir_speed_treino(df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    # Criação das colunas para ordenação e filtro de GAP
+    col1, col2, col3 = st.columns([6, 2, 1])
+
+    with col1:
+        sort_order = st.radio(
+            "Ordenar por:", ('Resultado', 'Maior Velocidade'))
+
+    with col2:
+        # Se o filtro estiver ativado, manter apenas as voltas com GAP acima do limite
+        driver_info_filtrado = _filtrar_driver_info_por_gap(df, driver_info, chave_sessao)
+
+    driver_info_filtrado = _filtrar_por_condicao_pista(driver_info_filtrado, key="condicao_speed_treino")
+    if not driver_info_filtrado:
+        return
+
+    # Calcula as maiores velocidades com os dados filtrados
+    top_speed = maior_velocidade_por_piloto(driver_info_filtrado)
+
+    # Nomes dos pilotos já vêm limpos do parser de cabeçalhos (functions.cabecalhos)
+    pilotos_limpos = dict(top_speed)
+
+    pilotos = list(pilotos_limpos.keys())
+    velocidades_max = list(pilotos_limpos.values())
+
+    # Ordena os dados conforme seleção
+    if sort_order == 'Maior Velocidade':
+        sorted_pilotos = sorted(
+            zip(pilotos, velocidades_max), key=lambda x: x[1], reverse=True)
+    else:
+        sorted_pilotos = zip(pilotos, velocidades_max)
+
+    pilotos, velocidades_max = zip(*sorted_pilotos)
+
+    # Escala eixo Y
+    y_max = max(velocidades_max) * 1.01
+    y_min = y_max - 15
+
+    _exibir_top_speed_treino(pilotos, velocidades_max, y_min, y_max)
+
+    # Gráfico por modelo de carro
+    cores_modelo = []
+    modelos_carro = []
+    for piloto in pilotos:
+        modelo = piloto_modelo.get(piloto, 'Desconhecido')
+        cor = modelo_cor.get(modelo, 'gray')
+        cores_modelo.append(cor)
+        modelos_carro.append(modelo)
+
+    fig_modelo = go.Figure()
+    barras_adicionadas_modelo = set()
+    for piloto, velocidade, modelo, cor in zip(pilotos, velocidades_max, modelos_carro, cores_modelo):
+        show_legend = modelo not in barras_adicionadas_modelo
+        barras_adicionadas_modelo.add(modelo)
+        fig_modelo.add_trace(go.Bar(
+            x=[piloto],
+            y=[velocidade],
+            name=modelo if show_legend else None,
+            marker_color=cor,
+            width=[0.6],
+            showlegend=show_legend
+        ))
+
+    fig_modelo.update_layout(
+        title="<b>Top speed por marca</b><br><span style='font-size:12px; color:gray;'>Clique e arraste o eixo Y para alterar a escala</span>",
+        title_x=0.4,
+        xaxis_title='Piloto',
+        yaxis_title='Velocidade Máxima (km/h)',
+        yaxis=dict(range=[y_min, y_max]),
+        height=600,
+        barmode='group',
+        legend_title_text='Marca'
+    )
+    st.plotly_chart(fig_modelo)
+
+    # Chama a função para gerar o ranking ST (todos os tempos registrados, não só o maior)
+    df_ranking_st = gerar_ranking_st(
+        driver_info, modelo_cor, piloto_modelo, top_n=30)
+
+    df_ranking_st = df_ranking_st.format({'ST': '{:.1f}'})
+
+    # Exibir o ranking de ST no Streamlit
+    st.dataframe(df_ranking_st, use_container_width=False,
+                 hide_index=True)
+
+    # Cria 3 colunas: vazia, vazia, checkbox à direita
+    col1, col2, col3 = st.columns([6, 1, 1])
+
+    with col3:
+        mostrar_numerais = st.checkbox(
+            "Somente numerais", value=False)
+
+    # Criando a matriz conforme escolha
+    if mostrar_numerais:
+        df_matriz_st = criar_matriz_velocidades_numeral(driver_info)
+    else:
+        df_matriz_st = criar_matriz_velocidades(driver_info)
+
+    # Aplicando a formatação condicional e exibindo a matriz com largura total
+    _exibir_matriz_st(df_matriz_st)
+
+
+@st.fragment
+def exibir_laptimes_treino(df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    piloto_selecionado = st.selectbox(
+        "Selecione o piloto", list(driver_info.keys()))
+
+    if piloto_selecionado:
+        df_piloto = driver_info[piloto_selecionado].copy()
+        df_piloto['Lap_seconds'] = df_piloto['Lap Tm']
+        # Cria uma cópia do DataFrame apenas com as colunas que quero exibir (tempos formatados)
+        df_piloto_show = formatar_voltas_para_exibicao(df_piloto.drop(columns=['Lap_seconds']))
+
+        st.dataframe(df_piloto_show, hide_index=True)
+
+        # Filtrar voltas "válidas" (exclui voltas muito lentas como box ou erro)
+        valid_laps = df_piloto[(df_piloto['Lap_seconds'] > 60) & (
+            df_piloto['Lap_seconds'] < 200)]
+
+        # Definir valores para o eixo Y com base nas voltas válidas
+        if not valid_laps.empty:
+            y_min = valid_laps['Lap_seconds'].min() * 0.98
+            y_max = valid_laps['Lap_seconds'].max() * 1.02
+        else:
+            # fallback se todas as voltas forem inválidas
+            y_min, y_max = 80, 200
+
+        # Uma cor por stint (quando detectados)
+        cor_stint = None
+        if 'Stint' in df_piloto.columns:
+            df_piloto['Stint'] = 'Stint ' + df_piloto['Stint'].astype(str)
+            cor_stint = 'Stint'
+
+        fig = px.line(
+            df_piloto,
+            x='Lap',
+            y='Lap_seconds',
+            color=cor_stint,
+            markers=True,
+            title=f"Tempos de Volta - {piloto_selecionado}",
+            labels={'Lap_seconds': 'Tempo (s)', 'Lap': 'Volta'}
+        )
+
+        # Atualiza o layout com o range ajustado
+        fig.update_layout(
+            yaxis=dict(range=[y_min, y_max]),
+            title_x=0.4,
+            annotations=[
+                dict(
+                    text="Clique e arraste o eixo Y para alterar a escala",
+                    xref="paper", yref="paper",
+                    x=0.5, y=1.08,
+                    showarrow=False,
+                    font=dict(size=12, color="gray"),
+                    align="center"
+                )
+            ]
+        )
+        st.plotly_chart(fig)
+
+
+@st.fragment
+def exibir_manufacturer_treino(df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    # Slider para o usuário ajustar o fator de limite de outliers
+    limit_factor = st.slider(
+        'Selecione o fator de limite (%) acima da melhor volta/setor para filtras os outliers (sugestão baseado em estudos: 2%)',
+        min_value=1.01,
+        max_value=1.05,
+        value=1.02,
+        step=0.01,
+        format="%.2f"
+    )
+    driver_info = _filtrar_por_condicao_pista(driver_info, key="condicao_manufacturer")
+    if not driver_info:
+        return
+
+    # Monta o DataFrame completo com os dados dos pilotos e suas montadoras
+    df_completo = montar_dataframe_completo(driver_info)
+
+    # Gera e exibe os boxplots por setor com base no limit_factor
+    for coluna, titulo in SETORES.items():
+        fig = gerar_boxplot_setor(
+            df_completo, coluna, titulo, margem=limit_factor - 1)
+        st.plotly_chart(fig, use_container_width=True)
+
+
+@st.fragment
+def exibir_teams_treino(df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    # Slider para o limite
+    team_limit_factor = st.slider(
+        'Selecione o fator de limite (%) acima da melhor volta/setor para filtras os outliers (sugestão baseado em estudos: 2%)',
+        min_value=1.01,
+        max_value=1.05,
+        value=1.02,
+        step=0.01,
+        format="%.2f",
+        key="team_limit_slider"
+    )
+    st.caption(
+        "Voltas acima do limite em relação ao melhor tempo de cada equipe são removidas.")
+
+    # Monta o DataFrame completo com as colunas e adiciona coluna de equipe
+    df_teams = montar_dataframe_completo(driver_info)
+
+    df_teams['Equipe'] = df_teams['Piloto'].map(equipes_pilotos)
+    df_teams = df_teams.dropna(subset=['Equipe'])
+
+    for coluna, titulo in SETORES.items():
+        fig = gerar_boxplot_setor(
+            df_teams, coluna, titulo, margem=team_limit_factor - 1, agrupador='Equipe')
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def _exibir_vacuo_pelotao(df: pd.DataFrame, driver_info: dict, chave_sessao: str, definicao_gap: str):
+    """Estatística do vácuo de todo o pelotão por faixa de GAP (tabela e gráfico)."""
+    col1, col2 = st.columns(2)
+    with col1:
+        largura_faixa = st.select_slider(
+            "Largura da faixa de GAP (s):", options=[0.05, 0.1, 0.2, 0.25, 0.5], value=0.1)
+    with col2:
+        por_montadora = st.checkbox("Separar por montadora", value=False)
+
+    df_vacuo = obter_estatisticas_vacuo(chave_sessao, df, driver_info, definicao_gap, largura_faixa, por_montadora)
+    if df_vacuo.empty:
+        st.warning("Não há passagens suficientes para a estatística de vácuo.")
+        return
+
+    st.plotly_chart(gerar_grafico_vacuo(df_vacuo, modelo_cor), use_container_width=True)
+    st.dataframe(df_vacuo, hide_index=True, use_container_width=True)
+
+
+@st.fragment
+def exibir_speed_gap(df: pd.DataFrame, driver_info: dict, chave_sessao: str, com_tendencia: bool = False):
+    definicao_gap = _selecionar_definicao_gap(key="definicao_gap_speed")
+
+    visao = st.radio("Visão:", ('Pelotão (faixas de GAP)', 'Por piloto'), horizontal=True, key="visao_speed_gap")
+    if visao.startswith('Pelotão'):
+        _exibir_vacuo_pelotao(df, driver_info, chave_sessao, definicao_gap)
+        return
+
+    # Dados de GAP x Speed (calculados uma vez por sessão e definição)
+    cleaned_df = obter_dados_gap(chave_sessao, df, definicao_gap, driver_info)
+
+    # Interface Streamlit
+    pilotos = cleaned_df['Piloto'].unique().tolist()
+    pilotos.insert(0, "")  # Adiciona opção vazia
+    selected_pilot = st.selectbox('Selecione um piloto:', pilotos)
+
+    show_trend = st.checkbox("Mostrar linha de tendência") if com_tendencia else False
+
+    if selected_pilot:
+        pilot_data = cleaned_df[cleaned_df['Piloto'] == selected_pilot]
+        filtered_data = pilot_data[pilot_data['ST_next'] > 200]
+
+        fig_gap_speed = gerar_grafico_gap_vs_st(
+            filtered_data, selected_pilot, show_trend=show_trend)
+        st.plotly_chart(fig_gap_speed)
+
+        fig_gap_lap = gerar_grafico_gap_vs_volta(
+            filtered_data, selected_pilot)
+        st.plotly_chart(fig_gap_lap)
+    else:
+        st.warning('Por favor, selecione um piloto.')
+
+
+# ========== CORRIDA ==========
+
+def exibir_resultado_corrida(df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    reconstrucao = obter_reconstrucao_corrida(chave_sessao, driver_info)
+    df_resultado_corrida = montar_dataframe_resultado_corrida(
+        driver_info, equipes_pilotos, reconstrucao=reconstrucao)
+
+    st.subheader("Resultado da Corrida")
+
+    # Converte a coluna Voltas para inteiro
+    df_resultado_corrida['Voltas'] = df_resultado_corrida['Voltas'].astype(
+        int)
+    # Aplica o estilo com cor para pilotos específicos
+    styled_df = df_resultado_corrida.style.apply(
+        colorir_piloto, axis=1)
+
+    # Exibe o DataFrame com cor
+    st.dataframe(styled_df, hide_index=True)
+
+    # Gráfico de posições volta a volta
+    st.plotly_chart(gerar_grafico_posicoes_por_volta(reconstrucao), use_container_width=True)
+
+    _exibir_exportacao_completa(df, driver_info, "Corrida", chave_sessao)
+
+
+@st.fragment
+def _exibir_maior_e_media_st(df_st: pd.DataFrame):
+    """Gráficos de maior ST e média top 5 com o seletor de esquema de cores."""
+    # Seletor de esquema de cores (Padrão Amattheis pré-selecionado)
+    esquema_cores_st = st.radio(
+        "Esquema de cores:",
+        ('Padrão Amattheis', 'Montadora'),
+        index=0,  # Padrão Amattheis pré-selecionado
+        horizontal=True,
+        key="esquema_cores_st"
+    )
+
+    st.plotly_chart(plotar_maior_st(df_st, modelo_cor, esquema_cores_st))
+    st.plotly_chart(plotar_media_top_5_st(df_st.copy(), modelo_cor, esquema_cores_st))
+
+
+@st.fragment
+def _exibir_raising_average_st(driver_info_filtrado: dict):
+    """Gráfico de raising average de ST com a opção de coloração."""
+    # Opção de coloração
+    modo_coloracao = st.radio(
+        "Colorir linhas por:",
+        ["Padrão Amattheis", "Montadora", "Piloto"],
+        index=0,  # Padrão Amattheis pré-selecionado
+        horizontal=True
+    )
+
+    # Cálculo e plotagem do gráfico
+    dict_raising = calcular_raising_average_st(driver_info_filtrado)
+    fig_raising = plotar_raising_average_st(
+        dict_raising,
+        piloto_modelo,
+        modelo_cor,
+        colorir_por=modo_coloracao.lower(),
+        pilotos_cor=pilotos_cor  # Para modo "piloto"
+    )
+
+    st.plotly_chart(fig_raising, use_container_width=True)
+
+
+def exibir_speed_report_corrida(df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    st.subheader("Speed Report - Matriz de Velocidades (ST)")
+
+    # Checkbox e slider do filtro GAP: versão filtrada dos dados por piloto, se filtro ativo
+    driver_info_filtrado = _filtrar_driver_info_por_gap(df, driver_info, chave_sessao)
+    driver_info_filtrado = _filtrar_por_condicao_pista(driver_info_filtrado, key="condicao_speed_corrida")
+    if not driver_info_filtrado:
+        return
+
+    # Checkbox para mostrar só numerais
+    col1, col2, col3 = st.columns([6, 1, 1])
+    with col3:
+        mostrar_numerais = st.checkbox("Somente numerais", value=False)
+
+    # Criar matriz ST filtrada conforme checkbox
+    if mostrar_numerais:
+        df_matriz_st = criar_matriz_velocidades_numeral(
+            driver_info_filtrado)
+    else:
+        df_matriz_st = criar_matriz_velocidades(driver_info_filtrado)
+
+    # Formatar e exibir matriz
+    _exibir_matriz_st(df_matriz_st, use_container_width=False)
+
+    # Bytes da planilha ficam em cache enquanto a matriz não mudar
+    excel_data = gerar_excel_matriz_st(df_matriz_st)
+
+    st.download_button(
+        label="📥 Baixar Matriz ST em Excel",
+        data=excel_data,
+        file_name='matriz_st.xlsx',
+        mime=MIME_XLSX
+    )
+
+    # Dados para boxplot e gráficos, usando dados filtrados
+    df_boxplot = preparar_dados_boxplot(
+        driver_info_filtrado, piloto_modelo)
+    fig_box = gerar_boxplot_st(df_boxplot)
+    st.plotly_chart(fig_box, use_container_width=True)
+
+    df_st = calcular_st_maior_e_media(driver_info_filtrado)
+    _exibir_maior_e_media_st(df_st)
+
+    # Raising Average ST
+    _exibir_raising_average_st(driver_info_filtrado)
+
+    st.markdown("---")
+    st.subheader("📄 Gerar Relatório em PDF")
+
+    # Informações da sessão para a capa
+    st.markdown("### 📋 Informações da Sessão")
+    st.markdown("Preencha as informações abaixo para incluir na capa do relatório:")
+
+    col_info1, col_info2 = st.columns(2)
+
+    with col_info1:
+        evento = st.text_input("Evento", placeholder="Ex: S26E01")
+        data = st.text_input("Data", placeholder="Ex: 15/03/2024")
+
+    with col_info2:
+        circuito = st.text_input("Circuito", placeholder="Ex: Interlagos")
+        tipo_sessao = st.text_input("Sessão", placeholder="Ex: Treino Livre 1")
+
+    observacoes = st.text_area("Observações (opcional)", placeholder="Informações adicionais sobre a sessão...", height=100)
+
+    # Criar dicionário com informações da sessão
+    info_sessao = {
+        'evento': evento,
+        'data': data,
+        'circuito': circuito,
+        'tipo_sessao': tipo_sessao,
+        'observacoes': observacoes
+    }
+
+    st.markdown("---")
+
+    # Seleção de gráficos a incluir
+    st.markdown("**Selecione quais elementos incluir no relatório:**")
+    col1, col2 = st.columns(2)
+
+    with col1:
+        incluir_resumo = st.checkbox("Resumo de ST por Piloto", value=True)
+        incluir_boxplot = st.checkbox("Boxplot por Montadora", value=True)
+
+    with col2:
+        incluir_maior_st = st.checkbox("Gráfico Maior ST", value=True)
+        incluir_media_top5_st = st.checkbox("Gráfico Média Top 5 ST", value=True)
+
+    # Verificar se pelo menos um elemento foi selecionado
+    if not any([incluir_resumo, incluir_boxplot, incluir_maior_st, incluir_media_top5_st]):
+        st.warning("⚠️ Selecione pelo menos um elemento para incluir no relatório.")
+
+    if st.button("📄 Gerar relatório em PDF"):
+        try:
+            # Os gráficos de barras são gerados aqui com o esquema de cores escolhido na seção acima
+            esquema_cores_st = st.session_state.get('esquema_cores_st', 'Padrão Amattheis')
+            caminho_pdf = gerar_relatorio_completo_speed_report(
+                df_st=df_st,
+                df_matriz_st=df_matriz_st,
+                fig_box=fig_box,
+                fig_maior_st=plotar_maior_st(df_st, modelo_cor, esquema_cores_st),
+                fig_media_top_5_st=plotar_media_top_5_st(df_st.copy(), modelo_cor, esquema_cores_st),
+                incluir_resumo=incluir_resumo,
+                incluir_boxplot=incluir_boxplot,
+                incluir_maior_st=incluir_maior_st,
+                incluir_media_top5_st=incluir_media_top5_st,
+                info_sessao=info_sessao
+            )
+            st.success(f"✅ Relatório gerado com sucesso: {caminho_pdf}")
+            with open(caminho_pdf, "rb") as f:
+                st.download_button("📥 Baixar PDF", f,
+                                   file_name="relatorio_speed_report.pdf")
+        except Exception as e:
+            st.error(f"❌ Erro ao gerar relatório: {e}")
+
+
+@st.fragment
+def _exibir_boxplot_laptimes(df_completo: pd.DataFrame):
+    """Boxplot de laptimes com a regra/parâmetro de outliers e a escolha de coloração."""
+    col1, col2 = st.columns(2)
+    with col1:
+        rotulo_regra = st.selectbox("Regra de outliers:", list(REGRAS_OUTLIER.keys()), key="regra_outlier_laptimes")
+    with col2:
+        agrupador_outlier = st.radio(
+            "Estatísticas do filtro por:", ('Montadora', 'Piloto'), horizontal=True, key="agrupador_outlier_laptimes")
+    regra_outlier = REGRAS_OUTLIER[rotulo_regra]
+
+    if regra_outlier == 'percentual_melhor':
+        # Adicionar o slider para o multiplicador de outliers (default 1.05)
+        parametro_outlier = st.slider(
+            'Filtro de Outliers (Multiplicador para o Melhor Tempo)',
+            min_value=1.0,
+            max_value=1.2,
+            value=1.05,  # Valor inicial
+            step=0.01,
+            help="Ajuste o multiplicador para filtrar os outliers. (exemplo: 1.08 significa 8% acima do melhor tempo)"
+        )
+    else:
+        parametro_outlier = st.slider(
+            'Filtro de Outliers (fator k)',
+            min_value=0.5,
+            max_value=5.0,
+            value=3.0 if regra_outlier == 'mad' else 1.5,
+            step=0.1,
+            help="Mediana ± k·MAD (k = 3 é o usual) ou [Q1 - k·IQR, Q3 + k·IQR] (k = 1,5 é o critério de Tukey)."
+        )
+
+    # Exibir as opções de gráfico: com ou sem cor por montadora
+    escolha_grafico = st.radio(
+        "Defina como o gráfico será colorido:",
+        ('Montadora', 'Colocação')
+    )
+
+    # Gerar apenas o box plot escolhido, com o filtro interativo de outliers
+    if escolha_grafico == 'Montadora':
+        fig_laptimes = gerar_boxplot_laptimes(
+            df_completo, modelo_cor, parametro_outlier, regra_outlier, agrupador_outlier)
+    else:
+        fig_laptimes = gerar_boxplot_laptimes_sem_cor(
+            df_completo, parametro_outlier, regra_outlier, agrupador_outlier)
+
+    st.plotly_chart(fig_laptimes, use_container_width=True)
+
+
+def _opcao_excluir_voltas_de_box(driver_info: dict, key: str) -> dict:
+    """Checkbox para excluir as voltas de entrada/saída dos boxes; retorna driver_info filtrado."""
+    if st.checkbox("Excluir voltas de entrada/saída dos boxes", value=True, key=key):
+        return remover_voltas_de_box(driver_info)
+    return driver_info
+
+
+@st.fragment
+def _exibir_degradacao(driver_info: dict, chave_sessao: str):
+    """Ajuste de degradação por piloto e stint, com correção opcional de combustível."""
+    col1, col2 = st.columns(2)
+    with col1:
+        modelo = st.radio("Modelo:", ('Linear', 'Quadrático'), horizontal=True)
+    with col2:
+        efeito_combustivel = st.number_input(
+            "Correção de combustível (s/volta):", min_value=0.0, max_value=0.2, value=0.0, step=0.005,
+            format="%.3f", help="Ganho de tempo por volta devido ao combustível queimado. 0 desliga a correção.")
+
+    coeficientes, voltas_ajuste = obter_ajuste_degradacao(
+        chave_sessao, driver_info, 2 if modelo == 'Quadrático' else 1, float(efeito_combustivel))
+
+    if coeficientes.empty:
+        st.warning("Não há voltas suficientes para o ajuste de degradação.")
+        return
+
+    st.dataframe(coeficientes.round(4), hide_index=True, use_container_width=True)
+
+    pilotos = list(coeficientes['Piloto'].unique())
+    selecionados = st.multiselect("Pilotos no gráfico:", pilotos, default=pilotos[:3])
+    if selecionados:
+        st.plotly_chart(gerar_grafico_degradacao(voltas_ajuste, selecionados, pilotos_cor),
+                        use_container_width=True)
+
+
+def exibir_laptimes_corrida(df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    sub_visualizacao = st.radio(
+        "Visualização:", ('Tempos de volta', 'Degradação'), horizontal=True, key="laptimes_corrida_sub")
+    if sub_visualizacao == 'Degradação':
+        _exibir_degradacao(driver_info, chave_sessao)
+        return
+
+    driver_info = _opcao_excluir_voltas_de_box(driver_info, key="excluir_box_laptimes")
+    driver_info = _filtrar_por_condicao_pista(driver_info, key="condicao_laptimes_corrida")
+    if not driver_info:
+        return
+
+    # Montar o dataframe completo com os tempos de volta
+    df_completo = montar_dataframe_completo(driver_info)
+
+    _exibir_boxplot_laptimes(df_completo)
+
+    _exibir_ritmo_por_volta(driver_info)
+
+
+@st.fragment
+def _exibir_ritmo_por_volta(driver_info: dict):
+    """Gráfico de ritmo por volta: corrida inteira (reduzida em provas longas) ou detalhe de uma faixa de voltas."""
+    voltas = [int(dados['Lap'].max()) for dados in driver_info.values()
+              if isinstance(dados, pd.DataFrame) and not dados.empty]
+    primeira_volta, ultima_volta = 1, max(voltas, default=1)
+
+    faixa_voltas, max_pontos = None, None
+    if ultima_volta > PONTOS_VISAO_GERAL:
+        visao = st.radio("Ritmo por volta:", ('Visão geral', 'Detalhe por faixa de voltas'),
+                         horizontal=True, key="visao_ritmo_corrida")
+        if visao == 'Visão geral':
+            max_pontos = PONTOS_VISAO_GERAL
+            st.caption("Visão geral reduzida (mínimo e máximo de cada trecho). "
+                       "Use o detalhe para ver todas as voltas de uma faixa.")
+        else:
+            faixa_voltas = st.slider("Faixa de voltas:", primeira_volta, ultima_volta,
+                                     (primeira_volta, min(ultima_volta, primeira_volta + PONTOS_VISAO_GERAL // 2)),
+                                     key="faixa_voltas_ritmo")
+
+    # Gerar o gráfico de linha com todos os pilotos
+    fig_laptimes_linha = gerar_grafico_laptimes_por_volta(
+        driver_info, faixa_voltas=faixa_voltas, max_pontos_por_piloto=max_pontos)
+
+    # Exibir no Streamlit
+    st.plotly_chart(fig_laptimes_linha, use_container_width=True)
+
+
+@st.fragment
+def exibir_gap_analysis_corrida(df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    # Matriz volta × piloto construída uma vez por sessão
+    matriz_voltas = obter_matriz_voltas(chave_sessao, driver_info)
+
+    # Usando a função adaptada
+    gerar_figura_para_piloto_referencia, pilotos = gerar_grafico_gap_para_piloto_referencia(
+        None, matriz_voltas=matriz_voltas)
+
+    # Seleção do piloto de referência no Streamlit
+    reference_pilot = st.selectbox(
+        'Selecione o piloto de referência:',
+        pilotos
+    )
+
+    tipo_gap = st.radio(
+        'Tipo de GAP:',
+        ['Por volta', 'Acumulado (tempo de prova)'],
+        horizontal=True
+    )
+
+    # Gerar e exibir o gráfico quando o piloto for selecionado
+    if reference_pilot:
+        fig = gerar_figura_para_piloto_referencia(
+            reference_pilot, acumulado=tipo_gap.startswith('Acumulado'))
+        if fig:
+            st.plotly_chart(fig)
+        else:
+            st.warning(
+                f'O piloto {reference_pilot} não possui dados suficientes para análise.')
+
+
+@st.fragment
+def _exibir_ranking_da_volta(ranked_df: pd.DataFrame):
+    """Gráfico e tabela do ranking da volta escolhida no slider."""
+    # Slider para selecionar a volta
+    selected_lap = st.slider(
+        "Selecione a volta:",
+        int(ranked_df['Lap'].min()),
+        int(ranked_df['Lap'].max()),
+        step=1
+    )
+
+    # Pilotos do time para destacar
+    team_pilots = ['21 - Thiago Camilo', '30 - Cesar Ramos']
+
+    # Dados da volta selecionada
+    lap_data = ranked_df[ranked_df['Lap'] == selected_lap].copy()
+    lap_data['Piloto'] = lap_data['Piloto'].astype(str)
+    lap_data['Destaque'] = lap_data['Piloto'].apply(
+        lambda x: 'Time' if x in team_pilots else 'Outro'
+    )
+
+    best_time = lap_data['Lap_seconds'].min()
+    min_y_value = best_time * 0.98
+
+    # Gráfico de barras
+    fig_bar = px.bar(
+        lap_data,
+        x='Piloto',
+        y='Lap_seconds',
+        text='Rank',
+        title=f'Ranking da Volta {selected_lap}',
+        labels={'Piloto': 'Piloto',
+                'Lap_seconds': 'Tempo de Volta (s)'}
+    )
+
+    fig_bar.update_traces(
+        texttemplate='%{text}',
+        textposition='outside',
+        marker=dict(
+            color=lap_data['Destaque'].apply(
+                lambda x: 'rgba(255, 0, 0, 0.8)' if x == 'Time' else 'rgba(31, 119, 180, 0.7)'
+            )
+        )
+    )
+
+    fig_bar.update_layout(
+        title_x=0.4,
+        xaxis_tickangle=-45,
+        yaxis=dict(range=[min_y_value, None]),
+        showlegend=False
+    )
+
+    st.plotly_chart(fig_bar)
+
+    st.write(f"📋 Tabela de Ranking da Volta {selected_lap}")
+    st.dataframe(lap_data[['Piloto', 'Lap_seconds', 'Rank']].rename(
+        columns={'Lap_seconds': 'Tempo (s)'}), hide_index=True)
+
+
+@st.fragment
+def _exibir_historico_ranking(ranked_df: pd.DataFrame):
+    """Histórico de ranking do piloto selecionado."""
+    selected_pilot = st.selectbox(
+        "Selecione o piloto para ver histórico de ranking:", ranked_df['Piloto'].unique().tolist())
+
+    piloto_data = ranked_df[ranked_df['Piloto'] == selected_pilot]
+
+    fig_line = px.line(
+        piloto_data,
+        x='Lap',
+        y='Rank',
+        markers=True,
+        title=f'Histórico de Ranking - {selected_pilot}',
+        labels={'Lap': 'Volta', 'Rank': 'Ranking'}
+    )
+
+    fig_line.update_layout(
+        title_x=0.38
+    )
+
+    st.plotly_chart(fig_line)
+
+
+def exibir_ranking_por_volta(df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    st.header("🏁 Ranking por Volta")
+
+    driver_info = _opcao_excluir_voltas_de_box(driver_info, key="excluir_box_ranking")
+
+    # df_completo com 'Piloto', 'Lap', 'Lap_seconds'
+    df_completo = montar_dataframe_completo(driver_info)
+    ranked_df = gerar_ranking_por_volta(df_completo)
+
+    _exibir_ranking_da_volta(ranked_df)
+    _exibir_historico_ranking(ranked_df)
+
+
+@st.fragment
+def _exibir_replay_da_volta(replay):
+    """Classificação, GAPs e ranking de ST no momento em que o líder completa a volta escolhida."""
+    primeira_volta, ultima_volta = int(replay.voltas[0]), int(replay.voltas[-1])
+    volta = st.slider("Volta do líder:", primeira_volta, ultima_volta, ultima_volta, key="replay_volta_corrida")
+    indice = replay.indice_volta(volta)
+
+    classificacao = montar_dataframe_classificacao_replay(replay, indice, equipes_pilotos)
+    ranking_st = replay.ranking_st(indice)
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Líder", classificacao['Piloto'].iloc[0])
+    estado = replay.classificacao(indice)
+    if estado['Melhor_Volta'].notna().any():
+        k = estado['Melhor_Volta'].idxmin()
+        col2.metric("Melhor volta até aqui", formatar_tempo(estado['Melhor_Volta'][k]), estado['Piloto'][k],
+                    delta_color="off")
+    if not ranking_st.empty:
+        col3.metric("Maior ST até aqui", f"{ranking_st['Maior_ST'].iloc[0]:.1f} km/h", ranking_st['Piloto'].iloc[0],
+                    delta_color="off")
+
+    col_classificacao, col_st = st.columns([3, 1])
+    with col_classificacao:
+        st.write(f"📋 Classificação ao fim da volta {volta} do líder")
+        st.dataframe(classificacao.style.apply(colorir_piloto, axis=1), hide_index=True)
+    with col_st:
+        st.write("🚀 Maior ST até aqui")
+        st.dataframe(ranking_st.rename(columns={'Maior_ST': 'Maior ST'}).round(1), hide_index=True)
+
+
+def exibir_replay_corrida(df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    st.header("⏯️ Replay da Corrida")
+    st.caption("Estado da corrida no momento em que o líder completa cada volta. "
+               "Todas as voltas são pré-calculadas uma vez; mover o slider só consulta a volta escolhida.")
+
+    replay = obter_replay_corrida(chave_sessao, driver_info)
+    if replay.n_voltas == 0:
+        st.warning("⚠️ Não há voltas para o replay.")
+        return
+
+    _exibir_replay_da_volta(replay)
+
+
+def exibir_estrategia_corrida(df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    st.header("🎲 Simulação de Estratégia")
+    st.caption("Monte Carlo com o ritmo, a degradação e a dispersão de cada piloto ajustados nas voltas da sessão: "
+               "volta de parada sorteada na janela, perda no box e safety car aleatório.")
+
+    n_voltas_sessao = max((int(voltas['Lap'].max()) for voltas in driver_info.values()
+                           if isinstance(voltas, pd.DataFrame) and not voltas.empty), default=0)
+    if n_voltas_sessao == 0:
+        st.warning("⚠️ Não há voltas para ajustar o ritmo dos pilotos.")
+        return
+    n_voltas_padrao = max(n_voltas_sessao, 2)
+
+    # Formulário: a simulação só roda depois de confirmar os parâmetros (os confirmados ficam na sessão)
+    with st.form("parametros_estrategia"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            n_simulacoes = st.select_slider("Simulações:", [1000, 2000, 5000, 10000], value=5000)
+            n_voltas = st.number_input("Voltas da corrida:", 2, 500, n_voltas_padrao)
+        with col2:
+            perda_box = st.number_input("Perda no box (s):", 0.0, 120.0, PERDA_BOX_PADRAO, 0.5)
+            # Janela em campos livres (validados contra as voltas da corrida ao simular), para que a
+            # corrida simulada possa ser mais longa que a sessão gravada
+            col_inicio, col_fim = st.columns(2)
+            inicio_janela = col_inicio.number_input("Parada a partir da volta:", 1, 499,
+                                                    max(1, n_voltas_padrao // 4))
+            fim_janela = col_fim.number_input("Parada até a volta:", 1, 499,
+                                              max(1, min(3 * n_voltas_padrao // 4, n_voltas_padrao - 1)))
+        with col3:
+            prob_safety_car = st.slider("Probabilidade de safety car (%):", 0, 100,
+                                        int(PROB_SAFETY_CAR_PADRAO * 100)) / 100
+            duracao_safety_car = st.number_input("Duração do safety car (voltas):", 1, 20, DURACAO_SAFETY_CAR_PADRAO)
+        if st.form_submit_button("🎲 Simular"):
+            if inicio_janela > fim_janela or fim_janela > n_voltas - 1:
+                st.error(f"❌ Janela de parada inválida: escolha voltas entre 1 e {n_voltas - 1} "
+                         f"(corrida de {n_voltas} voltas), com o início antes do fim.")
+            else:
+                st.session_state['simulacao_estrategia'] = (
+                    chave_sessao, int(n_simulacoes), int(n_voltas), (int(inicio_janela), int(fim_janela)),
+                    float(perda_box), float(prob_safety_car), int(duracao_safety_car))
+
+    parametros = st.session_state.get('simulacao_estrategia')
+    if parametros is None or parametros[0] != chave_sessao:
+        st.info("Ajuste os parâmetros e clique em 🎲 Simular.")
+        return
+    _, n_simulacoes, n_voltas, janela_box, perda_box, prob_safety_car, duracao_safety_car = parametros
+
+    try:
+        pilotos, posicoes = obter_simulacao_estrategia(
+            chave_sessao, driver_info, n_simulacoes, n_voltas, janela_box, perda_box,
+            prob_safety_car, duracao_safety_car)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return
+
+    # Carros destacados (cores da equipe) aparecem primeiro
+    destacados = [p for p in pilotos if pilotos_cor_amattheis.get(p, 'silver') != 'silver']
+    selecionados = st.multiselect("Pilotos:", pilotos, default=destacados or pilotos[:5], key="pilotos_estrategia")
+    if not selecionados:
+        return
+
+    colunas = [pilotos.index(p) for p in selecionados]
+    resumo = resumo_posicoes(posicoes[:, colunas], selecionados)
+    for coluna in ['Vitória', 'Pódio', 'Top 10']:
+        resumo[coluna] = (resumo[coluna] * 100).round(1).astype(str) + '%'
+    st.dataframe(resumo.style.apply(colorir_piloto, axis=1), hide_index=True, use_container_width=True)
+
+    distribuicao = distribuicao_posicoes(posicoes, pilotos).loc[selecionados]
+    st.plotly_chart(gerar_heatmap_distribuicao_posicoes(distribuicao), use_container_width=True)
+
+    _exibir_comparacao_voltas_box(driver_info, chave_sessao, selecionados, n_voltas, janela_box, perda_box,
+                                  prob_safety_car, duracao_safety_car)
+
+
+@st.fragment
+def _exibir_comparacao_voltas_box(driver_info: dict, chave_sessao: str, pilotos: list, n_voltas: int,
+                                  janela_box: tuple, perda_box: float, prob_safety_car: float,
+                                  duracao_safety_car: int):
+    """Posição esperada de um piloto para cada volta de parada na janela (mesmos sorteios em todas)."""
+    st.subheader("Qual a melhor volta para parar?")
+    piloto = st.selectbox("Piloto:", pilotos, key="piloto_volta_box")
+    passo = max(1, (janela_box[1] - janela_box[0]) // 15)
+    if not st.button("Comparar voltas de parada"):
+        return
+
+    simulador = SimuladorEstrategia(obter_modelo_ritmo(chave_sessao, driver_info), n_voltas, janela_box, perda_box,
+                                    prob_safety_car, duracao_safety_car)
+    with st.spinner("Simulando..."):
+        comparacao = simulador.comparar_voltas_box(piloto, range(janela_box[0], janela_box[1] + 1, passo), 2000)
+    st.plotly_chart(gerar_grafico_comparacao_voltas_box(comparacao, piloto), use_container_width=True)
+
+
+@st.fragment
+def _exibir_tensor_setores(tensor):
+    """Heatmaps de onde cada carro perde tempo; trocar referência ou setor só reindexa o tensor."""
+    col1, col2 = st.columns(2)
+    with col1:
+        referencia = st.selectbox("Comparar com:", REFERENCIAS_SETORES, key="referencia_setores")
+    piloto_referencia = None
+    with col2:
+        if referencia in (REFERENCIA_PILOTO_VOLTA, REFERENCIA_PILOTO_MELHOR):
+            piloto_referencia = st.selectbox("Piloto de referência:", tensor.pilotos, key="piloto_referencia_setores")
+    sem_box = st.checkbox("Excluir voltas de entrada/saída do box", value=True, key="sem_box_setores")
+
+    deltas = tensor.deltas(referencia, piloto_referencia, sem_box=sem_box)
+
+    resumo = tensor.resumo_por_setor(deltas)
+    st.plotly_chart(gerar_heatmap_deltas_tensor(
+        resumo, f"Diferença mediana por setor - {referencia}", 'Setor'), use_container_width=True)
+
+    setor = st.radio("Setor volta a volta:", tensor.setores, horizontal=True, key="setor_tensor")
+    st.plotly_chart(gerar_heatmap_deltas_tensor(
+        tensor.por_volta(deltas, setor), f"{setor} volta a volta - {referencia}", 'Volta'), use_container_width=True)
+
+
+def exibir_deltas_setores(df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    st.header("🧩 Diferenças por Setor")
+    st.caption("Diferença de cada setor de cada volta para a referência escolhida "
+               "(positivo = mais lento). O primeiro mapa resume cada piloto pela mediana das voltas.")
+
+    tensor = obter_tensor_setores(chave_sessao, driver_info)
+    if not tensor.pilotos or np.isnan(tensor.tempos).all():
+        st.warning("⚠️ Não há tempos de setor nesta sessão.")
+        return
+
+    _exibir_tensor_setores(tensor)
+
+
+ABAS_TREINO = {
+    'Resultado': exibir_resultado_treino,
+    'Speed': exibir_speed_treino,
+    'Laptimes': exibir_laptimes_treino,
+    'Manufacturer': exibir_manufacturer_treino,
+    'Teams': exibir_teams_treino,
+    'Speed x GAP': exibir_speed_gap,
+    'Setores': exibir_deltas_setores,
+}
+
+ABAS_CORRIDA = {
+    'Resultado': exibir_resultado_corrida,
+    'Speed Report': exibir_speed_report_corrida,
+    'Laptimes': exibir_laptimes_corrida,
+    'Gap Analysis': exibir_gap_analysis_corrida,
+    'Speed x GAP': lambda df, driver_info, chave_sessao: exibir_speed_gap(df, driver_info, chave_sessao, com_tendencia=True),
+    'Ranking by lap': exibir_ranking_por_volta,
+    'Replay': exibir_replay_corrida,
+    'Setores': exibir_deltas_setores,
+    'Estratégia': exibir_estrategia_corrida,
+}
+
+
+def exibir_abas(opcao: str, df: pd.DataFrame, driver_info: dict, chave_sessao: str):
+    """
+    Exibe o seletor de visualização e processa apenas a aba selecionada.
+
+    Args:
+        opcao: 'Treino' ou 'Corrida'
+        df: DataFrame bruto da sessão
+        driver_info: Dicionário de DataFrames por piloto
+        chave_sessao: Identificador da sessão, usado como chave dos caches de dados derivados
+    """
+    abas = ABAS_TREINO if opcao == "Treino" else ABAS_CORRIDA
+
+    aba_selecionada = st.radio(
+        "Visualização:",
+        list(abas.keys()),
+        horizontal=True,
+        key=f"aba_{opcao.lower()}",
+        label_visibility="collapsed"
+    )
+    st.markdown("---")
+
+    abas[aba_selecionada](df, driver_info, chave_sessao)
+
+
+# Voltas mostradas no gráfico de ritmo do modo ao vivo
+VOLTAS_RITMO_AO_VIVO = 20
+
+
+def _painel_ao_vivo(fonte):
+    """
+    Aplica as voltas novas da fonte ao vivo (SessaoAoVivo ou ConsumidorFeed) e mostra
+    classificação, passagens recentes e ritmo das últimas voltas.
+    """
+    try:
+        novas_voltas = fonte.atualizar()
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return
+
+    st.caption(f"📡 {fonte.situacao()}")
+    estado = fonte.estado
+    if estado.resumo.empty:
+        st.info("⏳ Aguardando voltas ...")
+        return
+
+    classificacao = estado.classificacao()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Volta do líder", int(classificacao['Volta'].iloc[0]))
+    col2.metric("Pilotos", len(classificacao))
+    col3.metric("Voltas lidas", int(estado.resumo['Voltas'].sum()), delta=novas_voltas or None)
+
+    st.subheader("Classificação")
+    classificacao_exibicao = classificacao.copy()
+    for coluna in ['Última Volta', 'Melhor Volta']:
+        classificacao_exibicao[coluna] = classificacao_exibicao[coluna].map(formatar_tempo)
+    st.dataframe(classificacao_exibicao, hide_index=True, use_container_width=True)
+
+    st.subheader("Passagens recentes")
+    passagens = formatar_voltas_para_exibicao(estado.ultimas_passagens())
+    st.dataframe(passagens, hide_index=True, use_container_width=True)
+
+    st.subheader("Ritmo das últimas voltas")
+    ultima_volta = int(classificacao['Volta'].max())
+    faixa_voltas = (max(1, ultima_volta - VOLTAS_RITMO_AO_VIVO + 1), ultima_volta)
+    st.plotly_chart(gerar_grafico_laptimes_por_volta(estado.voltas_desde(faixa_voltas[0]), faixa_voltas=faixa_voltas),
+                    use_container_width=True)
+
+
+def exibir_ao_vivo(caminho: str, campeonato: str, intervalo: float):
+    """
+    Acompanha um CSV de cronometragem que continua sendo gravado.
+
+    Args:
+        caminho: Caminho local do arquivo CSV
+        campeonato: Formato dos cabeçalhos de piloto (ou CAMPEONATO_AUTOMATICO)
+        intervalo: Segundos entre as atualizações (só o painel é reexecutado)
+    """
+    st.fragment(_painel_ao_vivo, run_every=intervalo)(obter_sessao_ao_vivo(caminho, campeonato))
+
+
+def exibir_feed_ao_vivo(host: str, porta: int, intervalo: float):
+    """
+    Acompanha um feed de cronometragem (JSON por linha sobre TCP, ver functions.transmissao).
+
+    Args:
+        host: Endereço do feed
+        porta: Porta do feed
+        intervalo: Segundos entre as atualizações (só o painel é reexecutado)
+    """
+    st.fragment(_painel_ao_vivo, run_every=intervalo)(obter_consumidor_feed(host, porta))